@@ -0,0 +1,131 @@
+"""Benchmark the conversation checkpointers against the in-process MemorySaver.
+
+Run from the app directory:
+    python -m benchmarks.checkpointer_bench --sessions 1000 --turns 3
+    python -m benchmarks.checkpointer_bench --backends memory sqlite mongo   # mongo needs CONNECTION_STRING
+
+Every session runs a few turns through a graph with the app's state and node
+layout, where the LLM nodes are replaced by fixed messages. Reports the
+checkpoint write and read latency, the Python heap held per 1k sessions and
+the size of the database on disk.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+import uuid
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+from graph.checkpointers import MongoCheckpointSaver, SqliteCheckpointSaver
+from graph.graph_state import GraphState
+
+ANSWER = "| Metric | Value |\n|---|---|\n" + "| RSI | 54.2 |\n" * 40
+
+
+def build_graph(checkpointer):
+    workflow = StateGraph(GraphState)
+    workflow.add_node("formulate_query", lambda state: {"messages": [HumanMessage(state["input"])]})
+    workflow.add_node("agent", lambda state: {"messages": [AIMessage(ANSWER)]})
+    workflow.add_node("delete_messages", lambda state: {"messages": []})
+    workflow.add_edge(START, "formulate_query")
+    workflow.add_edge("formulate_query", "agent")
+    workflow.add_edge("agent", "delete_messages")
+    workflow.add_edge("delete_messages", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def timed(saver, method, timings):
+    """Record the latency of every call to `saver.method`."""
+    original = getattr(saver, method)
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            timings.append(time.perf_counter() - start)
+
+    setattr(saver, method, wrapper)
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return (f"p50 {statistics.median(timings) * 1e3:7.3f} ms  "
+            f"p95 {timings[int(len(timings) * 0.95)] * 1e3:7.3f} ms")
+
+
+def create_saver(backend, directory):
+    if backend == "memory":
+        return MemorySaver(), None
+    if backend == "sqlite":
+        path = os.path.join(directory, "checkpoints.sqlite")
+        return SqliteCheckpointSaver(path, thread_ttl=None), path
+    if backend == "mongo":
+        from pymongo import MongoClient
+
+        db_name = f"checkpoint_bench_{uuid.uuid4().hex[:8]}"
+        return MongoCheckpointSaver(MongoClient(os.getenv("CONNECTION_STRING")), db_name, thread_ttl=None), db_name
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def disk_size(backend, saver, location):
+    if backend == "sqlite":
+        return sum(os.path.getsize(location + suffix)
+                   for suffix in ("", "-wal") if os.path.exists(location + suffix))
+    if backend == "mongo":
+        return saver.checkpoints.database.command("dbStats")["storageSize"]
+    return 0
+
+
+def run(backend, sessions, turns, reads, directory):
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    saver, location = create_saver(backend, directory)
+    writes, loads = [], []
+    timed(saver, "put", writes)
+    timed(saver, "put_writes", writes)
+    app = build_graph(saver)
+
+    thread_ids = [str(uuid.uuid4()) for _ in range(sessions)]
+    start = time.perf_counter()
+    for turn in range(turns):
+        for thread_id in thread_ids:
+            app.invoke({"input": f"What is the RSI for Tesla, question {turn}?"},
+                       {"configurable": {"thread_id": thread_id}})
+    elapsed = time.perf_counter() - start
+
+    timed(saver, "get_tuple", loads)
+    for thread_id in random.sample(thread_ids, min(reads, sessions)):
+        app.get_state({"configurable": {"thread_id": thread_id}})
+
+    heap = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    print(f"{backend:7s} turns   {sessions * turns / elapsed:8.1f} turns/s")
+    print(f"{backend:7s} write   {percentiles(writes)}")
+    print(f"{backend:7s} read    {percentiles(loads)}")
+    print(f"{backend:7s} memory  {heap / sessions * 1000 / 2 ** 20:8.2f} MiB heap per 1k sessions, "
+          f"{disk_size(backend, saver, location) / sessions * 1000 / 2 ** 20:8.2f} MiB on disk per 1k sessions")
+    if backend == "mongo":
+        saver.checkpoints.database.client.drop_database(location)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--reads", type=int, default=500, help="number of get_state calls timed")
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite"],
+                        choices=["memory", "sqlite", "mongo"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backends:
+            run(backend, args.sessions, args.turns, args.reads, directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark the local standalone-question check that lets formulate_query skip the LLM.
+
+Run from the app directory:
+    python -m benchmarks.formulate_query_bench
+    python -m benchmarks.formulate_query_bench --live 5   # also time the real reformulation chain
+
+Each line of the questions file is a JSON object with the `question` and
+whether it is `standalone` (answerable without the chat history).
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from graph.query_classifier import classify_query
+
+DEFAULT_QUESTIONS = os.path.join(os.path.dirname(__file__), "sample_questions.jsonl")
+
+
+def load_questions(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def measure_llm_latency(questions, runs):
+    """Average latency of the reformulation chain, needs GOOGLE_API_KEY."""
+    from dotenv import load_dotenv
+    from langchain_core.messages import AIMessage, HumanMessage
+    from graph.chains import get_formulated_query_chain
+
+    load_dotenv()
+    chain = get_formulated_query_chain()
+    chat_history = [
+        HumanMessage("What is the RSI for Tesla over the last month?"),
+        AIMessage("The 1 month RSI for TSLA is 58.2, which is neutral."),
+    ]
+    timings = []
+    for row in questions[:runs]:
+        start = time.perf_counter()
+        chain.invoke({"input": row["question"], "chat_history": chat_history, "summary": ""})
+        timings.append(time.perf_counter() - start)
+    return sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS, help="JSONL file of labelled questions")
+    parser.add_argument("--llm-latency", type=float, default=0.8,
+                        help="assumed seconds per reformulation call when --live is not used")
+    parser.add_argument("--live", type=int, default=0, metavar="N",
+                        help="time N real reformulation calls instead of assuming the latency")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    reasons = Counter()
+    bypassed = wrong_bypasses = 0
+    start = time.perf_counter()
+    for row in questions:
+        standalone, reason = classify_query(row["question"])
+        reasons[reason] += 1
+        if standalone:
+            bypassed += 1
+            if not row["standalone"]:
+                wrong_bypasses += 1
+                print(f"wrong bypass: {row['question']}")
+    classify_seconds = time.perf_counter() - start
+
+    llm_latency = measure_llm_latency(questions, args.live) if args.live else args.llm_latency
+    standalone_total = sum(row["standalone"] for row in questions)
+
+    print(f"questions:           {len(questions)} ({standalone_total} labelled standalone)")
+    print(f"bypassed:            {bypassed} ({bypassed / len(questions):.1%} of turns, "
+          f"{bypassed / max(standalone_total, 1):.1%} of standalone questions)")
+    print(f"wrong bypasses:      {wrong_bypasses}")
+    print(f"reasons:             {dict(reasons)}")
+    print(f"classifier cost:     {classify_seconds / len(questions) * 1e6:.1f} us/question")
+    print(f"llm latency:         {llm_latency:.3f} s/call ({'measured' if args.live else 'assumed'})")
+    print(f"latency saved:       {bypassed * llm_latency:.2f} s in total, "
+          f"{bypassed * llm_latency / len(questions):.3f} s per turn on average")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark the intent router that calls the tools of common questions without the model.
+
+Run from the app directory:
+    python -m benchmarks.intent_router_bench
+    python -m benchmarks.intent_router_bench --llm-latency 1.2
+
+Each line of the questions file is a JSON object with the `question` and
+the `route` it should take, null for questions the model has to handle.
+Routed questions skip the model's tool selection round, one LLM call.
+"""
+import argparse
+import json
+import os
+import time
+from graph.intent_router import get_router_stats, route_query
+
+DEFAULT_QUESTIONS = os.path.join(os.path.dirname(__file__), "intent_questions.jsonl")
+
+
+def load_questions(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS, help="JSONL file of labelled questions")
+    parser.add_argument("--llm-latency", type=float, default=0.8,
+                        help="assumed seconds of the tool selection call a routed question skips")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    wrong_routes = missed = 0
+    start = time.perf_counter()
+    for row in questions:
+        tool_calls, route = route_query(row["question"])
+        routed = route if tool_calls is not None else None
+        if routed != row["route"]:
+            if routed is None:
+                missed += 1
+            else:
+                wrong_routes += 1
+            print(f"expected {row['route']}, got {routed or route}: {row['question']}")
+    route_seconds = time.perf_counter() - start
+
+    stats = get_router_stats()
+    expected_routed = sum(row["route"] is not None for row in questions)
+    print(f"questions:           {len(questions)} ({expected_routed} labelled routable)")
+    print(f"routed:              {stats['routed']} ({stats['hit_rate']:.1%} of turns)")
+    print(f"wrong routes:        {wrong_routes}")
+    print(f"missed routes:       {missed}")
+    print(f"routes:              {stats['routes']}")
+    print(f"fallbacks:           {stats['fallbacks']}")
+    print(f"router cost:         {route_seconds / len(questions) * 1e6:.1f} us/question")
+    print(f"latency saved:       {stats['routed'] * args.llm_latency / len(questions):.3f} s per turn on average "
+          f"(assuming {args.llm_latency:.1f} s per LLM call)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark the per-call overhead of building LLM clients against reusing them from the registry.
+
+Run from the app directory:
+    python -m benchmarks.llm_client_bench
+    python -m benchmarks.llm_client_bench --calls 200 --handshake-ms 30
+
+A local stub of the Groq chat completions API answers instantly, so the
+timings are client overhead only: building the client and chain, and
+opening connections. `--handshake-ms` delays every new connection to stand
+in for the TCP and TLS handshakes of the real API. "before" builds a
+ChatGroq and chain per call, as summarize_conversation used to. "after"
+uses the chain from the registry, with the shared keep-alive pool.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETION = {
+    "id": "chatcmpl-stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "llama-3.1-8b-instant",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "Stub summary."}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15},
+}
+
+
+class StubGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    handshake_seconds = 0.0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        # headers and body are written separately, without this delayed ACKs stall every keep-alive reply
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with StubGroqHandler.lock:
+            StubGroqHandler.connections += 1
+        time.sleep(self.handshake_seconds)
+
+    def _reply(self, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply(COMPLETION)
+
+    def do_GET(self):
+        self._reply({"object": "list", "data": []})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(handshake_seconds: float) -> ThreadingHTTPServer:
+    StubGroqHandler.handshake_seconds = handshake_seconds
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubGroqHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(build_chain, calls: int):
+    """Per-call seconds of building and invoking a chain, and connections opened."""
+    from langchain_core.messages import HumanMessage
+
+    messages = [HumanMessage("What is the RSI of Tesla?"), HumanMessage("Create a summary of the conversation above")]
+    connections_before = StubGroqHandler.connections
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        build_chain().invoke(messages)
+        timings.append(time.perf_counter() - start)
+    return timings, StubGroqHandler.connections - connections_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100, help="chain invocations per variant")
+    parser.add_argument("--handshake-ms", type=float, default=0.0,
+                        help="delay of every new connection, standing in for the TLS handshake")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.handshake_ms / 1000)
+    os.environ["GROQ_API_BASE"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.setdefault("GROQ_API_KEY", "stub")
+    os.environ.setdefault("GOOGLE_API_KEY", "stub")
+
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_groq import ChatGroq
+    from graph.chains import get_summary_chain
+    from graph.llm_registry import warm_up
+
+    def build_per_call():
+        return ChatGroq(model="llama-3.1-8b-instant", temperature=0.0) | StrOutputParser()
+
+    # the first call of either variant pays for imports and lazy initialization
+    build_per_call().invoke("warm up")
+    start = time.perf_counter()
+    get_summary_chain()
+    registry_build = time.perf_counter() - start
+    warm_up()
+
+    results = {
+        "before (client per call)": measure(build_per_call, args.calls),
+        "after (registry)": measure(get_summary_chain, args.calls),
+    }
+    server.shutdown()
+
+    print(f"calls per variant:   {args.calls}, handshake {args.handshake_ms:.0f} ms per connection")
+    print(f"registry first build: {registry_build * 1000:.1f} ms, then served from the cache")
+    for name, (timings, connections) in results.items():
+        print(f"{name:26s} mean {statistics.mean(timings) * 1000:6.2f} ms  "
+              f"p50 {statistics.median(timings) * 1000:6.2f} ms  "
+              f"p95 {sorted(timings)[int(len(timings) * 0.95)] * 1000:6.2f} ms  connections {connections}")
+
+
+if __name__ == "__main__":
+    main()
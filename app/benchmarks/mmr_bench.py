@@ -0,0 +1,49 @@
+"""Benchmark the vectorized MMR selection against LangChain's maximal_marginal_relevance.
+
+Run from the app directory:
+    python -m benchmarks.mmr_bench --fetch-k 10 20 100 200 --k 4 10
+
+Both select k of fetch_k random 768-dimensional candidates. Reports the
+selection latency and whether both picked the same documents.
+"""
+import argparse
+import statistics
+import time
+import numpy as np
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+from utils.mmr import mmr_select
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return result, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[10, 20, 100, 200])
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 10])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for fetch_k in args.fetch_k:
+        for k in args.k:
+            query = rng.standard_normal(args.dim).astype(np.float32)
+            # embeddings come back from the store as lists of floats
+            candidates = (query + 2 * rng.standard_normal((fetch_k, args.dim))).astype(np.float32).tolist()
+            expected, langchain = timed(
+                lambda: maximal_marginal_relevance(query, candidates, lambda_mult=0.5, k=k), args.repeat)
+            selected, native = timed(
+                lambda: mmr_select(query, np.asarray(candidates, dtype=np.float32), k, 0.5), args.repeat)
+            print(f"fetch_k {fetch_k:4d} k {k:3d}  langchain {langchain * 1e3:8.3f} ms  "
+                  f"native {native * 1e3:8.3f} ms  same selection {selected == expected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark the cold import time of the app and fail when it exceeds its budget.
+
+Run from the app directory:
+    python -m benchmarks.startup_bench
+    python -m benchmarks.startup_bench --module streamlit_app --budget-ms 3000 --top 20
+
+Imports the module in fresh interpreters with `python -X importtime` and
+reports the median total and the slowest modules of the median run. Exits
+with status 1 when the median exceeds `--budget-ms`, or when a module that
+must load on first use (pandas and yfinance for market data, pymongo and
+langchain_mongodb for the vector store and checkpoints, the Groq and Gemini
+SDKs for the models) is imported at startup.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Loaded by the first tool call, retrieval or model call, never by the import of the app
+DEFERRED_MODULES = ["pandas", "yfinance", "pymongo", "langchain_mongodb", "langchain_groq", "groq",
+                    "langchain_google_genai", "google.generativeai"]
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_times(module: str) -> dict:
+    """Cumulative microseconds of every module imported by `import module` in a new interpreter."""
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "stub")
+    env.setdefault("GOOGLE_API_KEY", "stub")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="graph.workflow", help="module imported at startup")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="budget of the median import time")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    args = parser.parse_args()
+
+    runs = sorted((import_times(args.module) for _ in range(args.runs)), key=lambda times: times[args.module])
+    median = runs[len(runs) // 2]
+    total_ms = statistics.median(times[args.module] for times in runs) / 1000
+
+    print(f"import {args.module}: median {total_ms:.0f} ms over {args.runs} runs, "
+          f"min {runs[0][args.module] / 1000:.0f} ms, max {runs[-1][args.module] / 1000:.0f} ms")
+    print("slowest modules (cumulative):")
+    for name, micros in sorted(median.items(), key=lambda item: item[1], reverse=True)[1:args.top + 1]:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.0f} ms is over the budget of {args.budget_ms:.0f} ms")
+    for name in DEFERRED_MODULES:
+        if name in median:
+            failures.append(f"{name} is imported at startup ({median[name] / 1000:.0f} ms)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print(f"OK: within the budget of {args.budget_ms:.0f} ms, no deferred module imported")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
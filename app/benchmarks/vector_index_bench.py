@@ -0,0 +1,91 @@
+"""Benchmark the local vector store's IVF index against exact flat search.
+
+Run from the app directory:
+    python -m benchmarks.vector_index_bench --vectors 100000 --nprobe 4 8 16 32
+
+Vectors are drawn around random topic centres, like embeddings of news
+chunks, and queries are perturbed corpus vectors. Reports recall@k of the
+IVF index against the exact top k, the search latency of both, and how long
+saving and reopening the store takes.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from utils.local_vector_store import LocalVectorStore
+
+
+class NoEmbeddings(Embeddings):
+    """The benchmark only searches by vector."""
+
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+
+def make_vectors(count, dim, topics, rng):
+    centres = rng.standard_normal((topics, dim)).astype(np.float32)
+    vectors = centres[rng.integers(topics, size=count)] + rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def search_rows(store, queries, k):
+    rows, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result, _ = store._search(query, k)
+        timings.append(time.perf_counter() - start)
+        rows.append(set(result.tolist()))
+    return rows, timings
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return (f"p50 {statistics.median(timings) * 1e3:7.3f} ms  "
+            f"p95 {timings[int(len(timings) * 0.95)] * 1e3:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = make_vectors(args.vectors, args.dim, args.topics, rng)
+    queries = vectors[rng.choice(args.vectors, size=args.queries, replace=False)]
+    queries = queries + 0.5 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(args.dim)
+    ids = [str(i) for i in range(args.vectors)]
+    texts = [""] * args.vectors
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(directory, NoEmbeddings(), ivf_threshold=args.vectors + 1)
+        store.add_embeddings(ids, texts, vectors)
+        exact, timings = search_rows(store, queries, args.k)
+        print(f"flat          recall@{args.k} 1.000  {percentiles(timings)}")
+
+        store.ivf_threshold = 1
+        start = time.perf_counter()
+        store.save()
+        print(f"save + train  {time.perf_counter() - start:7.2f} s  ({len(store._ivf.centroids)} lists)")
+        start = time.perf_counter()
+        store = LocalVectorStore(directory, NoEmbeddings(), ivf_threshold=1)
+        print(f"reopen        {time.perf_counter() - start:7.2f} s")
+
+        for nprobe in args.nprobe:
+            store._ivf.nprobe = nprobe
+            found, timings = search_rows(store, queries, args.k)
+            recall = np.mean([len(rows & truth) / args.k for rows, truth in zip(found, exact)])
+            print(f"ivf nprobe {nprobe:<3d}recall@{args.k} {recall:.3f}  {percentiles(timings)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,122 @@
+import os
+
 # Constants
 JSON_FILES_DIRECTORY = 'data/scraped_data'
-PROCESSED_FILES_PATH = 'data/processed_files.txt'
+# Content hashes of the indexed files, articles and chunks
+INDEX_MANIFEST_PATH = 'data/index_manifest.json'
 BOT_NAME ="InvestIQ"
 HEADER_TEXT = "InvestIQ 📈 🤖"
-SUB_HEADER_TEXT = "Your Personalized Financial News & Stock Trends Companion 💰"
\ No newline at end of file
+SUB_HEADER_TEXT = "Your Personalized Financial News & Stock Trends Companion 💰"
+
+# Market data
+MARKET_DATA_INFO_WORKERS = 8
+MARKET_DATA_CACHE_MAX_BYTES = int(os.getenv("MARKET_DATA_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Seconds a cached history stays fresh, by requested period
+MARKET_DATA_HISTORY_TTLS = {
+    '1d': 60,
+    '5d': 5 * 60,
+    '1mo': 15 * 60,
+    '3mo': 30 * 60,
+    '6mo': 60 * 60,
+    '1y': 60 * 60,
+    '2y': 6 * 60 * 60,
+    '5y': 12 * 60 * 60,
+    '10y': 12 * 60 * 60,
+    'ytd': 60 * 60,
+    'max': 12 * 60 * 60,
+}
+MARKET_DATA_INFO_TTL = 15 * 60
+# Incremental indicator windows kept in memory, one per (symbol, period, interval)
+INDICATOR_STATE_MAX_ENTRIES = 512
+
+# Maximum concurrent blocking calls per upstream provider in async tool execution
+TOOL_PROVIDER_CONCURRENCY = {
+    "yfinance": 4,
+    "mongo": 8,
+}
+
+# Summarize conversations on a background worker instead of before the reply is returned
+DEFERRED_SUMMARY = os.getenv("DEFERRED_SUMMARY", "true").lower() == "true"
+# Approximate history tokens that trigger a summary, and that prompts are cut to until it is written
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 3000))
+# Recent turns kept verbatim after a summary, only older turns are folded into it
+CONTEXT_WINDOW_TOKENS = int(os.getenv("CONTEXT_WINDOW_TOKENS", 1500))
+CONTEXT_SUMMARY_TOKENS = 400
+
+# Conversation checkpoints: "sqlite" (single node), "mongo" (shared by several app workers) or "memory"
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite").lower()
+CHECKPOINT_SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", "data/checkpoints.sqlite")
+CHECKPOINT_POOL_SIZE = int(os.getenv("CHECKPOINT_POOL_SIZE", 4))
+# Conversations without activity for this many seconds are deleted
+CHECKPOINT_THREAD_TTL = int(os.getenv("CHECKPOINT_THREAD_TTL", 24 * 60 * 60))
+
+# News ingestion
+INGESTION_SPLIT_WORKERS = int(os.getenv("INGESTION_SPLIT_WORKERS", os.cpu_count() or 1))
+# Articles sent to a split worker at a time
+INGESTION_RECORDS_PER_TASK = 16
+# Chunks per embedding request, and embedding requests in flight
+INGESTION_EMBED_BATCH_SIZE = 64
+INGESTION_EMBED_CONCURRENCY = int(os.getenv("INGESTION_EMBED_CONCURRENCY", 4))
+INGESTION_MAX_RETRIES = 5
+
+# Embeddings of indexed chunks, kept on disk so re-ingested texts are not embedded again
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "data/embedding_cache")
+# Query embeddings kept in memory
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+# Vector store: "atlas" (MongoDB Atlas vector search) or "local" (in-process index on disk)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "atlas").lower()
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", "data/vector_index")
+# Corpus size from which the local store searches an IVF index instead of every vector
+LOCAL_VECTOR_IVF_THRESHOLD = 20000
+# IVF lists scored per query, higher is slower with better recall
+LOCAL_VECTOR_IVF_NPROBE = int(os.getenv("LOCAL_VECTOR_IVF_NPROBE", 8))
+
+# News search: documents returned by MMR, and nearest candidates it diversifies
+NEWS_SEARCH_K = 4
+NEWS_MMR_FETCH_K = int(os.getenv("NEWS_MMR_FETCH_K", 100))
+# Unfiltered Atlas candidates per requested one, post-filtered when the index lacks the filter fields
+NEWS_POSTFILTER_OVERFETCH = 10
+# Seconds before a pre-filter rejected by Atlas is tried again, e.g. after the indexer added the filter fields
+NEWS_PREFILTER_RETRY_SECONDS = 10 * 60
+# BM25 index of the news chunks, updated by the indexer next to the vector store
+KEYWORD_INDEX_PATH = os.getenv("KEYWORD_INDEX_PATH", "data/keyword_index.json")
+# Reciprocal rank fusion constant, higher flattens the difference between ranks
+RRF_K = 60
+# Stock symbol -> news chunks mentioning it, updated by the indexer
+SYMBOL_INDEX_PATH = os.getenv("SYMBOL_INDEX_PATH", "data/symbol_index.json")
+# Most recent chunks of a symbol considered by a news search filtered to it
+SYMBOL_MAX_CANDIDATES = 500
+
+# Semantic response cache: answers reused for questions this similar (cosine of the query embeddings)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", 0.95))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+# Seconds an answer stays cached when it used news, or no tools at all
+RESPONSE_CACHE_NEWS_TTL = 60 * 60
+RESPONSE_CACHE_DEFAULT_TTL = 60 * 60
+
+# Tool memo: times the model may repeat an identical tool call in one turn, and results kept per thread
+TOOL_MAX_IDENTICAL_CALLS = int(os.getenv("TOOL_MAX_IDENTICAL_CALLS", 2))
+TOOL_MEMO_MAX_ENTRIES = int(os.getenv("TOOL_MEMO_MAX_ENTRIES", 16))
+
+# LLM clients: seconds to connect and to complete a request, retries, and the shared HTTP connection pool
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", 30))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_MAX_CONNECTIONS = 20
+LLM_MAX_KEEPALIVE = 10
+LLM_KEEPALIVE_EXPIRY = 60
+# Build the LLM clients and open a connection when the app starts, instead of on the first question
+LLM_WARM_UP = os.getenv("LLM_WARM_UP", "true").lower() == "true"
+
+# Approximate tokens a tool result may take in the prompt, beyond it the result is truncated
+TOOL_PAYLOAD_TOKEN_BUDGET = int(os.getenv("TOOL_PAYLOAD_TOKEN_BUDGET", 600))
+TOOL_PAYLOAD_TOKEN_BUDGETS = {
+    "retrieve_news_data": 1200,
+    "retrieve_stocks_data": 1000,
+    "retrieve_stock_indicators_for_multiple_stocks": 1000,
+}
+
+# Call the tools of common questions directly, without the model's tool selection round
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
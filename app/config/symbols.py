@@ -0,0 +1,80 @@
+# Stock symbols the assistant recognises locally, with the company names and
+# aliases users commonly write instead of the symbol
+COMPANY_ALIASES = {
+    "AAPL": ["apple"],
+    "MSFT": ["microsoft"],
+    "GOOGL": ["google", "alphabet"],
+    "AMZN": ["amazon", "aws"],
+    "META": ["meta", "facebook", "instagram", "whatsapp"],
+    "TSLA": ["tesla"],
+    "NVDA": ["nvidia"],
+    "NFLX": ["netflix"],
+    "AMD": ["advanced micro devices"],
+    "INTC": ["intel"],
+    "IBM": ["international business machines"],
+    "ORCL": ["oracle"],
+    "CRM": ["salesforce"],
+    "ADBE": ["adobe"],
+    "CSCO": ["cisco"],
+    "QCOM": ["qualcomm"],
+    "AVGO": ["broadcom"],
+    "TSM": ["tsmc", "taiwan semiconductor"],
+    "ASML": ["asml"],
+    "MU": ["micron"],
+    "ARM": ["arm holdings"],
+    "SMCI": ["super micro", "supermicro"],
+    "PLTR": ["palantir"],
+    "SNOW": ["snowflake"],
+    "SHOP": ["shopify"],
+    "UBER": ["uber"],
+    "LYFT": ["lyft"],
+    "ABNB": ["airbnb"],
+    "PYPL": ["paypal"],
+    "SQ": ["block inc", "square"],
+    "COIN": ["coinbase"],
+    "HOOD": ["robinhood"],
+    "SPOT": ["spotify"],
+    "SNAP": ["snapchat", "snap inc"],
+    "PINS": ["pinterest"],
+    "RDDT": ["reddit"],
+    "BABA": ["alibaba"],
+    "SONY": ["sony"],
+    "DIS": ["disney"],
+    "WBD": ["warner bros", "warner brothers"],
+    "F": ["ford"],
+    "GM": ["general motors"],
+    "RIVN": ["rivian"],
+    "LCID": ["lucid"],
+    "NIO": ["nio"],
+    "JPM": ["jpmorgan", "jp morgan"],
+    "BAC": ["bank of america"],
+    "GS": ["goldman sachs"],
+    "V": ["visa"],
+    "MA": ["mastercard"],
+    "BRK-B": ["berkshire hathaway", "berkshire"],
+    "WMT": ["walmart"],
+    "COST": ["costco"],
+    "KO": ["coca-cola", "coca cola", "coke"],
+    "PEP": ["pepsico", "pepsi"],
+    "MCD": ["mcdonald's", "mcdonalds"],
+    "NKE": ["nike"],
+    "SBUX": ["starbucks"],
+    "XOM": ["exxon", "exxonmobil", "exxon mobil"],
+    "CVX": ["chevron"],
+    "PFE": ["pfizer"],
+    "JNJ": ["johnson & johnson", "johnson and johnson"],
+    "LLY": ["eli lilly", "lilly"],
+    "BA": ["boeing"],
+    "T": ["at&t"],
+    "VZ": ["verizon"],
+    "SPY": ["s&p 500", "s&p500"],
+    "QQQ": ["nasdaq 100", "nasdaq-100"],
+}
+
+# Aliases that are also common words, matched in news text only when written as here
+NEWS_CASE_SENSITIVE_ALIASES = [
+    "Apple", "Amazon", "Meta", "Oracle", "Intel", "Micron", "Snowflake", "Uber", "Lucid", "Coke", "Lilly", "Ford",
+]
+# Aliases that news text uses as ordinary words even when capitalised ("Visa Sponsorships",
+# "Times Square"), news is indexed under their symbols by ticker only
+NEWS_IGNORED_ALIASES = ["visa", "square"]
@@ -0,0 +1,50 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+from langchain_core.tools import BaseTool, tool as create_tool
+from config.constants import TOOL_PROVIDER_CONCURRENCY
+
+# One bounded executor per upstream provider, so a burst of yfinance calls
+# can neither exceed its own limit nor starve the Mongo lookups
+_executors: Dict[str, ThreadPoolExecutor] = {
+    provider: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"{provider}-io")
+    for provider, limit in TOOL_PROVIDER_CONCURRENCY.items()
+}
+
+# Upstream provider each tool's blocking I/O goes to
+TOOL_PROVIDERS = {
+    "retrieve_news_data": "mongo",
+    "retrieve_stocks_data": "yfinance",
+    "retreive_stock_indicators_for_single_stock": "yfinance",
+    "retrieve_stock_indicators_for_multiple_stocks": "yfinance",
+    "calculate_stock_returns": "yfinance",
+}
+
+
+async def run_blocking(provider: str, func: Callable, *args, **kwargs):
+    """Run a blocking call on the provider's executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executors[provider], functools.partial(func, *args, **kwargs))
+
+
+def with_async(tool) -> BaseTool:
+    """Return a copy of a tool (or plain function) that also supports `ainvoke`.
+
+    The async variant offloads the tool's blocking function to the executor of
+    the provider it talks to, so independent tool calls in one agent turn run
+    concurrently.
+    """
+    if not isinstance(tool, BaseTool):
+        tool = create_tool(tool)
+    provider = TOOL_PROVIDERS[tool.name]
+    func = tool.func
+
+    async def coroutine(**kwargs):
+        return await run_blocking(provider, func, **kwargs)
+
+    return tool.model_copy(update={"coroutine": coroutine})
+
+
+def with_async_tools(tools: List) -> List[BaseTool]:
+    return [with_async(tool) for tool in tools]
@@ -0,0 +1,69 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Optional
+from langgraph.graph import END
+from .nodes import should_summarize, summarize_conversation
+
+
+class BackgroundSummarizer:
+    """Summarize conversations on a background worker after the answer is returned.
+
+    The summary is generated from a snapshot of the checkpointed state and
+    written back with `update_state`. Only the messages that were in the
+    snapshot are removed, so messages added in the meantime are kept. A
+    summary is dropped if a newer one was written while it was generated.
+
+    Turns and summary writes on the same thread must not overlap, otherwise
+    the running turn's checkpoints would replace the summary. Wrap each turn
+    in `turn_lock`.
+    """
+
+    def __init__(self, app, max_workers: int = 2):
+        self.app = app
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summarizer")
+        self._pending = set()
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _thread_id(config) -> str:
+        return config["configurable"]["thread_id"]
+
+    @contextmanager
+    def turn_lock(self, config):
+        """Hold while a turn runs so a finished summary waits for the turn to end."""
+        with self._lock:
+            lock = self._thread_locks.setdefault(self._thread_id(config), threading.Lock())
+        with lock:
+            yield
+
+    def schedule(self, config) -> Optional[Future]:
+        """Queue a summary for the thread if one is due and none is running yet."""
+        thread_id = self._thread_id(config)
+        with self._lock:
+            if thread_id in self._pending:
+                return None
+            self._pending.add(thread_id)
+        return self._executor.submit(self._summarize, config)
+
+    def _summarize(self, config):
+        thread_id = self._thread_id(config)
+        try:
+            state = self.app.get_state(config).values
+            if should_summarize(state) == END:
+                return
+            update = summarize_conversation(state)
+            with self.turn_lock(config):
+                current = self.app.get_state(config).values
+                if current.get("summary", "") != state.get("summary", ""):
+                    logging.info(f"Discarding outdated summary for thread {thread_id}")
+                    return
+                self.app.update_state(config, update, as_node="summarize_conversation")
+            logging.info(f"Background summary written for thread {thread_id}")
+        except Exception as e:
+            logging.error(f"Background summary failed for thread {thread_id}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(thread_id)
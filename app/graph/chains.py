@@ -1,14 +1,17 @@
+from functools import lru_cache
 from typing import Literal
 from langchain_core.prompts import PromptTemplate, ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
-from langchain_groq import ChatGroq
 from pydantic import BaseModel, Field
-from langchain_google_genai import GoogleGenerativeAI
+from .llm_registry import get_chat_model, get_gemini_llm
 
+# Chains are stateless, each is built once per process on the shared clients of llm_registry
+
+@lru_cache(maxsize=1)
 def get_classify_question_chain():
 
   # llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0.0)
-  llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.0)
+  llm = get_chat_model("llama-3.1-8b-instant", temperature=0.0)
 
   class QuestionCategory(BaseModel):
 
@@ -46,11 +49,11 @@ def get_classify_question_chain():
   return question_classify_prompt | llm.with_structured_output(QuestionCategory)
 
 
+@lru_cache(maxsize=1)
 def get_extract_context_chain():
 
   # llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.0)
-  llm = GoogleGenerativeAI(model="gemini-1.5-flash-latest",
-                           temperature=0)
+  llm = get_gemini_llm("gemini-1.5-flash-latest", temperature=0)
   
   class Context(BaseModel):
     symbols : list[str] = Field(
@@ -90,11 +93,11 @@ def get_extract_context_chain():
 
 
 
+@lru_cache(maxsize=1)
 def get_handle_stock_analysis_chain():
 
   # llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0.2)
-  llm = GoogleGenerativeAI(model="gemini-1.5-flash-latest",
-                           temperature=0.5)
+  llm = get_gemini_llm("gemini-1.5-flash-latest", temperature=0.5)
   prompt = PromptTemplate(
       template="""
     You are a financial data analyst expert.
@@ -112,6 +115,7 @@ def get_handle_stock_analysis_chain():
 
 
 
+@lru_cache(maxsize=1)
 def get_formulated_query_chain():
 
   contextualize_q_system_prompt = """
@@ -135,14 +139,14 @@ def get_formulated_query_chain():
       ]
   )
 
-  llm = GoogleGenerativeAI(model="gemini-1.5-flash-latest",
-                           temperature=0,)
+  llm = get_gemini_llm("gemini-1.5-flash-latest", temperature=0)
   # llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0.0)
 
   chain = prompt_genrate_q | llm | StrOutputParser()
   return chain
 
 
+@lru_cache(maxsize=1)
 def get_rag_chain():
 
   system = """
@@ -170,7 +174,7 @@ def get_rag_chain():
       ]
   )
 
-  llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.5)
+  llm = get_chat_model("llama-3.1-8b-instant", temperature=0.5)
   # llm = GoogleGenerativeAI(model="gemini-1.5-flash-latest",
   #                                temperature=0.2,)
 
@@ -178,8 +182,9 @@ def get_rag_chain():
   return rag_chain
 
 
+@lru_cache(maxsize=1)
 def get_handle_unrelated_questins_chain():
-  llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.5)
+  llm = get_chat_model("llama-3.1-8b-instant", temperature=0.5)
  
   prompt = PromptTemplate(
       template="""
@@ -203,3 +208,9 @@ def get_handle_unrelated_questins_chain():
   )
 
   return prompt | llm | StrOutputParser()
+
+
+@lru_cache(maxsize=1)
+def get_summary_chain():
+  llm = get_chat_model("llama-3.1-8b-instant", temperature=0.0)
+  return llm | StrOutputParser()
@@ -0,0 +1,527 @@
+import asyncio
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.types import TASKS
+from config.constants import CHECKPOINT_BACKEND, CHECKPOINT_SQLITE_PATH, CHECKPOINT_POOL_SIZE, CHECKPOINT_THREAD_TTL
+
+# (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint, metadata),
+# the checkpoint and metadata as serialized (type, bytes) pairs
+CheckpointRow = Tuple[str, str, str, Optional[str], Tuple[str, bytes], Tuple[str, bytes]]
+
+
+class DeltaCheckpointSaver(BaseCheckpointSaver[str], ABC):
+    """Checkpoint saver that writes only the channels that changed in a step.
+
+    Channel values are stored once per (channel, version) apart from the
+    checkpoint, which only records the version of every channel. A step that
+    appends a message therefore rewrites the `messages` channel but not the
+    summary or the input. Threads that were not written to for `thread_ttl`
+    seconds are deleted, checked at most every `sweep_interval` seconds.
+
+    Subclasses implement the storage primitives, the checkpoint logic is shared.
+    """
+
+    def __init__(self, thread_ttl: Optional[int] = CHECKPOINT_THREAD_TTL, sweep_interval: Optional[int] = None):
+        super().__init__()
+        self.thread_ttl = thread_ttl
+        self.sweep_interval = sweep_interval if sweep_interval is not None else min(thread_ttl or 0, 5 * 60)
+        self._last_sweep = time.time()
+        self._sweep_lock = threading.Lock()
+
+    # Storage primitives
+
+    @abstractmethod
+    def _store_checkpoint(self, row: CheckpointRow, blobs: List[Tuple[str, str, Tuple[str, bytes]]], seen_at: float):
+        """Save the checkpoint, the new channel blobs (channel, version, value) and the thread's last activity."""
+
+    @abstractmethod
+    def _load_checkpoints(self, thread_id: Optional[str], checkpoint_ns: Optional[str],
+                          checkpoint_id: Optional[str], before_id: Optional[str],
+                          limit: Optional[int]) -> List[CheckpointRow]:
+        """Matching checkpoints, newest first."""
+
+    @abstractmethod
+    def _load_blobs(self, thread_id: str, checkpoint_ns: str,
+                    versions: ChannelVersions) -> Dict[str, Tuple[str, bytes]]:
+        """Stored values (channel -> value) of the given channel versions."""
+
+    @abstractmethod
+    def _load_writes(self, thread_id: str, checkpoint_ns: str,
+                     checkpoint_id: str) -> List[Tuple[str, str, Tuple[str, bytes]]]:
+        """Pending writes (task_id, channel, value) of a checkpoint in write order."""
+
+    @abstractmethod
+    def _store_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str,
+                      writes: List[Tuple[str, int, str, Tuple[str, bytes]]], overwrite: bool):
+        """Save (task_id, idx, channel, value) writes, keeping existing ones unless `overwrite`."""
+
+    @abstractmethod
+    def evict_idle_threads(self, idle_since: float) -> int:
+        """Delete every thread last written before `idle_since`, returns the number deleted."""
+
+    # Checkpoint logic
+
+    def _maybe_evict(self):
+        if not self.thread_ttl or time.time() - self._last_sweep < self.sweep_interval:
+            return
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = time.time()
+            evicted = self.evict_idle_threads(self._last_sweep - self.thread_ttl)
+            if evicted:
+                logging.info(f"Evicted {evicted} idle conversation threads")
+        except Exception as e:
+            logging.error(f"Evicting idle conversation threads failed: {e}")
+        finally:
+            self._sweep_lock.release()
+
+    def _to_tuple(self, row: CheckpointRow) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint, metadata = row
+        checkpoint = self.serde.loads_typed(checkpoint)
+        blobs = self._load_blobs(thread_id, checkpoint_ns, checkpoint["channel_versions"])
+        checkpoint["channel_values"] = {
+            channel: self.serde.loads_typed(value)
+            for channel, value in blobs.items() if value[0] != "empty"
+        }
+        sends = []
+        if parent_id:
+            sends = [
+                self.serde.loads_typed(value)
+                for _, channel, value in self._load_writes(thread_id, checkpoint_ns, parent_id)
+                if channel == TASKS
+            ]
+        checkpoint["pending_sends"] = sends
+        writes = self._load_writes(thread_id, checkpoint_ns, checkpoint_id)
+
+        def config_for(id):
+            return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": id}}
+
+        return CheckpointTuple(
+            config=config_for(checkpoint_id),
+            checkpoint=checkpoint,
+            metadata=self.serde.loads_typed(metadata),
+            parent_config=config_for(parent_id) if parent_id else None,
+            pending_writes=[(task_id, channel, self.serde.loads_typed(value)) for task_id, channel, value in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        rows = self._load_checkpoints(
+            configurable["thread_id"], configurable.get("checkpoint_ns", ""),
+            get_checkpoint_id(config), None, 1)
+        return self._to_tuple(rows[0]) if rows else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        configurable = config["configurable"] if config else {}
+        rows = self._load_checkpoints(
+            configurable.get("thread_id"), configurable.get("checkpoint_ns"),
+            get_checkpoint_id(config) if config else None,
+            get_checkpoint_id(before) if before else None,
+            # metadata filters are applied here, so the limit can only be pushed down without one
+            None if filter else limit)
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self.serde.loads_typed(row[5])
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            yield self._to_tuple(row)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        stored.pop("pending_sends", None)
+        values = stored.pop("channel_values", {})
+        blobs = [
+            (channel, version,
+             self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b""))
+            for channel, version in new_versions.items()
+        ]
+        row = (thread_id, checkpoint_ns, checkpoint["id"], configurable.get("checkpoint_id"),
+               self.serde.dumps_typed(stored), self.serde.dumps_typed(metadata))
+        self._store_checkpoint(row, blobs, time.time())
+        self._maybe_evict()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+    ) -> None:
+        configurable = config["configurable"]
+        rows = [
+            (task_id, WRITES_IDX_MAP.get(channel, idx), channel, self.serde.dumps_typed(value))
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        # special writes (errors, interrupts) replace earlier ones, regular writes are kept once
+        overwrite = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        self._store_writes(configurable["thread_id"], configurable.get("checkpoint_ns", ""),
+                           configurable["checkpoint_id"], rows, overwrite)
+
+    # The storage calls block, the async variants run them on the default executor
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+    ) -> None:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.put_writes, config, writes, task_id)
+
+    def get_next_version(self, current: Optional[str], channel) -> str:
+        # same scheme as MemorySaver: sortable counter plus a random suffix
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS checkpoint_writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS checkpoint_threads (
+    thread_id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS checkpoint_threads_last_seen ON checkpoint_threads (last_seen);
+"""
+
+
+class SqliteCheckpointSaver(DeltaCheckpointSaver):
+    """Checkpoints in a local SQLite file, for single node deployments.
+
+    The database runs in WAL mode so readers do not block the writer, and
+    connections come from a fixed size pool shared by all threads.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_SQLITE_PATH, pool_size: int = CHECKPOINT_POOL_SIZE, **kwargs):
+        super().__init__(**kwargs)
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._connection() as conn:
+            conn.executescript(_SQLITE_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self, write: bool = False):
+        conn = self._pool.get()
+        try:
+            if write:
+                conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                if write:
+                    conn.execute("ROLLBACK")
+                raise
+            if write:
+                conn.execute("COMMIT")
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get().close()
+
+    def _store_checkpoint(self, row, blobs, seen_at):
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint, metadata = row
+        with self._connection(write=True) as conn:
+            # a channel version never changes once written
+            conn.executemany(
+                "INSERT OR IGNORE INTO checkpoint_blobs VALUES (?, ?, ?, ?, ?, ?)",
+                [(thread_id, checkpoint_ns, channel, str(version), *value) for channel, version, value in blobs])
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint_id, parent_id, *checkpoint, *metadata))
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoint_threads VALUES (?, ?)", (thread_id, seen_at))
+
+    def _load_checkpoints(self, thread_id, checkpoint_ns, checkpoint_id, before_id, limit):
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,"
+                 " type, checkpoint, metadata_type, metadata FROM checkpoints")
+        conditions, params = [], []
+        for column, value in (("thread_id", thread_id), ("checkpoint_ns", checkpoint_ns),
+                              ("checkpoint_id", checkpoint_id)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if before_id is not None:
+            conditions.append("checkpoint_id < ?")
+            params.append(before_id)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY checkpoint_id DESC"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        with self._connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [(r[0], r[1], r[2], r[3], (r[4], r[5]), (r[6], r[7])) for r in rows]
+
+    def _load_blobs(self, thread_id, checkpoint_ns, versions):
+        if not versions:
+            return {}
+        pairs = " OR ".join(["(channel = ? AND version = ?)"] * len(versions))
+        params = [thread_id, checkpoint_ns]
+        for channel, version in versions.items():
+            params += [channel, str(version)]
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT channel, type, blob FROM checkpoint_blobs"
+                f" WHERE thread_id = ? AND checkpoint_ns = ? AND ({pairs})", params).fetchall()
+        return {channel: (type_, blob) for channel, type_, blob in rows}
+
+    def _load_writes(self, thread_id, checkpoint_ns, checkpoint_id):
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT task_id, channel, type, blob FROM checkpoint_writes"
+                " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id)).fetchall()
+        return [(task_id, channel, (type_, blob)) for task_id, channel, type_, blob in rows]
+
+    def _store_writes(self, thread_id, checkpoint_ns, checkpoint_id, writes, overwrite):
+        verb = "INSERT OR REPLACE" if overwrite else "INSERT OR IGNORE"
+        with self._connection(write=True) as conn:
+            conn.executemany(
+                f"{verb} INTO checkpoint_writes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, *value)
+                 for task_id, idx, channel, value in writes])
+
+    def evict_idle_threads(self, idle_since):
+        idle = "SELECT thread_id FROM checkpoint_threads WHERE last_seen < ?"
+        with self._connection(write=True) as conn:
+            for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id IN ({idle})", (idle_since,))
+            return conn.execute("DELETE FROM checkpoint_threads WHERE last_seen < ?", (idle_since,)).rowcount
+
+
+class MongoCheckpointSaver(DeltaCheckpointSaver):
+    """Checkpoints in MongoDB, so several app workers can serve the same conversations.
+
+    Uses the application's `MongoClient`, whose connection pool is shared
+    with the vector store.
+    """
+
+    def __init__(self, client=None, db_name: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        if client is None or db_name is None:
+            from utils.vector_store import get_mongo_client, DB_NAME
+            client = client or get_mongo_client()
+            db_name = db_name or DB_NAME
+        db = client[db_name]
+        self.checkpoints = db["checkpoints"]
+        self.blobs = db["checkpoint_blobs"]
+        self.writes = db["checkpoint_writes"]
+        self.threads = db["checkpoint_threads"]
+        self.checkpoints.create_index(
+            [("thread_id", 1), ("checkpoint_ns", 1), ("checkpoint_id", -1)], unique=True)
+        self.blobs.create_index(
+            [("thread_id", 1), ("checkpoint_ns", 1), ("channel", 1), ("version", 1)], unique=True)
+        self.writes.create_index(
+            [("thread_id", 1), ("checkpoint_ns", 1), ("checkpoint_id", 1), ("task_id", 1), ("idx", 1)],
+            unique=True)
+        self.threads.create_index("last_seen")
+
+    def _store_checkpoint(self, row, blobs, seen_at):
+        from pymongo import UpdateOne
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint, metadata = row
+        if blobs:
+            self.blobs.bulk_write([
+                UpdateOne(
+                    {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                     "channel": channel, "version": str(version)},
+                    {"$setOnInsert": {"type": value[0], "blob": value[1]}},
+                    upsert=True)
+                for channel, version, value in blobs
+            ], ordered=False)
+        self.checkpoints.replace_one(
+            {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id},
+            {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+             "parent_checkpoint_id": parent_id, "type": checkpoint[0], "checkpoint": checkpoint[1],
+             "metadata_type": metadata[0], "metadata": metadata[1]},
+            upsert=True)
+        self.threads.update_one({"_id": thread_id}, {"$set": {"last_seen": seen_at}}, upsert=True)
+
+    def _load_checkpoints(self, thread_id, checkpoint_ns, checkpoint_id, before_id, limit):
+        query = {}
+        if thread_id is not None:
+            query["thread_id"] = thread_id
+        if checkpoint_ns is not None:
+            query["checkpoint_ns"] = checkpoint_ns
+        id_query = {}
+        if checkpoint_id is not None:
+            id_query["$eq"] = checkpoint_id
+        if before_id is not None:
+            id_query["$lt"] = before_id
+        if id_query:
+            query["checkpoint_id"] = id_query
+        cursor = self.checkpoints.find(query).sort("checkpoint_id", -1)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        return [
+            (doc["thread_id"], doc["checkpoint_ns"], doc["checkpoint_id"], doc["parent_checkpoint_id"],
+             (doc["type"], doc["checkpoint"]), (doc["metadata_type"], doc["metadata"]))
+            for doc in cursor
+        ]
+
+    def _load_blobs(self, thread_id, checkpoint_ns, versions):
+        if not versions:
+            return {}
+        cursor = self.blobs.find({
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "$or": [{"channel": channel, "version": str(version)} for channel, version in versions.items()],
+        })
+        return {doc["channel"]: (doc["type"], doc["blob"]) for doc in cursor}
+
+    def _load_writes(self, thread_id, checkpoint_ns, checkpoint_id):
+        cursor = self.writes.find(
+            {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}
+        ).sort([("task_id", 1), ("idx", 1)])
+        return [(doc["task_id"], doc["channel"], (doc["type"], doc["blob"])) for doc in cursor]
+
+    def _store_writes(self, thread_id, checkpoint_ns, checkpoint_id, writes, overwrite):
+        from pymongo import UpdateOne
+        if not writes:
+            return
+        operator = "$set" if overwrite else "$setOnInsert"
+        self.writes.bulk_write([
+            UpdateOne(
+                {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+                 "task_id": task_id, "idx": idx},
+                {operator: {"channel": channel, "type": value[0], "blob": value[1]}},
+                upsert=True)
+            for task_id, idx, channel, value in writes
+        ], ordered=False)
+
+    def evict_idle_threads(self, idle_since):
+        idle = [doc["_id"] for doc in self.threads.find({"last_seen": {"$lt": idle_since}}, {"_id": 1})]
+        if not idle:
+            return 0
+        for collection in (self.checkpoints, self.blobs, self.writes):
+            collection.delete_many({"thread_id": {"$in": idle}})
+        self.threads.delete_many({"_id": {"$in": idle}})
+        return len(idle)
+
+
+def create_checkpointer(backend: str = CHECKPOINT_BACKEND) -> BaseCheckpointSaver:
+    """Checkpoint saver for the configured backend."""
+    if backend == "sqlite":
+        return SqliteCheckpointSaver()
+    if backend == "mongo":
+        return MongoCheckpointSaver()
+    if backend == "memory":
+        return MemorySaver()
+    raise ValueError(f"Unknown checkpoint backend: {backend}")
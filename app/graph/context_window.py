@@ -0,0 +1,118 @@
+import threading
+from typing import Dict, List, Sequence, Tuple
+from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage
+from config.constants import CONTEXT_TOKEN_BUDGET, CONTEXT_WINDOW_TOKENS, CONTEXT_SUMMARY_TOKENS
+from .payloads import truncate_to_budget
+from .tokens import estimate_tokens
+
+# Key of the token count cached in a message's response_metadata, checkpointed with the message
+TOKEN_COUNT_KEY = "token_count"
+
+_counters = {"summaries": 0, "summarized_messages": 0, "truncated_messages": 0, "dropped_messages": 0}
+_lock = threading.Lock()
+
+
+def _count(name: str, value: int = 1):
+    with _lock:
+        _counters[name] += value
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Prompt tokens of a message, counted once and cached on the message."""
+    count = message.response_metadata.get(TOKEN_COUNT_KEY)
+    if count is None:
+        # about 4 tokens of chat template per message
+        count = estimate_tokens(str(message.content)) + 4
+        for call in getattr(message, "tool_calls", None) or []:
+            count += estimate_tokens(f"{call['name']} {call['args']}")
+        message.response_metadata[TOKEN_COUNT_KEY] = count
+    return count
+
+
+def history_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(message_tokens(message) for message in messages)
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Messages grouped into turns, each starting at a question."""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def split_window(messages: Sequence[BaseMessage],
+                 window_tokens: int = CONTEXT_WINDOW_TOKENS) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+    """`(overflow, window)`: the newest whole turns that fit in `window_tokens`, and the older messages.
+
+    The last turn is always in the window, whatever its size.
+    """
+    window: List[BaseMessage] = []
+    used = 0
+    for turn in reversed(split_turns(messages)):
+        cost = history_tokens(turn)
+        if window and used + cost > window_tokens:
+            break
+        window = turn + window
+        used += cost
+    return list(messages[:len(messages) - len(window)]), window
+
+
+def needs_summary(messages: Sequence[BaseMessage], budget: int = CONTEXT_TOKEN_BUDGET) -> bool:
+    """Whether the history outgrew the budget and older turns can be folded into the summary."""
+    overflow, _ = split_window(messages)
+    return bool(overflow) and history_tokens(messages) > budget
+
+
+def record_summary(messages: Sequence[BaseMessage]):
+    _count("summaries")
+    _count("summarized_messages", len(messages))
+
+
+def shorten(message: BaseMessage, budget: int) -> BaseMessage:
+    """The message, or a copy with its content cut to `budget` tokens if it is longer."""
+    if message_tokens(message) <= budget or not isinstance(message.content, str):
+        return message
+    _count("truncated_messages")
+    return message.model_copy(update={"content": truncate_to_budget(message.content, budget), "response_metadata": {}})
+
+
+def fit_summary(summary: str) -> str:
+    return truncate_to_budget(summary, CONTEXT_SUMMARY_TOKENS) if summary else summary
+
+
+def fit_history(messages: Sequence[BaseMessage], budget: int = CONTEXT_TOKEN_BUDGET) -> List[BaseMessage]:
+    """Messages for a prompt: the current turn, and the newest history that fits in `budget`.
+
+    Bounds the prompt while a summary is pending. Older messages are left
+    out, and a single message larger than the budget, such as a long table
+    answer, is shortened in a copy.
+    """
+    turns = split_turns(messages)
+    history = [message for turn in turns[:-1] for message in turn]
+    current = turns[-1] if turns else []
+    kept: List[BaseMessage] = []
+    used = 0
+    for message in reversed(history):
+        cost = message_tokens(message)
+        if used + cost > budget:
+            if not kept:
+                kept.append(shorten(message, budget))
+            break
+        kept.append(message)
+        used += cost
+    kept.reverse()
+    # tool results are only valid after the call that asked for them
+    while kept and isinstance(kept[0], ToolMessage):
+        kept.pop(0)
+    if len(kept) < len(history):
+        _count("dropped_messages", len(history) - len(kept))
+    return kept + list(current)
+
+
+def get_context_stats() -> Dict[str, int]:
+    """Summaries written, messages folded into them, and history shortened or left out of prompts."""
+    with _lock:
+        return dict(_counters)
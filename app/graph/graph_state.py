@@ -1,5 +1,5 @@
 from typing_extensions import TypedDict
-from typing import Annotated, Sequence
+from typing import Annotated, Optional, Sequence
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
@@ -8,4 +8,9 @@ class GraphState(TypedDict):
     input : str
     messages: Annotated[Sequence[BaseMessage], add_messages]
     summary : str
+    formatted_query : str
+    # tool results of the thread, kept across turns by MemoToolNode
+    tool_memo : dict
+    # route the intent router took this turn, None when the model selects the tools
+    route : Optional[str]
     
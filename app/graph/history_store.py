@@ -0,0 +1,220 @@
+import re
+import time
+import logging
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, List, Optional
+import pandas as pd
+from config.constants import MARKET_DATA_HISTORY_TTLS
+from .market_cache import MarketDataCache
+
+
+def trading_days(period: str) -> Optional[int]:
+    """Return N for 'Nd' periods, which Yahoo counts in trading days."""
+    match = re.fullmatch(r"(\d+)d", period)
+    return int(match.group(1)) if match else None
+
+
+def period_start(period: str, today: pd.Timestamp) -> Optional[pd.Timestamp]:
+    """Return the first calendar date covered by a month/year based period.
+
+    Returns None for 'max', which has no lower bound.
+    """
+    if period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(today.year, 1, 1)
+    match = re.fullmatch(r"(\d+)(mo|y)", period)
+    if not match:
+        raise ValueError(f"Unsupported period: {period}")
+    count, unit = int(match.group(1)), match.group(2)
+    offset = pd.DateOffset(months=count) if unit == "mo" else pd.DateOffset(years=count)
+    return today - offset
+
+
+def slice_period(frame: pd.DataFrame, period: str, today: pd.Timestamp) -> pd.DataFrame:
+    """Return the rows of a date-sorted history that fall inside a period."""
+    if frame.empty or period == "max":
+        return frame
+    days = trading_days(period)
+    if days:
+        dates = frame.index.normalize().unique()
+        start = dates[-min(days, len(dates))]
+    else:
+        start = period_start(period, today)
+    return frame.iloc[frame.index.searchsorted(start):]
+
+
+def merge_history(newer: pd.DataFrame, older: pd.DataFrame) -> pd.DataFrame:
+    """Combine two histories, preferring rows from `newer` where dates overlap."""
+    if older.empty:
+        return newer
+    if newer.empty:
+        return older
+    return pd.concat([older[~older.index.isin(newer.index)], newer]).sort_index()
+
+
+class _History:
+    """Widest history fetched so far for one symbol and interval.
+
+    `start` is the first date the frame is complete from, or None when the
+    frame holds the full ('max') history.
+    """
+    __slots__ = ("frame", "start", "refreshed_at")
+
+    def __init__(self, frame, start, refreshed_at=None):
+        self.frame = frame
+        self.start = start
+        self.refreshed_at = time.monotonic() if refreshed_at is None else refreshed_at
+
+    def __sizeof__(self):
+        return int(self.frame.memory_usage(deep=True).sum())
+
+    def covers(self, period, today):
+        if self.start is None or self.frame.empty:
+            return True
+        if period == "max":
+            return False
+        days = trading_days(period)
+        if days:
+            return self.frame.index.normalize().nunique() >= days
+        return self.start <= period_start(period, today)
+
+    def is_stale(self, period):
+        return time.monotonic() - self.refreshed_at > MARKET_DATA_HISTORY_TTLS[period]
+
+
+class HistoryStore:
+    """Serve any period for a symbol by slicing the widest history already fetched.
+
+    When a request needs more history than is cached, only the missing older
+    range is downloaded and prepended. Stale entries are refreshed by
+    downloading the bars since the last cached date.
+    """
+
+    def __init__(self, cache: MarketDataCache, get_provider: Callable):
+        self._cache = cache
+        self._get_provider = get_provider
+        # Per-symbol locks serialise updates so concurrent sessions never fetch
+        # the same range twice, while different symbols are fetched in parallel
+        self._locks: Dict[tuple, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._counters = {"downloads": 0, "extensions": 0, "refreshes": 0}
+
+    @staticmethod
+    def _key(symbol, interval):
+        return (symbol, "history", interval)
+
+    @contextmanager
+    def _locked(self, symbols, interval):
+        with self._locks_guard:
+            locks = [self._locks.setdefault((symbol, interval), threading.Lock()) for symbol in sorted(symbols)]
+        with ExitStack() as stack:
+            for lock in locks:
+                stack.enter_context(lock)
+            yield
+
+    def _entries(self, symbols, interval, peek=False):
+        lookup = self._cache.peek if peek else self._cache.get
+        return {symbol: lookup(self._key(symbol, interval)) for symbol in symbols}
+
+    @staticmethod
+    def _plan(entry, period, today):
+        if entry is None or (entry.frame.empty and entry.is_stale(period)):
+            return "download"
+        if not entry.covers(period, today):
+            return "download" if period == "max" or trading_days(period) else "extend"
+        if entry.is_stale(period):
+            return "refresh"
+        return None
+
+    def get_histories(self, symbols: List[str], period: str = "1mo", interval: str = "1d") -> Dict[str, pd.DataFrame]:
+        """Return the history for each symbol over the requested period.
+
+        The returned frames are shared with the cache and must not be modified in place.
+        """
+        provider = self._get_provider()
+        today = provider.today()
+        keys = {symbol: symbol.upper() for symbol in symbols}
+        entries = self._entries(set(keys.values()), interval)
+        pending = [symbol for symbol, entry in entries.items() if self._plan(entry, period, today)]
+        if pending:
+            with self._locked(pending, interval):
+                # Another session may have fetched the data while we waited
+                current = self._entries(pending, interval, peek=True)
+                current.update(self._update(provider, current, period, interval, today))
+                entries.update(current)
+        return {symbol: slice_period(entries[key].frame, period, today) for symbol, key in keys.items()}
+
+    def _update(self, provider, entries, period, interval, today):
+        plans = {}
+        for symbol, entry in entries.items():
+            plans.setdefault(self._plan(entry, period, today), []).append(symbol)
+        updated = {}
+
+        if "download" in plans:
+            symbols = plans["download"]
+            self._counters["downloads"] += 1
+            logging.info(f"---Downloading {period} history for {len(symbols)} symbols---")
+            histories = split_history_frame(provider.download_history(symbols, period, interval), symbols)
+            for symbol in symbols:
+                hist = histories[symbol]
+                if trading_days(period):
+                    start = hist.index[0].normalize() if not hist.empty else today
+                else:
+                    start = period_start(period, today)
+                entry = entries[symbol]
+                if entry is not None:
+                    hist = merge_history(hist, entry.frame)
+                    start = None if start is None or entry.start is None else min(start, entry.start)
+                updated[symbol] = _History(hist, start)
+
+        if "extend" in plans:
+            symbols = plans["extend"]
+            self._counters["extensions"] += 1
+            start = period_start(period, today)
+            # end is exclusive, so overlap by a day and let the merge drop duplicates
+            end = max(entries[symbol].start for symbol in symbols) + pd.Timedelta(days=1)
+            logging.info(f"---Extending history for {len(symbols)} symbols back to {start.date()}---")
+            older = split_history_frame(provider.download_history_range(symbols, start, end, interval), symbols)
+            for symbol in symbols:
+                entry = entries[symbol]
+                updated[symbol] = _History(merge_history(entry.frame, older[symbol]), start, entry.refreshed_at)
+
+        # Extended entries may still be stale, so refresh them too
+        stale = plans.get("refresh", []) + [
+            symbol for symbol in plans.get("extend", []) if updated[symbol].is_stale(period)]
+        if stale:
+            self._counters["refreshes"] += 1
+            current = {symbol: updated.get(symbol, entries[symbol]) for symbol in stale}
+            start = min(entry.frame.index[-1].normalize() for entry in current.values())
+            logging.info(f"---Refreshing history for {len(stale)} symbols since {start.date()}---")
+            newer = split_history_frame(provider.download_history_range(stale, start, None, interval), stale)
+            for symbol, entry in current.items():
+                updated[symbol] = _History(merge_history(newer[symbol], entry.frame), entry.start)
+
+        for symbol, entry in updated.items():
+            self._cache.put(self._key(symbol, interval), entry, max(MARKET_DATA_HISTORY_TTLS.values()))
+        return updated
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._counters)
+
+
+def split_history_frame(frame: pd.DataFrame, symbols: List[str]) -> Dict[str, pd.DataFrame]:
+    """Split a (symbol, field) frame into one history per requested symbol.
+
+    Rows that exist only because another symbol traded on that date are dropped,
+    so each history matches what a single-symbol download would return.
+    """
+    histories = {}
+    tickers = set(frame.columns.get_level_values(0)) if not frame.empty else set()
+    for symbol in symbols:
+        key = symbol.upper()
+        if key not in tickers:
+            histories[symbol] = pd.DataFrame()
+            continue
+        hist = frame[key]
+        missing = hist.isna().all(axis=1)
+        histories[symbol] = hist[~missing] if missing.any() else hist
+    return histories
@@ -0,0 +1,100 @@
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+PANEL_FIELDS = ("Close", "High", "Low", "Volume")
+
+
+def build_panel(histories: Dict[str, pd.DataFrame]) -> Tuple[List[str], Dict[str, np.ndarray], np.ndarray]:
+    """Stack per-symbol histories into N x T arrays, one per price field.
+
+    Histories are right-aligned on their latest bar and left-padded with NaN,
+    so column -1 is always the most recent bar of every symbol.
+
+    Returns:
+        tuple: symbols, {field: N x T array}, number of bars per symbol
+    """
+    symbols = list(histories)
+    lengths = np.array([len(histories[symbol]) for symbol in symbols])
+    width = int(lengths.max()) if len(lengths) else 0
+    panel = {field: np.full((len(symbols), width), np.nan) for field in PANEL_FIELDS}
+    for row, symbol in enumerate(symbols):
+        hist = histories[symbol]
+        for field in PANEL_FIELDS:
+            panel[field][row, width - len(hist):] = hist[field].to_numpy(dtype=float)
+    return symbols, panel, lengths
+
+
+def rolling_mean_last(values: np.ndarray, lengths: np.ndarray, window: int) -> np.ndarray:
+    """Last value of a `window`-bar rolling mean for every row.
+
+    Rows with fewer than `window` bars get NaN, like pandas' rolling mean.
+    """
+    if values.shape[1] < window:
+        return np.full(values.shape[0], np.nan)
+    csum = np.cumsum(values[:, -window:], axis=1)
+    means = csum[:, -1] / window
+    means[lengths < window] = np.nan
+    return means
+
+
+def pct_change_mean(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    """Mean of the `periods`-bar percentage change for every row, ignoring NaN."""
+    if values.shape[1] <= periods:
+        return np.full(values.shape[0], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        changes = values[:, periods:] / values[:, :-periods] - 1
+    valid = ~np.isnan(changes)
+    with np.errstate(invalid="ignore"):
+        totals = np.where(valid, changes, 0).sum(axis=1)
+        return totals / valid.sum(axis=1)
+
+
+def rsi_last(close: np.ndarray, lengths: np.ndarray, period: int = 14) -> np.ndarray:
+    """Latest RSI for every row, matching `calculate_rsi`'s simple averages."""
+    delta = np.diff(close, axis=1, prepend=np.nan)
+    # the first bar has no change and counts as neither gain nor loss
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    avg_gain = rolling_mean_last(gain, lengths, period)
+    avg_loss = rolling_mean_last(loss, lengths, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+def compute_indicators(histories: Dict[str, pd.DataFrame]) -> Dict[str, dict]:
+    """Compute trend, RSI, support/resistance, volume trend and momentum for many symbols.
+
+    Every indicator is evaluated column-wise over the whole panel in one pass,
+    and only the latest value of each rolling series is computed.
+
+    Args:
+        histories (Dict[str, pd.DataFrame]): Non-empty OHLCV history per symbol
+
+    Returns:
+        Dict[str, dict]: Indicators per symbol, in the same format as
+            `retreive_stock_indicators_for_single_stock`
+    """
+    symbols, panel, lengths = build_panel(histories)
+    close = panel["Close"]
+
+    sma_20 = rolling_mean_last(close, lengths, 20)
+    sma_50 = rolling_mean_last(close, lengths, 50)
+    rsi = rsi_last(close, lengths)
+    support = np.nanmin(panel["Low"], axis=1)
+    resistance = np.nanmax(panel["High"], axis=1)
+    volume_change = pct_change_mean(panel["Volume"])
+    momentum = pct_change_mean(close, 5)
+
+    return {
+        symbol: {
+            "trend": "bullish" if sma_20[row] > sma_50[row] else "bearish",
+            "rsi": rsi[row],
+            "support": support[row],
+            "resistance": resistance[row],
+            "volume_trend": "increasing" if volume_change[row] > 0 else "decreasing",
+            "momentum": "positive" if momentum[row] > 0 else "negative"
+        }
+        for row, symbol in enumerate(symbols)
+    }
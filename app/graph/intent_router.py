@@ -0,0 +1,193 @@
+import re
+import threading
+import uuid
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from config.symbols import COMPANY_ALIASES
+from .query_classifier import find_symbols
+
+# Routes in the order their keywords are checked, each maps to one tool
+_INTENTS = {
+    "returns": re.compile(
+        r"\b(returns?|invest(ed|ing)?|gains?|profits?|would .{0,40}\b(be )?worth)\b", re.IGNORECASE),
+    "indicators": re.compile(
+        r"\b(rsi|indicators?|technicals?|technical analysis|trend(s|ing)?|bullish|bearish|support|resistance|"
+        r"momentum|overbought|oversold)\b", re.IGNORECASE),
+    "news": re.compile(
+        r"\b(news|headlines?|articles?|announce(d|s|ments?)?|press releases?|reported|happening)\b", re.IGNORECASE),
+    "metrics": re.compile(
+        r"\b(prices?|quotes?|trading at|market cap(italization)?|p/?e( ratio)?|volume|metrics|52[- ]week|"
+        r"dividends?|stock data|valuation|how (did|has|is) .{0,40}\bperform(ing|ed)?)\b", re.IGNORECASE),
+}
+
+# Questions the tools cannot answer directly, or that need the model to pick
+# the arguments, e.g. "stocks with an RSI below 30"
+_NEEDS_MODEL = re.compile(
+    r"\b(should i|recommend|predict|forecast|explain|why|best|worst|which|screen|"
+    r"(below|above|under|over|less than|greater than|more than)\s+\d)\b",
+    re.IGNORECASE,
+)
+# Questions about the future, "the price of TSLA in 10 days", ask for a forecast rather than data,
+# unless they look back, "what would $2000 have made in a month"
+_FUTURE = re.compile(
+    r"\b(will|going to|expected|tomorrow|next (day|week|month|quarter|year)|"
+    r"in (\d+|a|an|one|two|three|five|six|ten|twelve)[\s-]*(day|week|month|quarter|year)s?)\b",
+    re.IGNORECASE,
+)
+_PAST = re.compile(r"\b(ago|last|past|previous|have|had|did|was|were)\b", re.IGNORECASE)
+
+_SPAN = re.compile(
+    r"\b(?:(\d+|a|an|one|two|three|five|six|ten|twelve)[\s-]*)?(day|week|month|quarter|year)s?\b", re.IGNORECASE)
+_WORD_NUMBERS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "five": 5, "six": 6, "ten": 10, "twelve": 12}
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "quarter": 91, "year": 365}
+_YTD = re.compile(r"\b(ytd|year to date|this year)\b", re.IGNORECASE)
+_ALL_TIME = re.compile(r"\b(all[- ]time|since (ipo|listing)|max(imum)? period)\b", re.IGNORECASE)
+_TODAY = re.compile(r"\b(today|intraday)\b", re.IGNORECASE)
+# "$5,000", "5000 dollars" or "5k"
+_AMOUNT = re.compile(r"\$\s?(\d[\d,]*(?:\.\d+)?)\s*(k\b)?|\b(\d[\d,]*(?:\.\d+)?)\s*(?:(k)\b|(?:dollars|usd)\b)",
+                     re.IGNORECASE)
+
+# Smallest value of each tool argument that covers a span of days
+_HISTORY_PERIODS = [(1, "1d"), (7, "5d"), (31, "1mo"), (92, "3mo"), (186, "6mo"), (366, "1y"), (732, "2y"),
+                    (1830, "5y"), (3660, "10y")]
+_RETURN_PERIODS = [(7, "1_week"), (31, "1_month"), (92, "3_months"), (186, "6_months"), (366, "1_year")]
+_NEWS_WINDOWS = [(1, "day"), (7, "week"), (31, "month"), (92, "quarter"), (366, "year")]
+
+_stats = {"checked": 0, "routed": 0}
+_routes: Dict[str, int] = {}
+_fallbacks: Dict[str, int] = {}
+# turns, total seconds and the latest latencies per route
+_latencies: Dict[str, list] = {}
+_LATENCY_SAMPLES = 1024
+_stats_lock = threading.Lock()
+
+
+def span_days(text: str) -> Optional[int]:
+    """Length in days of the longest time span the text mentions, e.g. "6 months" -> 186."""
+    days = []
+    for count, unit in _SPAN.findall(text):
+        count = int(count) if count.isdigit() else _WORD_NUMBERS.get(count.lower(), 1)
+        days.append(count * _UNIT_DAYS[unit.lower()])
+    if _TODAY.search(text):
+        days.append(1)
+    return max(days) if days else None
+
+
+def _covering(days: int, options: List[Tuple[int, str]]) -> Optional[str]:
+    for limit, value in options:
+        if days <= limit:
+            return value
+    return None
+
+
+def history_period(text: str) -> Optional[str]:
+    """yfinance history period for the time span of the question, None if it mentions none."""
+    if _YTD.search(text):
+        return "ytd"
+    if _ALL_TIME.search(text):
+        return "max"
+    days = span_days(text)
+    return (_covering(days, _HISTORY_PERIODS) or "max") if days else None
+
+
+def investment_amount(text: str) -> Optional[float]:
+    match = _AMOUNT.search(text)
+    if not match:
+        return None
+    number, thousands = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+    return float(number.replace(",", "")) * (1000 if thousands else 1)
+
+
+def _call(name: str, args: dict) -> dict:
+    return {"name": name, "args": args, "id": f"route_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
+
+
+def _tool_calls(intent: str, query: str, symbols: List[str]) -> Tuple[Optional[List[dict]], str]:
+    """Tool calls answering an intent, or None and the reason the model has to decide."""
+    period = history_period(query)
+    if intent == "news":
+        days = span_days(query)
+        args = {"news_data_request": query}
+        if days:
+            window = _covering(days, _NEWS_WINDOWS)
+            if window is None:
+                return None, "unsupported_period"
+            args["time_window"] = window
+        if not symbols:
+            return [_call("retrieve_news_data", args)], intent
+        return [_call("retrieve_news_data", {**args, "stock_symbol": symbol}) for symbol in symbols], intent
+
+    if not symbols:
+        return None, "no_symbols"
+    if intent == "returns":
+        args = {}
+        if span_days(query):
+            args["time_period"] = _covering(span_days(query), _RETURN_PERIODS)
+            if args["time_period"] is None:
+                return None, "unsupported_period"
+        amount = investment_amount(query)
+        if amount is not None:
+            args["investment_amount"] = amount
+        return [_call("calculate_stock_returns", {"stock_symbol": symbol, **args}) for symbol in symbols], intent
+
+    args = {"period": period} if period else {}
+    if intent == "indicators" and len(symbols) == 1:
+        return [_call("retreive_stock_indicators_for_single_stock", {"stock_symbol": symbols[0], **args})], intent
+    if intent == "indicators":
+        return [_call("retrieve_stock_indicators_for_multiple_stocks", {"stock_symbols": symbols, **args})], intent
+    return [_call("retrieve_stocks_data", {"stock_symbols": symbols, **args})], intent
+
+
+def route_query(query: str) -> Tuple[Optional[List[dict]], str]:
+    """Tool calls for a question with one clear intent, without asking the model.
+
+    The question has to be standalone, it is the formatted query. Symbols
+    are found with the local company dictionary, periods with regexes, and
+    the intent with keywords. Questions with no intent, several intents,
+    symbols outside the dictionary or anything the model has to reason
+    about are not routed. Returns `(tool_calls, route)`, with `tool_calls`
+    None and the fallback reason as `route` when the model has to choose.
+    """
+    intents = [intent for intent, pattern in _INTENTS.items() if pattern.search(query)]
+    symbols = find_symbols(query)
+    if _NEEDS_MODEL.search(query) or (_FUTURE.search(query) and not _PAST.search(query)):
+        tool_calls, route = None, "needs_model"
+    elif not intents:
+        tool_calls, route = None, "no_intent"
+    elif len(intents) > 1:
+        tool_calls, route = None, "ambiguous"
+    elif any(symbol not in COMPANY_ALIASES for symbol in symbols):
+        tool_calls, route = None, "unknown_symbol"
+    else:
+        tool_calls, route = _tool_calls(intents[0], query, symbols)
+
+    with _stats_lock:
+        _stats["checked"] += 1
+        if tool_calls is None:
+            _fallbacks[route] = _fallbacks.get(route, 0) + 1
+        else:
+            _stats["routed"] += 1
+            _routes[route] = _routes.get(route, 0) + 1
+    return tool_calls, route
+
+
+def record_route_latency(route: Optional[str], seconds: float):
+    """Time to answer a turn, by the route it took, "llm" for turns the model routed."""
+    with _stats_lock:
+        latency = _latencies.setdefault(route or "llm", [0, 0.0, deque(maxlen=_LATENCY_SAMPLES)])
+        latency[0] += 1
+        latency[1] += seconds
+        latency[2].append(seconds)
+
+
+def get_router_stats() -> dict:
+    with _stats_lock:
+        stats = {**_stats, "routes": dict(_routes), "fallbacks": dict(_fallbacks)}
+        latencies = {route: (turns, total, sorted(recent)) for route, (turns, total, recent) in _latencies.items()}
+    stats["hit_rate"] = round(stats["routed"] / stats["checked"], 3) if stats["checked"] else 0.0
+    # the median is over the latest turns only
+    stats["latency"] = {
+        route: {"turns": turns, "mean": round(total / turns, 3), "p50": round(recent[len(recent) // 2], 3)}
+        for route, (turns, total, recent) in latencies.items()
+    }
+    return stats
@@ -0,0 +1,96 @@
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING
+import httpx
+from config.constants import LLM_CONNECT_TIMEOUT, LLM_REQUEST_TIMEOUT, LLM_MAX_RETRIES
+from config.constants import LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE, LLM_KEEPALIVE_EXPIRY
+
+# Groq API host, the same default the groq SDK uses
+GROQ_DEFAULT_BASE_URL = "https://api.groq.com"
+
+# the provider SDKs take most of the import time of the app, they are imported by the first model built
+if TYPE_CHECKING:
+    from langchain_google_genai import GoogleGenerativeAI
+    from langchain_groq import ChatGroq
+
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+
+def _http_settings() -> dict:
+    return {
+        "timeout": httpx.Timeout(LLM_REQUEST_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                               keepalive_expiry=LLM_KEEPALIVE_EXPIRY),
+    }
+
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    """Keep-alive connection pool shared by every Groq model of the process."""
+    return httpx.Client(**_http_settings())
+
+
+@lru_cache(maxsize=1)
+def get_async_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(**_http_settings())
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(model: str = "llama-3.1-8b-instant", temperature: float = 0.0) -> "ChatGroq":
+    """One ChatGroq per model and temperature, all on the shared connection pools."""
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model=model,
+        temperature=temperature,
+        request_timeout=LLM_REQUEST_TIMEOUT,
+        max_retries=LLM_MAX_RETRIES,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_gemini_llm(model: str = "gemini-1.5-flash-latest", temperature: float = 0.0) -> "GoogleGenerativeAI":
+    """One Gemini client per model and temperature, its gRPC channel stays open between calls."""
+    from langchain_google_genai import GoogleGenerativeAI
+
+    return GoogleGenerativeAI(model=model, temperature=temperature, timeout=LLM_REQUEST_TIMEOUT,
+                              max_retries=LLM_MAX_RETRIES)
+
+
+def warm_up(connect: bool = True):
+    """Build the models and chains of the graph, and open a pooled connection to Groq.
+
+    The connection is opened with the model list request, which needs no
+    tokens, so the first question does not pay for the TLS handshake.
+    """
+    from .chains import get_formulated_query_chain, get_summary_chain
+    from .nodes import get_tool_model
+
+    start = time.perf_counter()
+    get_tool_model()
+    get_summary_chain()
+    get_formulated_query_chain()
+    if connect:
+        base_url = (os.getenv("GROQ_API_BASE") or GROQ_DEFAULT_BASE_URL).rstrip("/")
+        try:
+            get_http_client().get(f"{base_url}/openai/v1/models",
+                                  headers={"Authorization": f"Bearer {os.getenv('GROQ_API_KEY', '')}"})
+        except httpx.HTTPError as e:
+            logging.warning(f"LLM connection warm-up failed: {e}")
+    logging.info(f"---LLM clients warmed up in {time.perf_counter() - start:.2f} s---")
+
+
+def start_warm_up():
+    """Warm up once per process on a background thread, safe to call on every script run."""
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=warm_up, name="llm-warm-up", daemon=True).start()
@@ -0,0 +1,177 @@
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List
+import pandas as pd
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate the memory held by a cached value in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class _CacheEntry:
+    __slots__ = ("value", "size", "expires_at", "fetched_at")
+
+    def __init__(self, value, size, ttl):
+        self.value = value
+        self.size = size
+        self.fetched_at = time.monotonic()
+        self.expires_at = self.fetched_at + ttl
+
+
+class _Flight:
+    """A fetch in progress that other callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class MarketDataCache:
+    """Thread-safe TTL cache with LRU eviction under a memory budget.
+
+    Concurrent requests for the same missing key share a single upstream
+    fetch (single-flight). Hit, miss and eviction counters are available
+    through `stats()`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "shared_fetches": 0}
+
+    def _lookup(self, key):
+        """Return a live entry and mark it recently used. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self._counters["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _store(self, key, value, ttl):
+        """Insert a value and evict least recently used entries. Caller holds the lock."""
+        size = estimate_size(value)
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            logging.warning(f"Market data for {key} ({size} bytes) exceeds the cache budget, not cached")
+            return
+        self._entries[key] = _CacheEntry(value, size, ttl)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._counters["evictions"] += 1
+
+    def get(self, key: Hashable):
+        """Return a cached value or None, without fetching."""
+        with self._lock:
+            entry = self._lookup(key)
+            self._counters["hits" if entry else "misses"] += 1
+            return entry.value if entry else None
+
+    def peek(self, key: Hashable):
+        """Like `get`, but without touching the hit/miss counters."""
+        with self._lock:
+            entry = self._lookup(key)
+            return entry.value if entry else None
+
+    def put(self, key: Hashable, value: Any, ttl: float):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Any], ttl: float) -> Any:
+        """Return the cached value for key, fetching it once if missing."""
+        return self.get_many_or_fetch([key], lambda keys: {key: fetch()}, ttl)[key]
+
+    def get_many_or_fetch(
+            self,
+            keys: Iterable[Hashable],
+            fetch_many: Callable[[List[Hashable]], Dict[Hashable, Any]],
+            ttl: float) -> Dict[Hashable, Any]:
+        """Return values for all keys, fetching every miss in a single call.
+
+        Keys already being fetched by another caller are waited on rather
+        than fetched again.
+        """
+        results, owned, waiting = {}, {}, {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._lookup(key)
+                if entry is not None:
+                    self._counters["hits"] += 1
+                    results[key] = entry.value
+                elif key in self._inflight:
+                    self._counters["shared_fetches"] += 1
+                    waiting[key] = self._inflight[key]
+                else:
+                    self._counters["misses"] += 1
+                    owned[key] = self._inflight[key] = _Flight()
+
+        if owned:
+            fetched, error = {}, None
+            try:
+                fetched = fetch_many(list(owned))
+            except Exception as e:
+                error = e
+            finally:
+                # Every owned flight is released, waiters on a key the fetch did not return get its error
+                with self._lock:
+                    missing = [key for key in owned if key not in fetched]
+                    if error is None and missing:
+                        error = KeyError(f"Fetch returned no value for {missing}")
+                    for key, flight in owned.items():
+                        del self._inflight[key]
+                        try:
+                            if error is None:
+                                flight.value = fetched[key]
+                                self._store(key, flight.value, ttl)
+                        finally:
+                            flight.error = error
+                            flight.done.set()
+            if error is not None:
+                raise error
+            results.update((key, fetched[key]) for key in owned)
+
+        for key, flight in waiting.items():
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            results[key] = flight.value
+        return results
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and current usage."""
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries), "bytes": self._bytes,
+                    "max_bytes": self.max_bytes}
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import pandas as pd
+import yfinance as yf
+from config.constants import MARKET_DATA_INFO_WORKERS, MARKET_DATA_CACHE_MAX_BYTES
+from config.constants import MARKET_DATA_INFO_TTL
+from .market_cache import MarketDataCache
+from .history_store import HistoryStore, slice_period, split_history_frame
+
+
+class MarketDataProvider(ABC):
+    """Source of price history and fundamentals for the finance tools."""
+
+    @abstractmethod
+    def download_history(self, symbols: List[str], period: str = "1mo", interval: str = "1d") -> pd.DataFrame:
+        """Download history for all symbols as one frame with (symbol, field) columns."""
+
+    @abstractmethod
+    def download_history_range(
+            self,
+            symbols: List[str],
+            start: pd.Timestamp,
+            end: Optional[pd.Timestamp] = None,
+            interval: str = "1d") -> pd.DataFrame:
+        """Like `download_history`, for dates in [start, end). A missing end means up to now."""
+
+    def today(self) -> pd.Timestamp:
+        """Date that periods such as '1mo' are counted back from."""
+        return pd.Timestamp.now().normalize()
+
+    @abstractmethod
+    def fetch_info(self, symbol: str) -> dict:
+        """Return the fundamentals dictionary for a single symbol."""
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Fetch market data from Yahoo Finance."""
+
+    # yf.download collects its results in module globals, so bulk downloads
+    # must not overlap between sessions
+    _download_lock = threading.Lock()
+
+    def download_history(self, symbols, period="1mo", interval="1d"):
+        return self._download(symbols, period=period, interval=interval)
+
+    def download_history_range(self, symbols, start, end=None, interval="1d"):
+        return self._download(symbols, start=start, end=end, interval=interval)
+
+    def _download(self, symbols, **kwargs):
+        if len(symbols) == 1:
+            # Ticker.history keeps no global state, so single symbols can be fetched in parallel
+            hist = yf.Ticker(symbols[0]).history(auto_adjust=True, actions=False, **kwargs)
+            if not hist.empty:
+                hist.index = hist.index.tz_localize(None)
+            return pd.concat({symbols[0].upper(): hist}, axis=1, names=["Ticker", "Price"])
+        with self._download_lock:
+            return yf.download(
+                symbols,
+                group_by="ticker",
+                auto_adjust=True,
+                ignore_tz=True,
+                progress=False,
+                **kwargs,
+            )
+
+    def fetch_info(self, symbol):
+        return yf.Ticker(symbol).info
+
+
+class FixtureProvider(MarketDataProvider):
+    """Serve recorded market data from a directory, for offline benchmarks.
+
+    Histories are stored as `<SYMBOL>_<interval>.pkl` and fundamentals as
+    `<SYMBOL>_info.json`. Periods are counted back from `as_of` (default:
+    today), and an optional latency is added to every call to mimic the
+    upstream round trip.
+    """
+
+    def __init__(self, fixtures_dir: str, latency: float = 0.0, as_of: Optional[str] = None):
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.as_of = pd.Timestamp(as_of).normalize() if as_of else None
+
+    def _history_path(self, symbol, interval):
+        return os.path.join(self.fixtures_dir, f"{symbol.upper()}_{interval}.pkl")
+
+    def _info_path(self, symbol):
+        return os.path.join(self.fixtures_dir, f"{symbol.upper()}_info.json")
+
+    def _load(self, symbols, interval, select):
+        time.sleep(self.latency)
+        frames = {}
+        for symbol in dict.fromkeys(s.upper() for s in symbols):
+            path = self._history_path(symbol, interval)
+            frames[symbol] = select(pd.read_pickle(path)) if os.path.exists(path) else pd.DataFrame()
+        return pd.concat(frames, axis=1, sort=True, names=["Ticker", "Price"])
+
+    def today(self):
+        return self.as_of if self.as_of is not None else super().today()
+
+    def download_history(self, symbols, period="1mo", interval="1d"):
+        today = self.today()
+        return self._load(symbols, interval, lambda hist: slice_period(hist[hist.index < today + pd.Timedelta(days=1)], period, today))
+
+    def download_history_range(self, symbols, start, end=None, interval="1d"):
+        end = end if end is not None else self.today() + pd.Timedelta(days=1)
+        return self._load(symbols, interval, lambda hist: hist[(hist.index >= start) & (hist.index < end)])
+
+    def fetch_info(self, symbol):
+        time.sleep(self.latency)
+        path = self._info_path(symbol)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as file:
+            return json.load(file)
+
+    def record(self, source: MarketDataProvider, symbols: List[str], period: str = "max", interval: str = "1d"):
+        """Capture history and fundamentals from another provider into the fixtures directory."""
+        os.makedirs(self.fixtures_dir, exist_ok=True)
+        histories = split_history_frame(source.download_history(symbols, period, interval), symbols)
+        for symbol, hist in histories.items():
+            hist.to_pickle(self._history_path(symbol, interval))
+            with open(self._info_path(symbol), "w") as file:
+                json.dump(source.fetch_info(symbol), file, default=str)
+
+
+_provider: MarketDataProvider = YFinanceProvider()
+_info_pool = ThreadPoolExecutor(max_workers=MARKET_DATA_INFO_WORKERS, thread_name_prefix="market-info")
+# Shared by every session in the process
+market_cache = MarketDataCache(max_bytes=MARKET_DATA_CACHE_MAX_BYTES)
+history_store = HistoryStore(market_cache, lambda: _provider)
+
+
+def get_provider() -> MarketDataProvider:
+    return _provider
+
+
+def set_provider(provider: MarketDataProvider):
+    """Swap the provider used by the finance tools (e.g. for a FixtureProvider)."""
+    global _provider
+    _provider = provider
+    market_cache.clear()
+
+
+def get_cache_stats() -> Dict[str, int]:
+    return {**market_cache.stats(), **history_store.stats()}
+
+
+def get_histories(symbols: List[str], period: str = "1mo", interval: str = "1d") -> Dict[str, pd.DataFrame]:
+    """Fetch history for all symbols, served from the widest cached window where possible.
+
+    The returned frames are shared with the cache and must not be modified in place.
+    """
+    return history_store.get_histories(symbols, period, interval)
+
+
+def get_history(symbol: str, period: str = "1mo", interval: str = "1d") -> pd.DataFrame:
+    return get_histories([symbol], period, interval)[symbol]
+
+
+def get_infos(symbols: List[str]) -> Dict[str, dict]:
+    """Fetch fundamentals for all symbols concurrently on a bounded worker pool."""
+    def fetch_many(keys):
+        missing = [symbol for symbol, _, _ in keys]
+        return dict(zip(keys, _info_pool.map(_provider.fetch_info, missing)))
+
+    keys = {symbol: (symbol.upper(), "info", None) for symbol in symbols}
+    cached = market_cache.get_many_or_fetch(keys.values(), fetch_many, MARKET_DATA_INFO_TTL)
+    return {symbol: cached[key] for symbol, key in keys.items()}
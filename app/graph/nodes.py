@@ -1,34 +1,52 @@
 from .graph_state import GraphState
 from langchain_core.messages import HumanMessage, AIMessage, RemoveMessage, SystemMessage, ToolMessage, BaseMessage
-from .chains import get_formulated_query_chain
-from langchain_core.output_parsers import StrOutputParser
-from langchain_groq import ChatGroq
+from .chains import get_formulated_query_chain, get_summary_chain
+from .llm_registry import get_chat_model
+from .query_classifier import classify_query
+from .response_cache import response_cache, response_ttl, tool_data_fingerprints
+from .tool_memo import MemoToolNode, tool_loop_exhausted, turn_messages
+from .intent_router import route_query
+from .context_window import fit_history, fit_summary, message_tokens, needs_summary, record_summary
+from .context_window import shorten, split_window
+from config.constants import RESPONSE_CACHE_ENABLED, INTENT_ROUTER_ENABLED
+from config.constants import CONTEXT_WINDOW_TOKENS, CONTEXT_SUMMARY_TOKENS
+from utils.vector_store import get_vector_store
+from functools import lru_cache
 import logging
 from .tools import retrieve_news_data, retrieve_stocks_data, retreive_stock_indicators_for_single_stock, calculate_stock_returns
-from langgraph.prebuilt import ToolNode
+from .tools import retrieve_stock_indicators_for_multiple_stocks
+from .async_tools import with_async_tools
+from .payloads import EMPTY_PAYLOADS, with_compact_output
+from .tokens import record_model_call
 from langgraph.graph import  END
 from typing import Literal
 
-tools = [
+# results reach the model as compact text within a token budget per tool
+tools = [with_compact_output(tool) for tool in with_async_tools([
     retrieve_news_data,
     retrieve_stocks_data,
     retreive_stock_indicators_for_single_stock,
+    retrieve_stock_indicators_for_multiple_stocks,
     calculate_stock_returns
-]
-model_with_tools = ChatGroq(
-    model="llama-3.1-8b-instant", temperature=0.0).bind_tools(tools)
+])]
 
-tool_node = ToolNode(tools)
 
-def call_model(state: GraphState):
-    
-    
-    summary = state.get("summary", "")
+@lru_cache(maxsize=1)
+def get_tool_model():
+    return get_chat_model().bind_tools(tools)
+
+
+# tool results are memoized per thread, and repeated identical calls are refused
+tool_node = MemoToolNode(tools)
+
+def _model_messages(state: GraphState):
+    # the history is bounded by the token budget while its summary is pending
+    summary = fit_summary(state.get("summary", ""))
     if summary:
         system_message = f"Summary of conversation earlier: {summary}"
-        messages = [SystemMessage(content=system_message)] + state["messages"]
+        messages = [SystemMessage(content=system_message)] + fit_history(state["messages"])
     else:
-        messages = state["messages"]
+        messages = fit_history(state["messages"])
 
     system_message = (
         "You are a expert in stock data and financial news data analys."
@@ -39,16 +57,139 @@ def call_model(state: GraphState):
 
     messages =[SystemMessage(content=system_message)] + messages
     print(messages)
-    response = model_with_tools.invoke(messages)
+    return messages
+
+
+def _routed_data_missing(messages) -> bool:
+    """Whether a tool call of this turn failed or found nothing."""
+    return any(
+        message.status == "error" or str(message.content).strip() in EMPTY_PAYLOADS
+        for message in turn_messages(messages) if isinstance(message, ToolMessage)
+    )
+
+
+def _agent_model(state: GraphState):
+    # routed turns already have their data, the model only writes the answer,
+    # unless a routed call came back empty and the model has to choose other tools
+    if state.get("route"):
+        if not _routed_data_missing(state["messages"]):
+            return get_chat_model()
+        logging.info("---Routed tool call found no data, the model selects the tools---")
+    # once a repeated tool call was refused the model has to answer with what it has
+    if tool_loop_exhausted(state["messages"]):
+        logging.info("---Tool call limit reached, answering without tools---")
+        return get_chat_model()
+    return get_tool_model()
+
+
+def call_model(state: GraphState):
+    messages = _model_messages(state)
+    response = _agent_model(state).invoke(messages)
+    record_model_call(messages, response)
+    message_tokens(response)
     return {"messages": [response]}
 
 
-def should_use_tools(state: GraphState) ->Literal["tools","delete_messages"] :
+async def acall_model(state: GraphState):
+    messages = _model_messages(state)
+    response = await _agent_model(state).ainvoke(messages)
+    record_model_call(messages, response)
+    message_tokens(response)
+    return {"messages": [response]}
+
+
+def should_use_tools(state: GraphState) ->Literal["tools","cache_response"] :
     messages = state["messages"]
     last_message = messages[-1]
     if last_message.tool_calls:
         return "tools"
+    return "cache_response"
+
+
+def _cached_answer_update(state: GraphState, query_vector):
+  answer = response_cache.lookup(state["formatted_query"], query_vector)
+  if answer is None:
+    return {}
+  logging.info("---Answer served from the response cache---")
+  return {"messages": [AIMessage(answer)]}
+
+
+def check_response_cache(state: GraphState):
+  """Answer from the response cache when a similar question was answered recently"""
+  if not RESPONSE_CACHE_ENABLED:
+    return {}
+  try:
+    query_vector = get_vector_store().embeddings.embed_query(state["formatted_query"])
+  except Exception as e:
+    logging.error(f"Response cache lookup failed: {e}")
+    return {}
+  return _cached_answer_update(state, query_vector)
+
+
+async def acheck_response_cache(state: GraphState):
+  if not RESPONSE_CACHE_ENABLED:
+    return {}
+  try:
+    query_vector = await get_vector_store().embeddings.aembed_query(state["formatted_query"])
+  except Exception as e:
+    logging.error(f"Response cache lookup failed: {e}")
+    return {}
+  return _cached_answer_update(state, query_vector)
+
+
+def route_after_cache_check(state: GraphState) -> Literal["route_intent", "delete_messages"]:
+  # a cache hit appends the answer after the question
+  if isinstance(state["messages"][-1], AIMessage):
     return "delete_messages"
+  return "route_intent"
+
+
+def route_intent(state: GraphState):
+  """Call the tools for common questions directly, skipping the model's tool selection round"""
+  if not INTENT_ROUTER_ENABLED:
+    return {"route": None}
+  tool_calls, route = route_query(state["formatted_query"])
+  if tool_calls is None:
+    logging.info(f"---Question not routed ({route}), the model selects the tools---")
+    return {"route": None}
+  logging.info(f"---Question routed to {route}: {[call['name'] for call in tool_calls]}---")
+  return {"route": route, "messages": [AIMessage(content="", tool_calls=tool_calls)]}
+
+
+def route_after_intent(state: GraphState) -> Literal["tools", "agent"]:
+  if state.get("route"):
+    return "tools"
+  return "agent"
+
+
+def cache_response(state: GraphState):
+  """Store the answer of this turn in the response cache"""
+  if not RESPONSE_CACHE_ENABLED:
+    return {}
+  turn = turn_messages(state["messages"])
+  tool_calls = [call for message in turn if isinstance(message, AIMessage) for call in message.tool_calls]
+  tool_messages = [message for message in turn if isinstance(message, ToolMessage)]
+  data_fingerprints = tool_data_fingerprints(
+      tool_calls, [message for message in tool_messages if message.status != "error"])
+  if any(message.status == "error" for message in tool_messages):
+    # the data that did arrive still retires answers built on older data
+    response_cache.invalidate_changed(data_fingerprints)
+    return {}
+  try:
+    # served from the query embedding cache, it was embedded by check_response_cache
+    query_vector = get_vector_store().embeddings.embed_query(state["formatted_query"])
+  except Exception as e:
+    logging.error(f"Response cache store failed: {e}")
+    response_cache.invalidate_changed(data_fingerprints)
+    return {}
+  response_cache.store(
+      state["formatted_query"],
+      query_vector,
+      state["messages"][-1].content,
+      data_fingerprints,
+      response_ttl(tool_calls),
+  )
+  return {}
 
 
 def remove_messages(state: GraphState):
@@ -63,31 +204,27 @@ def remove_messages(state: GraphState):
    }
 
 
-def summarize_conversation(state: GraphState):
-  """Summarize a conversation and keep only limited messages in history"""
-  
-  
-  
-  llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.0)
-
+def _summary_messages(state: GraphState):
+  # only the turns that no longer fit in the window are folded into the summary
+  overflow, _ = split_window(state["messages"])
   summary = state.get("summary", "")
   if summary:
     summary_message = (
         f"This is summary of the conversation to date: {summary}\n\n"
-        "Extend the summary by taking into account the new messages above:"
+        "Extend the summary by taking into account the new messages above"
     )
 
   else:
-    summary_message = "Create a summary of the conversation above."
-  messages = state["messages"] + [HumanMessage(summary_message)]
-  
-  chain = llm | StrOutputParser()
-  logging.info("---Generating summary of the conversation---")
-  summary = chain.invoke(messages)
-  logging.info("---Completed summary of the conversation---")
-  # keep only the last 2 messages only
-  delete_messages = [RemoveMessage(id=m.id)
-                     for m in state["messages"][:-2]]
+    summary_message = "Create a summary of the conversation above"
+  summary_message += f" in at most {CONTEXT_SUMMARY_TOKENS * 3 // 4} words:"
+  return [shorten(m, CONTEXT_WINDOW_TOKENS) for m in overflow] + [HumanMessage(summary_message)]
+
+
+def _summary_update(state: GraphState, summary: str):
+  # the summarized turns are removed, the window of recent turns is kept
+  overflow, _ = split_window(state["messages"])
+  record_summary(overflow)
+  delete_messages = [RemoveMessage(id=m.id) for m in overflow]
 
   # remove analysis results and vector store documents from storing in the memory
   return {
@@ -96,48 +233,90 @@ def summarize_conversation(state: GraphState):
     }
 
 
+def summarize_conversation(state: GraphState):
+  """Summarize a conversation and keep only limited messages in history"""
+  
+  chain = get_summary_chain()
+  logging.info("---Generating summary of the conversation---")
+  summary = chain.invoke(_summary_messages(state))
+  logging.info("---Completed summary of the conversation---")
+  return _summary_update(state, summary)
+
+
+async def asummarize_conversation(state: GraphState):
+  chain = get_summary_chain()
+  logging.info("---Generating summary of the conversation---")
+  summary = await chain.ainvoke(_summary_messages(state))
+  logging.info("---Completed summary of the conversation---")
+  return _summary_update(state, summary)
+
+
 def should_summarize(state: GraphState):
     """Return the next node to execute."""
-    messages = state["messages"]
-    # If there are more than 4 messages, then summarize the conversation
-    if len(messages) > 4:
+    # Summarize once the history outgrows the token budget
+    if needs_summary(state["messages"]):
         return "summarize_conversation"
     # Otherwise end
     return END
 
 
-def formulate_query(state: GraphState):
-  """Genarate a standalone query based on original query, summary and chat history"""
-
-  chain = get_formulated_query_chain()
+def _formulate_query_inputs(state: GraphState):
+  return {
+      # the question is appended so that all the history counts against the budget
+      "chat_history": fit_history(state["messages"] + [HumanMessage(state["input"])])[:-1],
+      "input": state["input"],
+      "summary": fit_summary(state.get("summary", "")),
+  }
 
-  chat_history = state["messages"]
-  input = state["input"]
-  summary = state.get("summary", "")
 
-  # if there is no chat history
-  if not chat_history:
-     formatted_query = input
-  else:
-    logging.info("---Genarating formatted query---")
-    formatted_query = chain.invoke(
-        {
-            "chat_history": chat_history,
-            "input": input,
-            "summary": summary,
-        }
-    )
+def _formulate_query_update(state: GraphState, formatted_query: str):
   print(f"Formatted query : {formatted_query}")
   logging.info(f"Formatted query : {formatted_query}")  
 
-  
+  question = HumanMessage(state["input"])
+  # counted once here, the count is checkpointed with the message
+  message_tokens(question)
+
+  # the summary is not written back, so a summary produced in the background
+  # while this turn runs is not overwritten
   return {
      "formatted_query": formatted_query,
-     "messages": [HumanMessage(state["input"])],
-     "summary": summary,
+     "messages": [question],
        }
 
 
+def _is_standalone_query(state: GraphState) -> bool:
+  if not state["messages"]:
+    return True
+  standalone, reason = classify_query(state["input"])
+  if standalone:
+    logging.info(f"---Question is standalone ({reason}), skipping query reformulation---")
+  return standalone
+
+
+def formulate_query(state: GraphState):
+  """Genarate a standalone query based on original query, summary and chat history"""
+
+  # if there is no chat history or the question does not depend on it
+  if _is_standalone_query(state):
+     formatted_query = state["input"]
+  else:
+    logging.info("---Genarating formatted query---")
+    chain = get_formulated_query_chain()
+    formatted_query = chain.invoke(_formulate_query_inputs(state))
+  return _formulate_query_update(state, formatted_query)
+
+
+async def aformulate_query(state: GraphState):
+  if _is_standalone_query(state):
+     formatted_query = state["input"]
+  else:
+    logging.info("---Genarating formatted query---")
+    chain = get_formulated_query_chain()
+    formatted_query = await chain.ainvoke(_formulate_query_inputs(state))
+  return _formulate_query_update(state, formatted_query)
+
+
 # def extract_context(state: GraphState):
 #     """Extract relevant context like stock symbols, period from the question"""
 
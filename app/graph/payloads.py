@@ -0,0 +1,189 @@
+import math
+import re
+from typing import Any, Dict, List
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt.tool_node import msg_content_output
+from config.constants import TOOL_PAYLOAD_TOKEN_BUDGET, TOOL_PAYLOAD_TOKEN_BUDGETS
+from .tokens import estimate_tokens, record_payload
+
+# Chunks of one article overlap by up to the ingestion splitter's chunk_overlap characters
+_MAX_CHUNK_OVERLAP = 250
+_MIN_CHUNK_OVERLAP = 30
+_WHITESPACE = re.compile(r"\s+")
+_UNITS = [(1e12, "T"), (1e9, "B"), (1e6, "M")]
+# Payloads of tool calls that found nothing
+NO_NEWS = "No matching news found."
+NO_RESULTS = "No results."
+EMPTY_PAYLOADS = ("", NO_NEWS, NO_RESULTS)
+
+
+def format_number(value) -> str:
+    """Fixed, short rendering of a number: 2 decimals, 4 significant digits below 1, T/B/M above a million."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "-"
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return str(value)
+    for scale, unit in _UNITS:
+        if abs(value) >= scale:
+            return f"{value / scale:.2f}{unit}"
+    if isinstance(value, int):
+        return str(value)
+    if abs(value) >= 1 or value == 0:
+        return f"{value:.2f}"
+    return f"{value:.4g}"
+
+
+def flatten(record: dict) -> Dict[str, Any]:
+    """Leaves of a nested dict, named by their own key unless two leaves share it."""
+    leaves = []
+
+    def walk(value, path):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                walk(child, path + [str(key)])
+        else:
+            leaves.append((path, value))
+
+    walk(record, [])
+    names = [path[-1] for path, _ in leaves]
+    return {
+        (path[-1] if names.count(path[-1]) == 1 else ".".join(path)): value
+        for path, value in leaves
+    }
+
+
+def render_record(record: dict) -> str:
+    return "; ".join(f"{key}={format_number(value)}" for key, value in flatten(record).items())
+
+
+def render_table(rows: Dict[str, dict], key: str = "symbol") -> str:
+    """One header line and one pipe separated line per row, instead of repeating every key per row.
+
+    Columns without a value in any row are left out.
+    """
+    flat = {name: flatten(row) for name, row in rows.items()}
+    columns = [
+        column for column in dict.fromkeys(column for row in flat.values() for column in row)
+        if any(row.get(column) is not None for row in flat.values())
+    ]
+    lines = ["|".join([key] + columns)]
+    for name, row in flat.items():
+        lines.append("|".join([name] + [format_number(row.get(column)) for column in columns]))
+    return "\n".join(lines)
+
+
+def _overlap(first: str, second: str) -> int:
+    """Length of the longest end of `first` that starts `second`."""
+    for size in range(min(len(first), len(second), _MAX_CHUNK_OVERLAP), _MIN_CHUNK_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+def merge_chunks(docs: List[Document]) -> List[Document]:
+    """Drop repeated chunks and join neighbouring chunks of an article on their shared overlap.
+
+    Keeps the rank of the best chunk of each merged run.
+    """
+    merged: List[Document] = []
+    seen = set()
+    for doc in docs:
+        text = _WHITESPACE.sub(" ", doc.page_content).strip()
+        if text in seen:
+            continue
+        seen.add(text)
+        article = doc.metadata.get("url") or doc.metadata.get("title")
+        for index, other in enumerate(merged):
+            if article is None or (other.metadata.get("url") or other.metadata.get("title")) != article:
+                continue
+            if text in other.page_content:
+                break
+            if _overlap(other.page_content, text):
+                merged[index] = Document(
+                    page_content=other.page_content + text[_overlap(other.page_content, text):],
+                    metadata=other.metadata)
+                break
+            if _overlap(text, other.page_content):
+                merged[index] = Document(
+                    page_content=text + other.page_content[_overlap(text, other.page_content):],
+                    metadata=other.metadata)
+                break
+        else:
+            merged.append(Document(page_content=text, metadata=doc.metadata))
+    return merged
+
+
+def render_news(docs: List[Document]) -> str:
+    if not docs:
+        return NO_NEWS
+    blocks = []
+    for doc in merge_chunks(docs):
+        details = ", ".join(str(doc.metadata[field]) for field in ("date", "category") if doc.metadata.get(field))
+        header = f"## {doc.metadata.get('title') or 'Untitled'}" + (f" ({details})" if details else "")
+        url = doc.metadata.get("url")
+        blocks.append("\n".join([header] + ([url] if url else []) + [doc.page_content]))
+    return "\n\n".join(blocks)
+
+
+def truncate_to_budget(text: str, budget: int) -> str:
+    """Whole lines up to the token budget, the line crossing it cut at a word."""
+    if estimate_tokens(text) <= budget:
+        return text
+    lines = text.split("\n")
+    kept, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            words, partial = line.split(" "), []
+            for word in words:
+                used += estimate_tokens(word)
+                if used > budget:
+                    break
+                partial.append(word)
+            if partial:
+                kept.append(" ".join(partial) + " ...")
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept) + f"\n[truncated to about {budget} tokens, {len(lines) - len(kept)} more lines]"
+
+
+def render_payload(name: str, output: Any) -> str:
+    """Compact text for the model of a tool's return value."""
+    if isinstance(output, str):
+        return output
+    if name == "retrieve_news_data" or (isinstance(output, list) and output and isinstance(output[0], Document)):
+        return render_news(output)
+    if isinstance(output, dict):
+        if not output:
+            return NO_RESULTS
+        if all(isinstance(value, dict) for value in output.values()):
+            return render_table(output)
+        return render_record(output)
+    return str(msg_content_output(output))
+
+
+def compact_payload(name: str, output: Any) -> str:
+    """Render a tool result within its token budget and count the tokens saved over the raw serialization."""
+    text = truncate_to_budget(
+        render_payload(name, output), TOOL_PAYLOAD_TOKEN_BUDGETS.get(name, TOOL_PAYLOAD_TOKEN_BUDGET))
+    raw = msg_content_output(output)
+    record_payload(estimate_tokens(raw if isinstance(raw, str) else str(raw)), estimate_tokens(text))
+    return text
+
+
+def with_compact_output(tool: BaseTool) -> BaseTool:
+    """Return a copy of a tool whose results reach the model compacted, see `compact_payload`."""
+    func, coroutine = tool.func, tool.coroutine
+
+    def compact(**kwargs):
+        return compact_payload(tool.name, func(**kwargs))
+
+    async def acompact(**kwargs):
+        return compact_payload(tool.name, await coroutine(**kwargs))
+
+    return tool.model_copy(update={"func": compact, "coroutine": acompact if coroutine else None})
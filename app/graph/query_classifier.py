@@ -0,0 +1,140 @@
+import re
+import threading
+from typing import Iterable, List, Optional, Pattern, Tuple
+from config.symbols import COMPANY_ALIASES
+
+# Words that point back at something said earlier in the conversation
+_ANAPHORA = re.compile(
+    r"\b(it|its|it's|itself|they|them|their|theirs|he|she|him|his|her|"
+    r"these|those|both|former|latter|above|aforementioned|mentioned|previous|earlier|"
+    r"again|instead|too|also|as well|same|other|others|"
+    r"the (company|companies|stock|stocks|firm|ticker|symbol|results?))\b"
+    # "this" / "that" / "one" are only safe when they qualify a time span
+    r"|\b(this|that|one|ones)\b(?!\s+(day|week|month|quarter|year|morning|afternoon|evening)s?\b)",
+    re.IGNORECASE,
+)
+
+# Openings of elliptical follow-ups such as "and for Ford?" or "what about 1 year?"
+_FOLLOW_UP_START = re.compile(
+    r"^\s*(and|but|or|so|then|now|ok|okay|for|with|over|in|what about|how about)\b",
+    re.IGNORECASE,
+)
+
+# The question has to actually ask for something, bare fragments like
+# "Tesla RSI" or "Microsoft, 6 months" lean on the previous turn
+_REQUEST_CUE = re.compile(
+    r"\b(what|which|how|why|when|who|where|is|are|was|were|does|do|did|can|could|should|"
+    r"will|would|show|give|get|list|tell|find|calculate|compute|compare|retrieve|fetch|"
+    r"analy[sz]e|summari[sz]e|explain|provide|display|check|predict|estimate|screen)\b",
+    re.IGNORECASE,
+)
+
+_COMPARISON = re.compile(r"\b(compare[sd]?|comparison|versus|vs\.?|against)\b", re.IGNORECASE)
+
+# Subjects that make a news question self-contained without naming a company
+_TOPIC = re.compile(
+    r"\b(market(?! cap)|markets|industry|industries|sector|sectors|economy|inflation|interest rates?|"
+    r"federal reserve|recession|crypto|cryptocurrency|bitcoin|ipos?|semiconductors?|"
+    r"electric vehicles?|oil|gold|tariffs?|banking|artificial intelligence)\b",
+    re.IGNORECASE,
+)
+
+# Upper case abbreviations that are not stock symbols
+_NOT_TICKERS = {
+    "AI", "API", "ATH", "CEO", "CFO", "CPI", "EMA", "EPS", "ETF", "EV", "EVS", "FED", "GDP",
+    "IPO", "MACD", "OK", "PE", "PEG", "RSI", "ROE", "ROI", "SEC", "SMA", "UK", "US", "USA",
+    "USD", "YOY", "YTD", "I", "BUY", "SELL", "HOLD",
+}
+
+_TICKER = re.compile(r"(\$)?(?<![\w&])([A-Z]{1,5}(?:[.-][A-Z])?)(?![\w&])")
+
+_ALIAS_TO_SYMBOL = {
+    alias: symbol for symbol, aliases in COMPANY_ALIASES.items() for alias in aliases
+}
+
+
+def alias_pattern(aliases: Iterable[str], ignore_case: bool = True) -> Pattern:
+    """Pattern matching any of the company aliases as whole words, longest first."""
+    return re.compile(
+        r"(?<![\w&])(" + "|".join(
+            re.escape(alias) for alias in sorted(aliases, key=len, reverse=True)
+        ) + r")(?![\w&])",
+        re.IGNORECASE if ignore_case else 0,
+    )
+
+
+_ALIAS = alias_pattern(_ALIAS_TO_SYMBOL)
+
+_stats = {"checked": 0, "standalone": 0}
+_stats_lock = threading.Lock()
+
+
+def find_symbols(text: str, known_only: bool = False, aliases: Optional[List[Pattern]] = None) -> List[str]:
+    """Stock symbols mentioned in the text, by symbol or company name, in order of appearance.
+
+    With `known_only`, upper case words count only when they are symbols of
+    the dictionary or written with a leading $. Words such as "NOW" or "BUY"
+    are then left out rather than taken for a symbol. `aliases` replaces the
+    patterns company names are matched with, see `alias_pattern`.
+    """
+    found = []
+    for match in _TICKER.finditer(text):
+        dollar, token = match.groups()
+        if token in _NOT_TICKERS:
+            continue
+        # single letter symbols (F, V, T) are only trusted with a leading $
+        if len(token) == 1 and not dollar:
+            continue
+        if known_only and not dollar and token not in COMPANY_ALIASES:
+            continue
+        found.append((match.start(), token))
+    for pattern in aliases or [_ALIAS]:
+        for match in pattern.finditer(text):
+            found.append((match.start(), _ALIAS_TO_SYMBOL[match.group(1).lower()]))
+
+    symbols = []
+    for _, symbol in sorted(found):
+        if symbol not in symbols:
+            symbols.append(symbol)
+    return symbols
+
+
+def classify_query(question: str) -> Tuple[bool, str]:
+    """Decide locally whether a question can be answered without the chat history.
+
+    Only clear cases are reported as standalone, anything doubtful is left to
+    the reformulation LLM. Returns `(standalone, reason)`.
+    """
+    if _FOLLOW_UP_START.search(question):
+        standalone, reason = False, "follow_up"
+    elif _ANAPHORA.search(question):
+        standalone, reason = False, "anaphora"
+    elif not _REQUEST_CUE.search(question):
+        standalone, reason = False, "fragment"
+    else:
+        # any other upper case word may be a follow-up's "BUY" or "NOW", the LLM decides those
+        symbols = find_symbols(question, known_only=True)
+        if _COMPARISON.search(question) and len(symbols) < 2:
+            standalone, reason = False, "partial_comparison"
+        elif symbols:
+            standalone, reason = True, "symbols"
+        elif _TOPIC.search(question):
+            standalone, reason = True, "topic"
+        else:
+            standalone, reason = False, "no_subject"
+
+    with _stats_lock:
+        _stats["checked"] += 1
+        _stats["standalone"] += standalone
+    return standalone, reason
+
+
+def is_standalone(question: str) -> bool:
+    return classify_query(question)[0]
+
+
+def get_classifier_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["bypass_rate"] = round(stats["standalone"] / stats["checked"], 3) if stats["checked"] else 0.0
+    return stats
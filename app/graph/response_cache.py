@@ -0,0 +1,218 @@
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from config.constants import MARKET_DATA_HISTORY_TTLS, MARKET_DATA_INFO_TTL
+from config.constants import RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_SIMILARITY
+from config.constants import RESPONSE_CACHE_NEWS_TTL, RESPONSE_CACHE_DEFAULT_TTL
+from .query_classifier import find_symbols
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_TIME_UNIT = re.compile(r"\b(day|week|month|quarter|year|ytd)s?\b", re.IGNORECASE)
+
+
+def query_fingerprint(query: str) -> Tuple:
+    """The parts of a question that embeddings barely tell apart but change the answer.
+
+    "Is AMZN bullish?" and "Is TSLA bullish?" embed almost identically, as do
+    "returns over 6 months" and "over 1 year", so only questions with the
+    same symbols, numbers and time units are compared by similarity.
+    """
+    return (
+        tuple(sorted(find_symbols(query))),
+        tuple(sorted(_NUMBER.findall(query))),
+        tuple(sorted({unit.lower() for unit in _TIME_UNIT.findall(query)})),
+    )
+
+
+def tool_data_ttl(name: str, args: dict) -> float:
+    """Seconds the data behind a tool call stays fresh, 0 for tools whose results are not cacheable."""
+    if name == "retrieve_news_data":
+        return RESPONSE_CACHE_NEWS_TTL
+    if name == "retrieve_stocks_data":
+        return min(MARKET_DATA_HISTORY_TTLS.get(args.get("period", "1mo"), 0), MARKET_DATA_INFO_TTL)
+    if name in ("retreive_stock_indicators_for_single_stock", "retrieve_stock_indicators_for_multiple_stocks"):
+        return MARKET_DATA_HISTORY_TTLS.get(args.get("period", "1mo"), 0)
+    if name == "calculate_stock_returns":
+        # every time period is sliced from at least a month of history
+        return MARKET_DATA_HISTORY_TTLS["1mo"]
+    return 0
+
+
+def response_ttl(tool_calls: Sequence[dict]) -> float:
+    """Seconds an answer stays valid, until the first of the data it used goes stale."""
+    if not tool_calls:
+        return RESPONSE_CACHE_DEFAULT_TTL
+    return min(tool_data_ttl(call["name"], call["args"]) for call in tool_calls)
+
+
+def tool_call_key(call: dict) -> str:
+    return json.dumps([call["name"], call["args"]], sort_keys=True, default=str)
+
+
+def tool_data_fingerprints(tool_calls: Sequence[dict], tool_messages: Sequence) -> Dict[str, str]:
+    """Hash of the data each tool call of a turn returned, by `tool_call_key`."""
+    outputs = {message.tool_call_id: str(message.content) for message in tool_messages}
+    return {
+        tool_call_key(call): hashlib.sha256(outputs[call["id"]].encode("utf-8")).hexdigest()
+        for call in tool_calls if call.get("id") in outputs
+    }
+
+
+class _ResponseEntry:
+    __slots__ = ("query", "vector", "answer", "data_fingerprints", "size", "expires_at", "hits")
+
+    def __init__(self, query, vector, answer, data_fingerprints, ttl):
+        self.query = query
+        self.vector = vector
+        self.answer = answer
+        self.data_fingerprints = data_fingerprints
+        self.size = (sys.getsizeof(query) + sys.getsizeof(answer) + vector.nbytes
+                     + sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in data_fingerprints.items()))
+        self.expires_at = time.monotonic() + ttl
+        self.hits = 0
+
+
+class SemanticResponseCache:
+    """Answers to earlier questions, found by embedding similarity.
+
+    Entries are grouped by `query_fingerprint`, and a question is answered
+    from the most similar entry of its group if the cosine similarity of
+    the embeddings reaches `threshold`. An entry expires with the freshest
+    market data its tool calls used, see `tool_data_ttl`, or as soon as a
+    later turn makes one of the same tool calls and gets different data,
+    see `invalidate_changed`. Entries are
+    evicted least recently used first once the answers, queries and vectors
+    exceed `max_bytes`. Hit, miss and eviction counters are available
+    through `stats()`.
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES, threshold: float = RESPONSE_CACHE_SIMILARITY):
+        self.max_bytes = max_bytes
+        self.threshold = threshold
+        self._entries: "OrderedDict[int, _ResponseEntry]" = OrderedDict()
+        self._groups: Dict[Tuple, List[int]] = {}
+        self._fingerprints: Dict[int, Tuple] = {}
+        # tool call key -> ids of the entries whose answer used its data
+        self._by_call: Dict[str, Set[int]] = {}
+        self._next_id = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0,
+                          "invalidations": 0}
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _remove(self, entry_id: int):
+        """Caller holds the lock."""
+        entry = self._entries.pop(entry_id)
+        self._bytes -= entry.size
+        group = self._fingerprints.pop(entry_id)
+        self._groups[group].remove(entry_id)
+        if not self._groups[group]:
+            del self._groups[group]
+        for key in entry.data_fingerprints:
+            self._by_call[key].discard(entry_id)
+            if not self._by_call[key]:
+                del self._by_call[key]
+
+    def _invalidate_changed(self, data_fingerprints: Dict[str, str]):
+        """Caller holds the lock."""
+        stale = {
+            entry_id
+            for key, digest in data_fingerprints.items()
+            for entry_id in self._by_call.get(key, ())
+            if self._entries[entry_id].data_fingerprints[key] != digest
+        }
+        for entry_id in stale:
+            self._remove(entry_id)
+        self._counters["invalidations"] += len(stale)
+
+    def invalidate_changed(self, data_fingerprints: Dict[str, str]):
+        """Drop the answers built on data that the same tool calls no longer return."""
+        with self._lock:
+            self._invalidate_changed(data_fingerprints)
+
+    def lookup(self, query: str, vector: Sequence[float]) -> Optional[str]:
+        """Cached answer of a similar enough question with the same fingerprint, or None."""
+        vector = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            best, best_similarity = None, self.threshold
+            for entry_id in list(self._groups.get(query_fingerprint(query), [])):
+                entry = self._entries[entry_id]
+                if entry.expires_at <= now:
+                    self._remove(entry_id)
+                    self._counters["expirations"] += 1
+                    continue
+                similarity = float(entry.vector @ vector)
+                if similarity >= best_similarity:
+                    best, best_similarity = entry_id, similarity
+            if best is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            self._entries.move_to_end(best)
+            self._entries[best].hits += 1
+            return self._entries[best].answer
+
+    def store(self, query: str, vector: Sequence[float], answer: str, data_fingerprints: Dict[str, str],
+              ttl: float):
+        """Cache an answer, with the `tool_data_fingerprints` of the tool calls it used."""
+        if ttl <= 0 or not answer:
+            self.invalidate_changed(data_fingerprints)
+            return
+        entry = _ResponseEntry(query, self._normalize(vector), answer, data_fingerprints, ttl)
+        if entry.size > self.max_bytes:
+            self.invalidate_changed(data_fingerprints)
+            return
+        group = query_fingerprint(query)
+        with self._lock:
+            self._invalidate_changed(data_fingerprints)
+            # a fresh answer replaces the ones it would have been served from
+            for entry_id in list(self._groups.get(group, [])):
+                if float(self._entries[entry_id].vector @ entry.vector) >= self.threshold:
+                    self._remove(entry_id)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._fingerprints[entry_id] = group
+            self._groups.setdefault(group, []).append(entry_id)
+            for key in data_fingerprints:
+                self._by_call.setdefault(key, set()).add(entry_id)
+            self._bytes += entry.size
+            self._counters["stores"] += 1
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+            self._fingerprints.clear()
+            self._by_call.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss/eviction counters, the hit rate and current usage."""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {**self._counters, "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+                    "entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+# Shared by every session in the process
+response_cache = SemanticResponseCache()
+
+
+def get_response_cache_stats() -> Dict[str, float]:
+    return response_cache.stats()
@@ -0,0 +1,108 @@
+import time
+import logging
+from collections import defaultdict
+from typing import Dict, Iterator, Optional, Tuple
+from langchain_core.messages import AIMessage, AIMessageChunk
+from .intent_router import record_route_latency
+
+# Progress text shown while a node runs, keyed by the node that just finished
+NODE_PROGRESS = {
+    "formulate_query": "Thinking about your question...",
+    "tools": "Analysing the results...",
+}
+
+
+def describe_tool_call(tool_call: dict) -> str:
+    """Short, user facing description of what a tool call is doing."""
+    args = tool_call.get("args", {})
+    symbols = args.get("stock_symbols") or ([args["stock_symbol"]] if args.get("stock_symbol") else [])
+    symbols = ", ".join(symbols)
+    name = tool_call["name"]
+    if name == "retrieve_news_data":
+        return f"Searching news for '{args.get('news_data_request', '')}'..."
+    if name == "retrieve_stocks_data":
+        return f"Fetching {symbols} history..."
+    if name == "calculate_stock_returns":
+        return f"Calculating returns for {symbols}..."
+    return f"Calculating indicators for {symbols}..."
+
+
+class TurnLatency:
+    """Latency breakdown of one chat turn: time to first token, answer, total and per node."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.answer_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.node_times: Dict[str, float] = defaultdict(float)
+        self.route: Optional[str] = None
+
+    @staticmethod
+    def _elapsed(start, end):
+        return round(end - start, 3) if end is not None else None
+
+    def as_dict(self) -> dict:
+        return {
+            "ttft": self._elapsed(self.started_at, self.first_token_at),
+            "answer": self._elapsed(self.started_at, self.answer_at),
+            "total": self._elapsed(self.started_at, self.finished_at),
+            "nodes": {node: round(seconds, 3) for node, seconds in self.node_times.items()},
+            "route": self.route,
+        }
+
+    def log(self):
+        logging.info(f"Turn latency: {self.as_dict()}")
+
+
+def stream_turn(app, inputs: dict, config: dict, latency: TurnLatency) -> Iterator[Tuple[str, Optional[str]]]:
+    """Run one turn of the graph and yield UI events as they happen.
+
+    Events are `(kind, payload)` tuples:
+        - ("progress", text): a node started work worth telling the user about
+        - ("token", text): the next piece of the answer from the agent
+        - ("reset", None): discard streamed tokens, the agent decided to call tools
+        - ("answer", text): the complete answer; remaining nodes only do bookkeeping
+    """
+    last_update = latency.started_at
+    for mode, chunk in app.stream(inputs, config=config, stream_mode=["messages", "updates"]):
+        if mode == "messages":
+            message, metadata = chunk
+            if (metadata.get("langgraph_node") == "agent"
+                    and isinstance(message, AIMessageChunk) and message.content):
+                if latency.first_token_at is None:
+                    latency.first_token_at = time.perf_counter()
+                yield "token", message.content
+            continue
+
+        for node, update in chunk.items():
+            now = time.perf_counter()
+            latency.node_times[node] += now - last_update
+            last_update = now
+            messages = (update or {}).get("messages", [])
+            last_message = messages[-1] if messages else None
+
+            if node == "route_intent":
+                latency.route = update.get("route")
+                for tool_call in getattr(last_message, "tool_calls", None) or []:
+                    yield "progress", describe_tool_call(tool_call)
+            # answers come from the agent, or from the response cache with no agent run
+            elif node in ("agent", "check_response_cache") and isinstance(last_message, AIMessage):
+                if last_message.tool_calls:
+                    yield "reset", None
+                    for tool_call in last_message.tool_calls:
+                        yield "progress", describe_tool_call(tool_call)
+                else:
+                    if node == "check_response_cache":
+                        latency.route = "response_cache"
+                    latency.answer_at = now
+                    if latency.first_token_at is None:
+                        latency.first_token_at = now
+                    yield "answer", last_message.content
+            elif node in NODE_PROGRESS:
+                yield "progress", NODE_PROGRESS[node]
+
+    latency.finished_at = time.perf_counter()
+    if latency.answer_at is not None:
+        record_route_latency(latency.route, latency.answer_at - latency.started_at)
+    latency.log()
@@ -0,0 +1,293 @@
+import math
+import threading
+from collections import OrderedDict, deque
+from typing import Optional, Tuple
+import pandas as pd
+from config.constants import INDICATOR_STATE_MAX_ENTRIES
+
+RSI_PERIOD = 14
+MOMENTUM_PERIOD = 5
+# Running sums are recomputed from their buffers this often to stop float drift
+RESYNC_EVERY = 512
+
+# (close, high, low, volume)
+Bar = Tuple[float, float, float, float]
+
+
+def _pct_change(value: float, base: float) -> float:
+    """`value / base - 1` with pandas' division semantics."""
+    if base == 0:
+        return math.nan if value == 0 or math.isnan(value) else math.copysign(math.inf, value)
+    return value / base - 1
+
+
+class _RollingSum:
+    """Sum of the last `window` values pushed, kept in a ring buffer."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+
+    def push(self, value):
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+
+    def drop_first(self):
+        self.total -= self.values.popleft()
+
+    def set_first(self, value):
+        self.total += value - self.values[0]
+        self.values[0] = value
+
+    def total_with(self, value):
+        """Total of the last `window` values if `value` were pushed."""
+        dropped = self.values[0] if len(self.values) == self.window else 0.0
+        return self.total - dropped + value
+
+    def resync(self):
+        self.total = math.fsum(self.values)
+
+
+class _WindowMean:
+    """Mean of per-bar values over the whole window, skipping NaN like pandas."""
+
+    def __init__(self):
+        self.values = deque()
+        self.total = 0.0
+        self.count = 0
+        self.pos_inf = 0
+        self.neg_inf = 0
+
+    def _account(self, value, sign):
+        if math.isnan(value):
+            return
+        if value == math.inf:
+            self.pos_inf += sign
+        elif value == -math.inf:
+            self.neg_inf += sign
+        else:
+            self.total += sign * value
+        self.count += sign
+
+    def push(self, value):
+        self.values.append(value)
+        self._account(value, 1)
+
+    def popleft(self):
+        self._account(self.values.popleft(), -1)
+
+    def clear_at(self, position):
+        self._account(self.values[position], -1)
+        self.values[position] = math.nan
+
+    def mean(self, extra: float = math.nan) -> float:
+        pos_inf, neg_inf, count, total = self.pos_inf, self.neg_inf, self.count, self.total
+        if not math.isnan(extra):
+            count += 1
+            if extra == math.inf:
+                pos_inf += 1
+            elif extra == -math.inf:
+                neg_inf += 1
+            else:
+                total += extra
+        if count == 0 or (pos_inf and neg_inf):
+            return math.nan
+        if pos_inf or neg_inf:
+            return math.inf if pos_inf else -math.inf
+        return total / count
+
+    def resync(self):
+        self.total = math.fsum(v for v in self.values if not math.isnan(v) and not math.isinf(v))
+
+
+class IncrementalIndicators:
+    """Indicator state for a sliding window of bars, updated in O(1) per bar.
+
+    The state holds the closed bars of the window. The latest bar, which may
+    still change intraday, is passed to `snapshot` and folded in without
+    mutating the state. Snapshots match `compute_indicators` on the same
+    bars, up to floating point rounding.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # (sequence number, timestamp, close, high, low, volume)
+        self._bars = deque()
+        self._seq = 0
+        self._updates = 0
+        self._sma_20 = _RollingSum(20)
+        self._sma_50 = _RollingSum(50)
+        self._gains = _RollingSum(RSI_PERIOD)
+        self._losses = _RollingSum(RSI_PERIOD)
+        self._volume_changes = _WindowMean()
+        self._momentum = _WindowMean()
+        # Sum of the window's closes, to detect revised bars
+        self._closes = _WindowMean()
+        # Monotonic deques of (sequence number, value) for the window low/high
+        self._lows = deque()
+        self._highs = deque()
+
+    def __len__(self):
+        return len(self._bars)
+
+    def append(self, timestamp, close, high, low, volume):
+        """Add a closed bar to the end of the window."""
+        prev = self._bars[-1] if self._bars else None
+        self._bars.append((self._seq, timestamp, close, high, low, volume))
+
+        self._sma_20.push(close)
+        self._sma_50.push(close)
+        delta = close - prev[2] if prev else 0.0
+        self._gains.push(delta if delta > 0 else 0.0)
+        self._losses.push(-delta if delta < 0 else 0.0)
+        self._volume_changes.push(_pct_change(volume, prev[5]) if prev else math.nan)
+        if len(self._bars) > MOMENTUM_PERIOD:
+            self._momentum.push(_pct_change(close, self._bars[-1 - MOMENTUM_PERIOD][2]))
+        else:
+            self._momentum.push(math.nan)
+        self._closes.push(close)
+
+        while self._lows and self._lows[-1][1] >= low:
+            self._lows.pop()
+        self._lows.append((self._seq, low))
+        while self._highs and self._highs[-1][1] <= high:
+            self._highs.pop()
+        self._highs.append((self._seq, high))
+
+        self._seq += 1
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            for state in (self._sma_20, self._sma_50, self._gains, self._losses,
+                          self._volume_changes, self._momentum, self._closes):
+                state.resync()
+
+    def evict_front(self):
+        """Drop the oldest bar from the window."""
+        count = len(self._bars)
+        seq = self._bars.popleft()[0]
+        for rolling in (self._sma_20, self._sma_50, self._gains, self._losses):
+            if count <= rolling.window:
+                rolling.drop_first()
+        # The new first bar has no previous close, so it no longer counts as a change
+        if 1 < count <= RSI_PERIOD + 1:
+            self._gains.set_first(0.0)
+            self._losses.set_first(0.0)
+        self._volume_changes.popleft()
+        if self._volume_changes.values:
+            self._volume_changes.clear_at(0)
+        self._momentum.popleft()
+        if len(self._momentum.values) >= MOMENTUM_PERIOD:
+            self._momentum.clear_at(MOMENTUM_PERIOD - 1)
+        self._closes.popleft()
+
+        if self._lows[0][0] == seq:
+            self._lows.popleft()
+        if self._highs[0][0] == seq:
+            self._highs.popleft()
+
+    def snapshot(self, live: Optional[Bar] = None) -> dict:
+        """Return the indicators for the window plus an optional live bar."""
+        count = len(self._bars) + (live is not None)
+        if count == 0:
+            raise ValueError("No bars to calculate indicators from")
+
+        if live is None:
+            sma_20, sma_50 = self._sma_20.total, self._sma_50.total
+            gains, losses = self._gains.total, self._losses.total
+            volume_change = self._volume_changes.mean()
+            momentum = self._momentum.mean()
+            support = self._lows[0][1]
+            resistance = self._highs[0][1]
+        else:
+            close, high, low, volume = live
+            prev = self._bars[-1] if self._bars else None
+            delta = close - prev[2] if prev else 0.0
+            sma_20 = self._sma_20.total_with(close)
+            sma_50 = self._sma_50.total_with(close)
+            gains = self._gains.total_with(delta if delta > 0 else 0.0)
+            losses = self._losses.total_with(-delta if delta < 0 else 0.0)
+            volume_change = self._volume_changes.mean(_pct_change(volume, prev[5]) if prev else math.nan)
+            momentum = self._momentum.mean(
+                _pct_change(close, self._bars[-MOMENTUM_PERIOD][2])
+                if len(self._bars) >= MOMENTUM_PERIOD else math.nan)
+            support = min(self._lows[0][1], low) if self._lows else low
+            resistance = max(self._highs[0][1], high) if self._highs else high
+
+        sma_20 = sma_20 / 20 if count >= 20 else math.nan
+        sma_50 = sma_50 / 50 if count >= 50 else math.nan
+        if count < RSI_PERIOD:
+            rsi = math.nan
+        elif losses == 0:
+            rsi = 100.0 if gains > 0 else math.nan
+        else:
+            rsi = 100 - (100 / (1 + gains / losses))
+
+        return {
+            "trend": "bullish" if sma_20 > sma_50 else "bearish",
+            "rsi": rsi,
+            "support": support,
+            "resistance": resistance,
+            "volume_trend": "increasing" if volume_change > 0 else "decreasing",
+            "momentum": "positive" if momentum > 0 else "negative"
+        }
+
+    def sync(self, hist: pd.DataFrame) -> dict:
+        """Bring the window in line with a date-sorted history and return a snapshot.
+
+        Bars that fell out of the history are evicted and only bars newer than
+        the window are appended. If earlier bars were revised, which the first and
+        last closes and the sum of the window's closes detect, the state is rebuilt.
+        """
+        index = hist.index
+        closes = hist["Close"].to_numpy(dtype=float)
+        highs = hist["High"].to_numpy(dtype=float)
+        lows = hist["Low"].to_numpy(dtype=float)
+        volumes = hist["Volume"].to_numpy(dtype=float)
+        closed = len(hist) - 1
+
+        while self._bars and self._bars[0][1] < index[0]:
+            self.evict_front()
+        position = -1
+        if self._bars:
+            _, last_ts, last_close = self._bars[-1][:3]
+            position = index.searchsorted(last_ts)
+            consistent = (
+                self._bars[0][1] == index[0]
+                and position < closed
+                and index[position] == last_ts
+                and closes[position] == last_close
+                and position + 1 == len(self._bars)
+                and self._bars[0][2] == closes[0]
+                and math.isclose(self._closes.total, math.fsum(closes[:position + 1]), rel_tol=1e-12)
+            )
+            if not consistent:
+                self.reset()
+                position = -1
+
+        for i in range(position + 1, closed):
+            self.append(index[i], closes[i], highs[i], lows[i], volumes[i])
+        return self.snapshot((closes[-1], highs[-1], lows[-1], volumes[-1]))
+
+
+_states: "OrderedDict[tuple, IncrementalIndicators]" = OrderedDict()
+_states_lock = threading.Lock()
+
+
+def get_indicator_state(symbol: str, period: str, interval: str = "1d") -> IncrementalIndicators:
+    """Return the indicator state for a symbol's window, evicting the least recently used."""
+    key = (symbol.upper(), period, interval)
+    with _states_lock:
+        state = _states.get(key)
+        if state is None:
+            state = _states[key] = IncrementalIndicators()
+            if len(_states) > INDICATOR_STATE_MAX_ENTRIES:
+                _states.popitem(last=False)
+        else:
+            _states.move_to_end(key)
+        return state
@@ -0,0 +1,86 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence
+from langchain_core.messages import BaseMessage, HumanMessage
+
+_PIECE = re.compile(r"\d+|[^\W\d_]+|[^\w\s]|_")
+
+# Turns remembered to attribute model calls to, across concurrent sessions
+_MAX_TRACKED_TURNS = 1024
+
+_counters = {"model_calls": 0, "input_tokens": 0, "output_tokens": 0, "payloads": 0, "payload_tokens": 0,
+             "raw_payload_tokens": 0}
+_turns: "OrderedDict[str, int]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate Llama 3 token count without the tokenizer.
+
+    Words cost a token per 4 characters, numbers one per 3 digits, and every
+    punctuation mark one. The estimate is not checked against the tokenizer,
+    it is meant to compare payload formats and enforce budgets, not to bill.
+    """
+    tokens = 0
+    for piece in _PIECE.findall(text):
+        if piece.isdigit():
+            tokens += (len(piece) + 2) // 3
+        elif piece.isalpha():
+            tokens += (len(piece) + 3) // 4
+        else:
+            tokens += 1
+    return tokens
+
+
+def estimate_message_tokens(messages: Sequence[BaseMessage]) -> int:
+    # about 4 tokens of chat template per message
+    return sum(estimate_tokens(str(message.content)) + 4 for message in messages)
+
+
+def _turn_id(messages: Sequence[BaseMessage]) -> Optional[str]:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message.id
+    return None
+
+
+def record_model_call(messages: Sequence[BaseMessage], response: BaseMessage):
+    """Count the prompt and completion tokens of an agent call against the turn of its question.
+
+    Uses the usage the provider reports, the estimate when it reports none.
+    """
+    usage = getattr(response, "usage_metadata", None) or {}
+    input_tokens = usage.get("input_tokens") or estimate_message_tokens(messages)
+    output_tokens = usage.get("output_tokens") or estimate_tokens(str(response.content))
+    turn = _turn_id(messages)
+    with _lock:
+        _counters["model_calls"] += 1
+        _counters["input_tokens"] += input_tokens
+        _counters["output_tokens"] += output_tokens
+        if turn is not None:
+            _turns[turn] = _turns.pop(turn, 0) + input_tokens
+            while len(_turns) > _MAX_TRACKED_TURNS:
+                _turns.popitem(last=False)
+
+
+def record_payload(raw_tokens: int, tokens: int):
+    """Count a tool payload, before and after compaction."""
+    with _lock:
+        _counters["payloads"] += 1
+        _counters["raw_payload_tokens"] += raw_tokens
+        _counters["payload_tokens"] += tokens
+
+
+def get_token_stats() -> Dict[str, float]:
+    """Input tokens per turn and per model call, and the tokens saved by compacting tool payloads."""
+    with _lock:
+        stats = dict(_counters)
+        turns = list(_turns.values())
+    stats["turns"] = len(turns)
+    stats["input_tokens_per_turn"] = round(sum(turns) / len(turns), 1) if turns else 0.0
+    stats["input_tokens_per_call"] = (
+        round(stats["input_tokens"] / stats["model_calls"], 1) if stats["model_calls"] else 0.0)
+    stats["payload_savings"] = (
+        round(1 - stats["payload_tokens"] / stats["raw_payload_tokens"], 3) if stats["raw_payload_tokens"] else 0.0)
+    return stats
@@ -0,0 +1,164 @@
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import ToolNode
+from pydantic import ValidationError
+from config.constants import TOOL_MAX_IDENTICAL_CALLS, TOOL_MEMO_MAX_ENTRIES
+from .response_cache import tool_data_ttl
+
+# Artifact of the tool message refusing a repeated call
+REPEAT_REFUSED = "repeat_refused"
+
+_counters = {"calls": 0, "executed": 0, "memo_hits": 0, "repeats_capped": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(name: str, value: int = 1):
+    with _counters_lock:
+        _counters[name] += value
+
+
+def get_tool_memo_stats() -> Dict[str, int]:
+    """Tool calls requested by the model, executed upstream, served from the memo and refused as repeats."""
+    with _counters_lock:
+        return {**_counters, "upstream_saved": _counters["memo_hits"] + _counters["repeats_capped"]}
+
+
+def memo_key(tool: BaseTool, args: dict) -> Optional[str]:
+    """Canonical (tool, args) key: defaults filled in, symbols upper-cased and symbol lists sorted.
+
+    Returns None when the arguments do not validate, such calls are left to
+    the tool node to report.
+    """
+    try:
+        args = tool.args_schema.model_validate(args).model_dump() if tool.args_schema else dict(args)
+    except ValidationError:
+        return None
+    if isinstance(args.get("stock_symbol"), str):
+        args["stock_symbol"] = args["stock_symbol"].strip().upper()
+    if isinstance(args.get("stock_symbols"), list):
+        args["stock_symbols"] = sorted({symbol.strip().upper() for symbol in args["stock_symbols"]})
+    if isinstance(args.get("news_data_request"), str):
+        args["news_data_request"] = " ".join(args["news_data_request"].lower().split())
+    return json.dumps([tool.name, args], sort_keys=True, default=str)
+
+
+def turn_messages(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """Messages of the current turn, after the last question."""
+    turn = []
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        turn.append(message)
+    return turn[::-1]
+
+
+class MemoToolNode:
+    """Tool node that remembers tool results per conversation thread.
+
+    The memo lives in the `tool_memo` state channel, so it is checkpointed
+    with the thread and survives `remove_messages` deleting the tool
+    messages at the end of a turn. Results are kept for the TTL of the data
+    behind them (`tool_data_ttl`), at most `max_entries` per thread. A call
+    whose canonical key was already made `max_identical_calls` times in the
+    current turn is not executed again. The model is told to answer with
+    the results it has, and `tool_loop_exhausted` lets the agent stop
+    offering tools.
+    """
+
+    def __init__(self, tools: Sequence[BaseTool], max_identical_calls: int = TOOL_MAX_IDENTICAL_CALLS,
+                 max_entries: int = TOOL_MEMO_MAX_ENTRIES):
+        self.tools = {tool.name: tool for tool in tools}
+        self.tool_node = ToolNode(list(tools))
+        self.max_identical_calls = max_identical_calls
+        self.max_entries = max_entries
+
+    def _key(self, call: dict) -> Optional[str]:
+        tool = self.tools.get(call["name"])
+        return memo_key(tool, call["args"]) if tool else None
+
+    def _plan(self, state):
+        """Answer what the memo and the repeat cap can, returns those messages and the calls left to run."""
+        now = time.time()
+        memo = {key: entry for key, entry in (state.get("tool_memo") or {}).items() if entry["expires_at"] > now}
+        turn = turn_messages(state["messages"])
+        earlier = [call for message in turn[:-1] if isinstance(message, AIMessage) for call in message.tool_calls]
+        counts: Dict[str, int] = {}
+        for call in earlier:
+            key = self._key(call)
+            counts[key] = counts.get(key, 0) + 1
+
+        answered, pending = {}, []
+        for call in turn[-1].tool_calls:
+            key = self._key(call)
+            _count("calls")
+            if key is not None and counts.get(key, 0) >= self.max_identical_calls:
+                _count("repeats_capped")
+                logging.info(f"---Refusing repeated call to {call['name']}---")
+                answered[call["id"]] = ToolMessage(
+                    content=(f"{call['name']} was already called {counts[key]} times with these arguments in this "
+                             "turn. Answer with the results you already have."),
+                    name=call["name"], tool_call_id=call["id"], status="error", artifact=REPEAT_REFUSED)
+            elif key is not None and key in memo:
+                _count("memo_hits")
+                answered[call["id"]] = ToolMessage(
+                    content=memo[key]["content"], name=call["name"], tool_call_id=call["id"])
+            else:
+                pending.append(call)
+            if key is not None:
+                counts[key] = counts.get(key, 0) + 1
+        return memo, answered, pending
+
+    def _update(self, state, memo, answered, pending, results):
+        now = time.time()
+        for call, message in zip(pending, results):
+            answered[call["id"]] = message
+            key = self._key(call)
+            ttl = tool_data_ttl(call["name"], call["args"])
+            if key is not None and ttl > 0 and message.status != "error":
+                memo.pop(key, None)
+                memo[key] = {"content": message.content, "expires_at": now + ttl}
+        # dicts keep insertion order, the oldest results are dropped first
+        while len(memo) > self.max_entries:
+            memo.pop(next(iter(memo)))
+        _count("executed", len(pending))
+        if len(pending) < len(answered):
+            logging.info(f"---{len(answered) - len(pending)} tool calls answered without an upstream call---")
+        return {
+            "messages": [answered[call["id"]] for call in state["messages"][-1].tool_calls],
+            "tool_memo": memo,
+        }
+
+    @staticmethod
+    def _ordered(pending, output) -> List[ToolMessage]:
+        by_id = {message.tool_call_id: message for message in output["messages"]}
+        return [by_id[call["id"]] for call in pending]
+
+    def invoke(self, state, config: RunnableConfig):
+        memo, answered, pending = self._plan(state)
+        results = []
+        if pending:
+            output = self.tool_node.invoke({"messages": [AIMessage(content="", tool_calls=pending)]}, config)
+            results = self._ordered(pending, output)
+        return self._update(state, memo, answered, pending, results)
+
+    async def ainvoke(self, state, config: RunnableConfig):
+        memo, answered, pending = self._plan(state)
+        results = []
+        if pending:
+            output = await self.tool_node.ainvoke({"messages": [AIMessage(content="", tool_calls=pending)]}, config)
+            results = self._ordered(pending, output)
+        return self._update(state, memo, answered, pending, results)
+
+
+def tool_loop_exhausted(messages: Sequence[BaseMessage]) -> bool:
+    """Whether a repeated tool call was refused in this turn, the model then has to answer without tools."""
+    return any(
+        isinstance(message, ToolMessage) and message.artifact == REPEAT_REFUSED
+        for message in turn_messages(messages)
+    )
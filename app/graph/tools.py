@@ -1,12 +1,18 @@
 from typing import List
-from typing import Literal, Dict
-import yfinance as yf
-import pandas as pd
+from typing import Literal, Dict, Optional, TYPE_CHECKING
 import logging
 from langchain_core.tools import tool
 from utils.vector_store import get_vector_store
+from utils.keyword_index import get_keyword_index
+from utils.symbol_index import get_symbol_index
+from utils.news_search import hybrid_news_search
+from config.constants import NEWS_SEARCH_K, NEWS_MMR_FETCH_K
 from langchain_core.documents import Document
 
+# pandas and yfinance load with the market data modules, on the first tool call rather than at startup
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 @tool(parse_docstring=True)
 def retrieve_stocks_data(
@@ -23,17 +29,23 @@ def retrieve_stocks_data(
     Returns:
         Dict[str, Dict[str, dict]]: Dictionary with essential stock metrics
     """
+    from .market_data import get_histories, get_infos
+
     results = {}
     if not stock_symbols:
         raise ValueError("No stock symbols were found")
+
+    # Pull history for every symbol in one bulk download
+    histories = get_histories(stock_symbols, period)
     for symbol in stock_symbols:
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period)
-        if hist.empty:
+        if histories[symbol].empty:
             raise ValueError("Invalid stock symbol")
 
+    # Fundamentals lookups run concurrently
+    infos = get_infos(stock_symbols)
+    for symbol in stock_symbols:
         # Get only essential stock info
-        info = stock.info
+        info = infos[symbol]
         essential_info = {
             'currentPrice': info.get('currentPrice'),
             'marketCap': info.get('marketCap'),
@@ -48,7 +60,7 @@ def retrieve_stocks_data(
         }
 
         results[symbol] = {
-            "historical_data": summarize_stock_data(hist),
+            "historical_data": summarize_stock_data(histories[symbol]),
             "stock_info": essential_info
         }
     return results
@@ -87,40 +99,78 @@ def retreive_stock_indicators_for_single_stock(
     if not stock_symbol:
         raise ValueError("No stock symbol provided.")
 
+    from .market_data import get_history
+    from .streaming_indicators import get_indicator_state
+
     # Fetch historical data
-    stock = yf.Ticker(stock_symbol)
-    hist = stock.history(period)
+    hist = get_history(stock_symbol, period)
     if hist.empty:
         raise ValueError(f"Invalid stock symbol: {stock_symbol}")
 
-    # Calculate technical indicators
-    df = pd.DataFrame(hist)
-    df['SMA_20'] = df['Close'].rolling(window=20).mean()
-    df['SMA_50'] = df['Close'].rolling(window=50).mean()
-    df['RSI'] = calculate_rsi(df['Close'])
-
-    # Determine trend, support, resistance, and volume trend
-    trend = "bullish" if df['SMA_20'].iloc[-1] > df['SMA_50'].iloc[-1] else "bearish"
-    support = df['Low'].min()
-    resistance = df['High'].max()
-    volume_trend = "increasing" if df['Volume'].pct_change(
-    ).mean() > 0 else "decreasing"
-    momentum = "positive" if df['Close'].pct_change(
-        5).mean() > 0 else "negative"
+    # Update the indicator state with the bars added since the last call
+    state = get_indicator_state(stock_symbol, period)
+    with state.lock:
+        indicators = state.sync(hist)
 
     logging.info("---Stock performance indicators calculated successfully---")
 
-    return {
-        "trend": trend,
-        "rsi": df['RSI'].iloc[-1],
-        "support": support,
-        "resistance": resistance,
-        "volume_trend": volume_trend,
-        "momentum": momentum
-    }
+    return indicators
+
+
+@tool(parse_docstring=True)
+def retrieve_stock_indicators_for_multiple_stocks(
+    stock_symbols: List[str],
+    period: Literal['1d', '5d', '1mo', '3mo', '6mo',
+                    '1y', '2y', '5y', '10y', 'ytd', 'max'] = "1mo",
+    trend: Optional[Literal['bullish', 'bearish']] = None,
+    max_rsi: Optional[float] = None,
+    min_rsi: Optional[float] = None
+) -> Dict[str, dict]:
+    """Calculate key stock performance indicators for several stock symbols at once and optionally screen them.
+
+    Args:
+        stock_symbols (List[str]): Stock symbols to analyze (e.g., ["AAPL", "MSFT"])
+        period (Literal['1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max'], optional):
+            Time period for historical data. Defaults to "1mo"
+        trend (Literal['bullish', 'bearish'], optional): Only return stocks with this trend
+        max_rsi (float, optional): Only return stocks with an RSI below this value (e.g., 30 for oversold)
+        min_rsi (float, optional): Only return stocks with an RSI above this value (e.g., 70 for overbought)
 
+    Returns:
+        Dict[str, Dict[str, float | str]]: Indicators per matching stock symbol, each containing
+            trend, rsi, support, resistance, volume_trend and momentum
 
-def calculate_rsi(prices: pd.Series, period: int = 14) -> pd.Series:
+    Raises:
+        ValueError: If stock_symbols is empty or contains an invalid symbol
+    """
+    logging.info("---Calculating stock performance indicators for multiple stocks---")
+
+    if not stock_symbols:
+        raise ValueError("No stock symbols were found")
+
+    from .market_data import get_histories
+    from .indicators import compute_indicators
+
+    histories = get_histories(stock_symbols, period)
+    for symbol, hist in histories.items():
+        if hist.empty:
+            raise ValueError(f"Invalid stock symbol: {symbol}")
+
+    indicators = compute_indicators(histories)
+
+    def matches(values):
+        if trend and values["trend"] != trend:
+            return False
+        if max_rsi is not None and not values["rsi"] < max_rsi:
+            return False
+        if min_rsi is not None and not values["rsi"] > min_rsi:
+            return False
+        return True
+
+    return {symbol: values for symbol, values in indicators.items() if matches(values)}
+
+
+def calculate_rsi(prices: "pd.Series", period: int = 14) -> "pd.Series":
     """Calculate Relative Strength Index (RSI)
     
     Args:
@@ -188,12 +238,21 @@ def summarize_stock_data(hist):
         raise ValueError(f"Error generating stock summary: {str(e)}")
 
 @tool(parse_docstring=True)
-def retrieve_news_data(news_data_request: str) -> List[Document]:
+def retrieve_news_data(
+        news_data_request: str,
+        time_window: Literal['any', 'day', 'week', 'month', 'quarter', 'year'] = "any",
+        category: Optional[str] = None,
+        stock_symbol: Optional[str] = None) -> List[Document]:
     """
     Retrieve relevant news documents based on a given query.
 
     Args:
         news_data_request (str): Query string to search for relevant news data
+        time_window (Literal['any', 'day', 'week', 'month', 'quarter', 'year'], optional):
+            Only return news published within this window before today, e.g. 'week' for "this week".
+            Defaults to 'any'
+        category (Optional[str], optional): Only return news of this category, e.g. 'AI', 'Fintech' or 'Startups'
+        stock_symbol (Optional[str], optional): Only return news mentioning this stock, e.g. 'TSLA' for news about Tesla
 
     Returns:
         List[Document]: List of Document objects containing:
@@ -201,32 +260,16 @@ def retrieve_news_data(news_data_request: str) -> List[Document]:
             - metadata (dict): Document metadata excluding 'embedding' field
 
     Note:
-        - Uses MMR (Maximal Marginal Relevance) search with k=4 and fetch_k=10
+        - Fuses keyword (BM25) and semantic search, then uses MMR (Maximal Marginal Relevance) to pick 4 documents
         - Logs retrieval information and errors for debugging
     """
   
     try:
-        # Get the vector store (ensure this is implemented properly elsewhere)
-        vectorstore = get_vector_store()
-
-        # Retrieve documents using the specified search parameters
-        documents = vectorstore.as_retriever(
-            search_type="mmr",
-            search_kwargs={'k': 4, 'fetch_k': 10}
-        ).invoke(news_data_request)
-
-        # Filter out the 'embedding' metadata and collect results
-        vector_store_documents = []
-        for doc in documents:
-            page_content = doc.page_content
-            metadata = doc.metadata
-            # Remove 'embedding' from metadata to avoid unnecessary data
-            new_metadata = {key: value for key,
-                            value in metadata.items() if key != "embedding"}
-
-            # Append the processed document to the result list
-            vector_store_documents.append(
-                Document(page_content=page_content, metadata=new_metadata))
+        # keyword and vector candidates, both pre-filtered by date and category, fused and diversified
+        vector_store_documents = hybrid_news_search(
+            get_vector_store(), get_keyword_index(), news_data_request, k=NEWS_SEARCH_K,
+            fetch_k=NEWS_MMR_FETCH_K, time_window=time_window, category=category,
+            symbol_index=get_symbol_index(), stock_symbol=stock_symbol)
 
         logging.info(
             f"{len(vector_store_documents)} documents retrieved for query: '{news_data_request}'")
@@ -269,14 +312,19 @@ def calculate_stock_returns(
             '1_year': 365
         }
 
+        # History periods that cover each time period, all sliced from one cached window
+        history_periods = {
+            '1_week': '1mo',
+            '1_month': '1mo',
+            '3_months': '6mo',
+            '6_months': '6mo',
+            '1_year': '1y'
+        }
+
+        from .market_data import get_history
+
         # Get stock data - fetch enough history based on requested period
-        stock = yf.Ticker(stock_symbol)
-        if time_period == '1_year':
-            hist = stock.history(period='1y')
-        elif time_period in ['3_months', '6_months']:
-            hist = stock.history(period='6mo')
-        else:
-            hist = stock.history(period='1mo')
+        hist = get_history(stock_symbol, period=history_periods[time_period])
 
         if hist.empty:
             raise ValueError(f"No data found for symbol {stock_symbol}")
@@ -316,7 +364,7 @@ def calculate_stock_returns(
             f"Error calculating returns for {stock_symbol}: {str(e)}")
 
 
-def calculate_period_return(hist: pd.DataFrame, days: int) -> float:
+def calculate_period_return(hist: "pd.DataFrame", days: int) -> float:
     """Calculate percentage return over a specific period."""
     try:
         # Get start and end prices
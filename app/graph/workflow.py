@@ -1,32 +1,63 @@
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import StateGraph, START, END
 from .graph_state import GraphState
 from .nodes import call_model, tool_node, should_use_tools, remove_messages, should_summarize
 from .nodes import summarize_conversation, formulate_query
+from .nodes import acall_model, asummarize_conversation, aformulate_query
+from .nodes import check_response_cache, acheck_response_cache, route_after_cache_check, cache_response
+from .nodes import route_intent, route_after_intent
 from langgraph.graph import StateGraph
-
-memory = MemorySaver()
+from langchain_core.runnables import RunnableLambda
+from functools import lru_cache
+from .background_summary import BackgroundSummarizer
+from .checkpointers import create_checkpointer
+from config.constants import DEFERRED_SUMMARY
 
 workflow = StateGraph(GraphState)
-workflow.add_node("formulate_query", formulate_query)
-workflow.add_node("summarize_conversation", summarize_conversation)
-workflow.add_node("agent", call_model)
-workflow.add_node("tools", tool_node)
+# LLM nodes have async variants so the graph can also run via ainvoke/astream,
+# where the tool node runs the tool calls of one message concurrently
+workflow.add_node("formulate_query", RunnableLambda(formulate_query, afunc=aformulate_query))
+workflow.add_node("summarize_conversation", RunnableLambda(summarize_conversation, afunc=asummarize_conversation))
+workflow.add_node("check_response_cache", RunnableLambda(check_response_cache, afunc=acheck_response_cache))
+workflow.add_node("route_intent", route_intent)
+workflow.add_node("agent", RunnableLambda(call_model, afunc=acall_model))
+workflow.add_node("cache_response", cache_response)
+workflow.add_node("tools", RunnableLambda(tool_node.invoke, afunc=tool_node.ainvoke))
 workflow.add_node("delete_messages", remove_messages)
 
 workflow.add_edge(START, "formulate_query")
-workflow.add_edge("formulate_query", "agent")
+# repeated questions are answered from the response cache without calling the LLM
+workflow.add_edge("formulate_query", "check_response_cache")
+workflow.add_conditional_edges("check_response_cache", route_after_cache_check, [
+                               "route_intent", "delete_messages"])
+# common questions call their tools directly, the model is only asked for the answer
+workflow.add_conditional_edges("route_intent", route_after_intent, ["tools", "agent"])
 workflow.add_conditional_edges("agent", should_use_tools, [
-                               "tools", "delete_messages"])
+                               "tools", "cache_response"])
 workflow.add_edge("tools", "agent")
+workflow.add_edge("cache_response", "delete_messages")
+
+
+def route_after_answer(state: GraphState):
+    # In deferred mode the summary is written by the background summarizer
+    if DEFERRED_SUMMARY:
+        return END
+    return should_summarize(state)
+
+
 workflow.add_conditional_edges(
-    "delete_messages", should_summarize, [END, "summarize_conversation"])
+    "delete_messages", route_after_answer, [END, "summarize_conversation"])
 
-app = workflow.compile(checkpointer=memory)
 
 
+@lru_cache(maxsize=1)
 def create_workflow():
-    
-    return app
+    # Conversation state is checkpointed to the backend chosen by CHECKPOINT_BACKEND,
+    # opened on first use so the settings loaded from .env apply
+    return workflow.compile(checkpointer=create_checkpointer())
+
+
+@lru_cache(maxsize=1)
+def get_summarizer():
+    return BackgroundSummarizer(create_workflow())
 
 
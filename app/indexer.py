@@ -0,0 +1,140 @@
+"""Index scraped news files into the vector store.
+
+Runs separately from the Streamlit app, which only reads the vector store:
+    python indexer.py                   # index new files once and exit
+    python indexer.py --watch           # keep polling the directory for new files
+    python indexer.py --rebuild-indexes # backfill the keyword and symbol indexes from the vector store,
+                                        # and declare the filter fields of the Atlas vector search index
+"""
+import argparse
+import logging
+import time
+from dotenv import load_dotenv
+
+# config.constants reads its settings at import, .env is loaded first
+load_dotenv()
+
+from config.constants import JSON_FILES_DIRECTORY, INDEX_MANIFEST_PATH, VECTOR_STORE_BACKEND
+from utils.ingestion import IngestionStats
+from utils.keyword_index import get_keyword_index
+from utils.symbol_index import get_symbol_index
+from utils.manifest import IndexManifest, file_digest
+from utils.process_json_files import get_json_files_list, get_ingestion_pipeline, load_file_content_to_vector_store
+from utils.vector_store import get_vector_store, get_mongodb_collection, ensure_vector_search_index
+
+
+def index_directory(directory: str, manifest_path: str) -> IngestionStats:
+    """Bring the vector store in line with the JSON files in the directory.
+
+    New and changed files are ingested, renamed files are only recorded under
+    their new path, and the chunks of articles that are no longer in any file
+    are deleted.
+    """
+    totals = IngestionStats()
+    manifest = IndexManifest(manifest_path)
+    current = {}
+    for json_file in sorted(get_json_files_list(directory)):
+        current.setdefault(file_digest(json_file), json_file)
+
+    # files that were deleted or changed since they were indexed
+    for file_hash, path in manifest.file_paths().items():
+        if file_hash not in current:
+            logging.info(f"{path} was removed or changed since it was indexed")
+            manifest.remove_file(file_hash)
+
+    failed = False
+    indexed = manifest.file_paths()
+    for file_hash, json_file in current.items():
+        if file_hash in indexed:
+            if indexed[file_hash] != json_file:
+                logging.info(f"{indexed[file_hash]} was renamed to {json_file}")
+                manifest.move_file(file_hash, json_file)
+            continue
+        stats = load_file_content_to_vector_store(json_file, manifest, file_hash)
+        if stats is None:
+            # failed files are retried on the next run
+            failed = True
+            continue
+        totals.merge(stats)
+        manifest.save()
+        logging.info(f"Indexed {json_file}: {stats.as_dict()}")
+
+    # a failed file may still contain articles of the file it replaced, keep them until it is indexed
+    if not failed:
+        orphaned = manifest.remove_orphaned_articles()
+        if orphaned:
+            sink = get_ingestion_pipeline().sink
+            totals.deleted_chunks += sink.delete(orphaned)
+            sink.flush()
+            logging.info(f"Deleted {len(orphaned)} chunks of articles no longer in any file")
+    manifest.save()
+    totals.finished_at = time.perf_counter()
+    return totals
+
+
+def purge_untracked(manifest_path: str) -> int:
+    """Delete documents the manifest does not know, like chunks indexed before it existed."""
+    manifest = IndexManifest(manifest_path)
+    sink = get_ingestion_pipeline().sink
+    deleted = sink.delete_untracked(manifest.all_chunk_ids())
+    sink.flush()
+    return deleted
+
+
+def rebuild_indexes() -> int:
+    """Rebuild the keyword and symbol indexes from the vector store, for chunks indexed before they existed."""
+    if VECTOR_STORE_BACKEND == "local":
+        chunks = get_vector_store().iter_chunks()
+    else:
+        chunks = (
+            (str(document.pop("_id")), document.pop("text", ""), document)
+            for document in get_mongodb_collection().find({}, {"embedding": 0})
+        )
+    indexes = [get_keyword_index(), get_symbol_index()]
+    for index in indexes:
+        index.delete_untracked([])
+    count = 0
+    for chunk in chunks:
+        for index in indexes:
+            index.add([chunk])
+        count += 1
+    for index in indexes:
+        index.save()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index scraped news files into the vector store.")
+    parser.add_argument("--directory", default=JSON_FILES_DIRECTORY, help="directory of scraped JSON files")
+    parser.add_argument("--manifest", default=INDEX_MANIFEST_PATH, help="content hashes of the indexed data")
+    parser.add_argument("--purge-untracked", action="store_true",
+                        help="after indexing, delete stored chunks the manifest does not know")
+    parser.add_argument("--rebuild-indexes", action="store_true",
+                        help="rebuild the keyword and symbol indexes from every chunk in the vector store first, "
+                             "and add the date and category filter fields to the Atlas vector search index")
+    parser.add_argument("--watch", action="store_true", help="keep polling the directory for new files")
+    parser.add_argument("--interval", type=float, default=60, help="seconds between polls in watch mode")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.rebuild_indexes:
+        if VECTOR_STORE_BACKEND != "local" and ensure_vector_search_index():
+            logging.info("Atlas vector search index updated with the date and category filter fields")
+        logging.info(f"Keyword and symbol indexes rebuilt from {rebuild_indexes()} chunks")
+
+    while True:
+        totals = index_directory(args.directory, args.manifest)
+        if totals.docs or totals.deleted_chunks:
+            logging.info(f"Indexing run finished: {totals.as_dict()}")
+        else:
+            logging.info(f"No new files in {args.directory}")
+        if args.purge_untracked:
+            logging.info(f"Deleted {purge_untracked(args.manifest)} untracked chunks")
+            args.purge_untracked = False
+        if not args.watch:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,26 @@
-from graph.workflow import create_workflow
+from dotenv import load_dotenv
+
+# config.constants reads its settings at import, .env is loaded before any config or graph module
+load_dotenv()
+
+from graph.workflow import create_workflow, get_summarizer
+from graph.llm_registry import start_warm_up
+from graph.streaming import stream_turn, TurnLatency
 import streamlit as st
 import uuid
-from dotenv import load_dotenv
 from graph.errors.finance_exceptions import FinanceError
-from utils.process_json_files import get_json_files_list, load_file_content_to_vector_store, load_processed_files, save_processed_file
-from config.constants import JSON_FILES_DIRECTORY, PROCESSED_FILES_PATH
-from config.constants import BOT_NAME, HEADER_TEXT, SUB_HEADER_TEXT
+from config.constants import BOT_NAME, HEADER_TEXT, SUB_HEADER_TEXT, DEFERRED_SUMMARY, LLM_WARM_UP
 import logging
 import os 
 def main():
     
-    # Load environment variables from .env file
-    load_dotenv()
-    json_files = get_json_files_list(JSON_FILES_DIRECTORY)
-    if not json_files:
-        logging.info(f"No JSON files found in {JSON_FILES_DIRECTORY}.")
-
-    # get the list of processed files
-    processed_files = load_processed_files(PROCESSED_FILES_PATH)
-
-    for json_file in json_files:
-        if json_file not in processed_files:
-            load_file_content_to_vector_store(json_file)
-            save_processed_file(PROCESSED_FILES_PATH, json_file)
-
+    # News files are indexed by indexer.py, the app only reads the vector store
 
     app = create_workflow()
+    summarizer = get_summarizer()
+    if LLM_WARM_UP:
+        # once per process, in the background while the page renders
+        start_warm_up()
     # Set the page configuration
      
     st.set_page_config(
@@ -82,17 +77,33 @@ def main():
                                     "thread_id": st.session_state.session_id
                                 }
                     }
-            
-            response = app.invoke({"input": prompt}, config=config)
-            
-            answer = response["messages"][-1].content
-           
-            typing_indicator.empty()  # Remove the typing indicator when done
 
+            latency = TurnLatency()
             with st.chat_message("ai"):
-                # Display the AI's answer
-                answer = answer.replace("$","\$")
-                st.markdown(answer)
+                answer_container = st.empty()
+                answer = ""
+                # Show progress and answer tokens as the graph produces them;
+                # the answer is final before the conversation summary is written
+                with summarizer.turn_lock(config):
+                    for kind, payload in stream_turn(app, {"input": prompt}, config, latency):
+                        if kind == "progress":
+                            typing_indicator.write(payload)
+                        elif kind == "reset":
+                            answer = ""
+                            answer_container.empty()
+                        elif kind == "token":
+                            answer += payload
+                            typing_indicator.empty()
+                            answer_container.markdown(answer.replace("$","\$") + "▌")
+                        elif kind == "answer":
+                            typing_indicator.empty()  # Remove the typing indicator when done
+                            # Display the AI's answer
+                            answer = payload.replace("$","\$")
+                            answer_container.markdown(answer)
+
+            # Summarize the conversation off the request path
+            if DEFERRED_SUMMARY:
+                summarizer.schedule(config)
 
             # Add AI response to chat history
             st.session_state.messages.append({"role": "ai", "content": answer})
@@ -0,0 +1,133 @@
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from graph.checkpointers import DeltaCheckpointSaver, MongoCheckpointSaver, SqliteCheckpointSaver
+from graph.graph_state import GraphState
+
+mongomock = pytest.importorskip("mongomock")
+
+
+@pytest.fixture(params=["sqlite", "mongo"])
+def saver(request, tmp_path):
+    if request.param == "sqlite":
+        saver = SqliteCheckpointSaver(str(tmp_path / "checkpoints.sqlite"), pool_size=2, thread_ttl=None)
+        yield saver
+        saver.close()
+    else:
+        yield MongoCheckpointSaver(mongomock.MongoClient(), "checkpoint_test", thread_ttl=None)
+
+
+def config(thread_id: str, checkpoint_id: str = None) -> dict:
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def build_graph(checkpointer):
+    """The app's state, with a turn that adds a question and an answer and trims the history to 4 messages."""
+
+    def answer(state):
+        return {"messages": [HumanMessage(state["input"]), AIMessage(f"Answer to {state['input']}")]}
+
+    def trim(state):
+        return {"messages": [RemoveMessage(id=message.id) for message in state["messages"][:-4]]}
+
+    workflow = StateGraph(GraphState)
+    workflow.add_node("agent", answer)
+    workflow.add_node("delete_messages", trim)
+    workflow.add_edge(START, "agent")
+    workflow.add_edge("agent", "delete_messages")
+    workflow.add_edge("delete_messages", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def test_storage_primitives_are_abstract():
+    class Incomplete(DeltaCheckpointSaver):
+        def _store_checkpoint(self, row, blobs, seen_at):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_conversations_match_the_memory_saver(saver):
+    graphs = {"delta": build_graph(saver), "memory": build_graph(MemorySaver())}
+    for turn in range(4):
+        for thread_id in ("a", "b"):
+            for graph in graphs.values():
+                graph.invoke({"input": f"{thread_id} question {turn}"}, config(thread_id))
+    for thread_id in ("a", "b"):
+        states = {name: graph.get_state(config(thread_id)) for name, graph in graphs.items()}
+        contents = {name: [m.content for m in state.values["messages"]] for name, state in states.items()}
+        assert contents["delta"] == contents["memory"]
+        assert contents["delta"][-1] == f"Answer to {thread_id} question 3"
+        assert len(contents["delta"]) == 4
+        assert states["delta"].values["input"] == states["memory"].values["input"]
+        history = {name: list(graph.get_state_history(config(thread_id))) for name, graph in graphs.items()}
+        assert len(history["delta"]) == len(history["memory"])
+        assert [h.metadata["step"] for h in history["delta"]] == [h.metadata["step"] for h in history["memory"]]
+
+
+def test_only_changed_channels_are_stored(saver):
+    first = empty_checkpoint()
+    first["channel_values"] = {"messages": ["hello"], "summary": "long summary"}
+    first["channel_versions"] = {"messages": "1", "summary": "1"}
+    stored = saver.put(config("t"), first, {"step": 0}, {"messages": "1", "summary": "1"})
+
+    second = empty_checkpoint()
+    second["channel_values"] = {"messages": ["hello", "again"], "summary": "long summary"}
+    second["channel_versions"] = {"messages": "2", "summary": "1"}
+    saver.put(stored, second, {"step": 1}, {"messages": "2"})
+
+    latest = saver.get_tuple(config("t"))
+    assert latest.checkpoint["channel_values"] == {"messages": ["hello", "again"], "summary": "long summary"}
+    assert latest.parent_config["configurable"]["checkpoint_id"] == first["id"]
+    assert saver.get_tuple(config("t", first["id"])).checkpoint["channel_values"]["messages"] == ["hello"]
+    # the summary was written once, by the first checkpoint
+    blobs = saver._load_blobs("t", "", {"summary": "1", "messages": "2"})
+    assert set(blobs) == {"summary", "messages"}
+
+
+def test_list_filters_and_limits(saver):
+    parent = config("t")
+    ids = []
+    for step in range(5):
+        checkpoint = empty_checkpoint()
+        checkpoint["id"] = f"0000{step}"
+        parent = saver.put(parent, checkpoint, {"step": step, "source": "loop" if step % 2 else "input"}, {})
+        ids.append(checkpoint["id"])
+
+    assert [c.checkpoint["id"] for c in saver.list(config("t"))] == ids[::-1]
+    assert [c.checkpoint["id"] for c in saver.list(config("t"), limit=2)] == ids[:2:-1][:2]
+    assert [c.checkpoint["id"] for c in saver.list(config("t"), before=config("t", ids[3]))] == ids[2::-1]
+    assert [c.metadata["step"] for c in saver.list(config("t"), filter={"source": "loop"}, limit=1)] == [3]
+    assert list(saver.list(config("other"))) == []
+
+
+def test_pending_writes(saver):
+    checkpoint = empty_checkpoint()
+    stored = saver.put(config("t"), checkpoint, {"step": 0}, {})
+    saver.put_writes(stored, [("messages", "first"), ("route", "metrics")], "task-1")
+    # a regular write is kept once, a retried task does not duplicate or replace it
+    saver.put_writes(stored, [("messages", "retried")], "task-1")
+    saver.put_writes(stored, [("__error__", "failed")], "task-2")
+    saver.put_writes(stored, [("__error__", "failed again")], "task-2")
+    writes = saver.get_tuple(stored).pending_writes
+    assert writes == [("task-1", "messages", "first"), ("task-1", "route", "metrics"),
+                      ("task-2", "__error__", "failed again")]
+
+
+def test_idle_threads_are_evicted(saver):
+    for thread_id in ("old", "new"):
+        saver.put(config(thread_id), empty_checkpoint(), {"step": 0}, {})
+    cutoff = time.time()
+    saver.put(config("new"), empty_checkpoint(), {"step": 1}, {})
+    assert saver.evict_idle_threads(cutoff) == 1
+    assert saver.get_tuple(config("old")) is None
+    assert saver.get_tuple(config("new")) is not None
@@ -0,0 +1,158 @@
+import json
+
+import pytest
+
+from utils.ingestion import CollectionSink, InMemoryCollection, IngestionPipeline, iter_json_records
+from utils.manifest import IndexManifest
+
+RECORDS = [
+    {"title": "Tesla deliveries beat estimates", "date": "2024-07-02", "category": "Markets",
+     "url": "https://example.com/tsla", "content": "Tesla delivered more cars than expected. " * 60},
+    {"title": "Apple unveils new chips", "date": "2024-06-10", "category": "Technology",
+     "url": "https://example.com/aapl", "content": "Apple announced its new chips on Monday."},
+    {"title": "Rates on hold", "date": "2024-06-12", "category": "Economy", "url": "https://example.com/fed",
+     "content": "The Fed kept rates unchanged, with \"two cuts\" pencilled in for 2024 [sic], {braces} too."},
+]
+
+
+class FakeEmbeddings:
+    """Deterministic embeddings that fail the first `failures` calls."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("embedding service unavailable")
+        return [[float(len(text)), float(sum(map(ord, text)) % 997)] for text in texts]
+
+
+def write_json(tmp_path, text: str, name: str = "news.json"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def pipeline(embeddings, collection, **options):
+    return IngestionPipeline(embeddings, CollectionSink(collection), split_workers=1, records_per_task=2,
+                             embed_batch_size=4, embed_concurrency=2, retry_base_delay=0.0, **options)
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 3, 7, 16, 64, 1024, 64 * 1024])
+def test_iter_json_records_across_block_boundaries(tmp_path, read_size):
+    path = write_json(tmp_path, json.dumps(RECORDS, indent=2))
+    assert list(iter_json_records(path, read_size=read_size)) == RECORDS
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 5, 1024])
+def test_iter_json_records_scalars_split_by_blocks(tmp_path, read_size):
+    # numbers may end at a block boundary, or at a "." or "e" there, and continue in the next block
+    values = [12345, 1.5, 6.75e10, 2e-07, -0.25, True, None, "x", [], {}]
+    path = write_json(tmp_path, json.dumps(values))
+    assert list(iter_json_records(path, read_size=read_size)) == values
+
+
+@pytest.mark.parametrize("text", ["[]", "  \n[ ]\n", ""])
+def test_iter_json_records_empty(tmp_path, text):
+    assert list(iter_json_records(write_json(tmp_path, text), read_size=1)) == []
+
+
+@pytest.mark.parametrize("read_size", [1, 4, 1024])
+def test_iter_json_records_rejects_a_non_array(tmp_path, read_size):
+    path = write_json(tmp_path, json.dumps(RECORDS[0]))
+    with pytest.raises(ValueError, match="does not contain a JSON array"):
+        list(iter_json_records(path, read_size=read_size))
+
+
+@pytest.mark.parametrize("read_size", [1, 4, 1024])
+def test_iter_json_records_rejects_a_truncated_file(tmp_path, read_size):
+    text = json.dumps(RECORDS)
+    path = write_json(tmp_path, text[:-1])
+    records = iter_json_records(path, read_size=read_size)
+    with pytest.raises(ValueError, match="ends before the JSON array is closed"):
+        list(records)
+    path = write_json(tmp_path, text[:len(text) // 2], name="half.json")
+    with pytest.raises(ValueError):
+        list(iter_json_records(path, read_size=read_size))
+
+
+@pytest.mark.parametrize("read_size", [1, 4, 1024])
+def test_iter_json_records_rejects_a_malformed_record(tmp_path, read_size):
+    path = write_json(tmp_path, '[{"title": "ok"}, {"title": "missing quote}, {"title": "after"}]')
+    records = iter_json_records(path, read_size=read_size)
+    assert next(records) == {"title": "ok"}
+    with pytest.raises(json.JSONDecodeError):
+        next(records)
+
+
+def test_embedding_failures_are_retried(tmp_path):
+    collection = InMemoryCollection()
+    embeddings = FakeEmbeddings(failures=2)
+    with pipeline(embeddings, collection, max_retries=3) as ingestion:
+        stats = ingestion.ingest_file(write_json(tmp_path, json.dumps(RECORDS)))
+    assert stats.retries == 2
+    assert stats.docs == len(RECORDS)
+    assert len(collection.documents) == stats.chunks > len(RECORDS)
+
+
+def test_embedding_gives_up_after_max_retries(tmp_path):
+    collection = InMemoryCollection()
+    embeddings = FakeEmbeddings(failures=100)
+    with pipeline(embeddings, collection, max_retries=2) as ingestion:
+        with pytest.raises(ConnectionError):
+            ingestion.ingest_file(write_json(tmp_path, json.dumps(RECORDS[1:])))
+    # one batch, the first attempt and two retries
+    assert embeddings.calls == 3
+    assert collection.documents == {}
+
+
+def test_retry_backoff_grows_exponentially(monkeypatch):
+    delays = []
+    monkeypatch.setattr("utils.ingestion.time.sleep", delays.append)
+    ingestion = IngestionPipeline(FakeEmbeddings(failures=3), CollectionSink(InMemoryCollection()),
+                                  split_workers=1, max_retries=3, retry_base_delay=0.5)
+    with ingestion:
+        embeddings, retries = ingestion._embed_with_retry(["text"])
+    assert retries == 3 and len(embeddings) == 1
+    # base * 2 ** attempt, with up to 100% jitter
+    for attempt, delay in enumerate(delays):
+        assert 0.5 * 2 ** attempt <= delay <= 0.5 * 2 ** (attempt + 1)
+
+
+def test_collection_sink_round_trip():
+    collection = InMemoryCollection()
+    sink = CollectionSink(collection)
+    chunks = [("a", "first chunk", {"title": "A", "date": "2024-01-01"}),
+              ("b", "second chunk", {"title": "B", "date": "2024-01-02"})]
+    sink.write(chunks, [[0.1, 0.2], [0.3, 0.4]])
+    assert collection.documents["a"] == {"_id": "a", "text": "first chunk", "embedding": [0.1, 0.2],
+                                         "title": "A", "date": "2024-01-01"}
+    assert collection.count_documents({"title": "B"}) == 1
+
+    # ids come from the content, writing a stored chunk again is a no-op
+    sink.write(chunks + [("c", "third chunk", {"title": "C"})], [[9.0], [9.0], [0.5, 0.6]])
+    assert collection.documents["a"]["embedding"] == [0.1, 0.2]
+    assert sorted(collection.documents) == ["a", "b", "c"]
+
+    assert sink.delete(["a", "missing"]) == 1
+    assert sink.delete_untracked(["c"]) == 1
+    assert list(collection.documents) == ["c"]
+
+
+def test_reingesting_with_a_manifest_is_idempotent(tmp_path):
+    collection = InMemoryCollection()
+    path = write_json(tmp_path, json.dumps(RECORDS))
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    embeddings = FakeEmbeddings()
+    with pipeline(embeddings, collection) as ingestion:
+        first = ingestion.ingest_file(path, manifest)
+        stored = dict(collection.documents)
+        calls = embeddings.calls
+        second = ingestion.ingest_file(path, manifest)
+    assert first.chunks == len(stored)
+    assert second.unchanged_docs == len(RECORDS) and second.chunks == 0
+    assert embeddings.calls == calls
+    assert collection.documents == stored
+    assert sorted(manifest.all_chunk_ids()) == sorted(stored)
@@ -0,0 +1,34 @@
+import pytest
+
+import graph.intent_router as intent_router
+from graph.intent_router import get_router_stats, record_route_latency, route_query
+
+
+@pytest.mark.parametrize("question", [
+    "What is the price of TSLA in 10 days?",
+    "What will the price of Tesla be next week?",
+    "Is Apple going to be bullish tomorrow?",
+])
+def test_questions_about_the_future_are_left_to_the_model(question):
+    assert route_query(question) == (None, "needs_model")
+
+
+@pytest.mark.parametrize("question, route", [
+    ("What is the price of TSLA?", "metrics"),
+    ("How much profit would 2000 dollars in Nvidia have made in a month?", "returns"),
+    ("Show me Tesla news from the last 10 days", "news"),
+])
+def test_questions_about_data_are_routed(question, route):
+    tool_calls, routed = route_query(question)
+    assert routed == route and tool_calls
+
+
+def test_latency_samples_are_bounded(monkeypatch):
+    monkeypatch.setattr(intent_router, "_latencies", {})
+    for turn in range(intent_router._LATENCY_SAMPLES * 3):
+        record_route_latency("metrics", 1.0 if turn < intent_router._LATENCY_SAMPLES * 2 else 3.0)
+    latency = get_router_stats()["latency"]["metrics"]
+    assert len(intent_router._latencies["metrics"][2]) == intent_router._LATENCY_SAMPLES
+    assert latency["turns"] == intent_router._LATENCY_SAMPLES * 3
+    assert latency["p50"] == 3.0
+    assert latency["mean"] == pytest.approx(5 / 3, abs=1e-3)
@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+from graph.market_cache import MarketDataCache
+
+
+def test_missing_keys_of_a_batch_are_fetched_once():
+    cache = MarketDataCache(max_bytes=1024 * 1024)
+    calls = []
+
+    def fetch_many(keys):
+        calls.append(keys)
+        return {key: key.upper() for key in keys}
+
+    cache.put("a", "cached", ttl=60)
+    assert cache.get_many_or_fetch(["a", "b", "c"], fetch_many, ttl=60) == {"a": "cached", "b": "B", "c": "C"}
+    assert cache.get_many_or_fetch(["b", "c"], fetch_many, ttl=60) == {"b": "B", "c": "C"}
+    assert calls == [["b", "c"]]
+
+
+def test_partial_fetch_releases_every_waiter():
+    cache = MarketDataCache(max_bytes=1024 * 1024)
+    fetching, release = threading.Event(), threading.Event()
+
+    def fetch_many(keys):
+        fetching.set()
+        release.wait(5)
+        return {"a": 1}
+
+    errors = {}
+
+    def request(name, keys, fetch):
+        try:
+            cache.get_many_or_fetch(keys, fetch, ttl=60)
+        except Exception as e:
+            errors[name] = e
+
+    owner = threading.Thread(target=request, args=("owner", ["a", "b"], fetch_many), daemon=True)
+    owner.start()
+    assert fetching.wait(5)
+    waiter = threading.Thread(target=request, args=("waiter", ["b"], lambda keys: pytest.fail("fetched twice")), daemon=True)
+    waiter.start()
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+
+    assert not owner.is_alive() and not waiter.is_alive()
+    assert isinstance(errors["owner"], KeyError) and errors["waiter"] is errors["owner"]
+    # nothing is cached from a failed batch, and the next request fetches again
+    assert cache.peek("a") is None
+    assert cache.get_many_or_fetch(["b"], lambda keys: {"b": 2}, ttl=60) == {"b": 2}
+
+
+def test_fetch_errors_reach_the_waiters():
+    cache = MarketDataCache(max_bytes=1024 * 1024)
+    with pytest.raises(ValueError):
+        cache.get_or_fetch("a", lambda: (_ for _ in ()).throw(ValueError("upstream down")), ttl=60)
+    assert cache.get_or_fetch("a", lambda: 1, ttl=60) == 1
@@ -0,0 +1,29 @@
+import pytest
+
+from graph.query_classifier import classify_query, find_symbols
+
+
+@pytest.mark.parametrize("question", [
+    "Should I BUY or SELL?",
+    "What is the RSI of NOW?",
+    "Is it a BUY at this price?",
+    "Compare AAPL and XYZW",
+])
+def test_unknown_upper_case_words_are_left_to_the_llm(question):
+    assert classify_query(question)[0] is False
+
+
+@pytest.mark.parametrize("question", [
+    "What is the price of TSLA?",
+    "What is the 1 year return of $NOW?",
+    "Compare AAPL and MSFT over 6 months",
+    "What is the latest news about Nvidia?",
+])
+def test_known_or_dollar_symbols_are_standalone(question):
+    assert classify_query(question) == (True, "symbols")
+
+
+def test_find_symbols_keeps_unknown_tickers_unless_known_only():
+    assert find_symbols("Is PLUG or TSLA a BUY?") == ["PLUG", "TSLA"]
+    assert find_symbols("Is PLUG or TSLA a BUY?", known_only=True) == ["TSLA"]
+    assert find_symbols("Is $PLUG a buy?", known_only=True) == ["PLUG"]
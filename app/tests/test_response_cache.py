@@ -0,0 +1,41 @@
+from langchain_core.messages import ToolMessage
+
+from graph.response_cache import SemanticResponseCache, tool_data_fingerprints
+
+CALL = {"name": "retrieve_stocks_data", "args": {"stock_symbols": ["TSLA"], "period": "1mo"}, "id": "call_1"}
+QUESTION = "What is the current price of TSLA?"
+
+
+def fingerprints(content: str, call: dict = CALL):
+    return tool_data_fingerprints([call], [ToolMessage(content, tool_call_id=call["id"])])
+
+
+def test_answers_are_served_while_the_tool_data_is_unchanged():
+    cache = SemanticResponseCache()
+    cache.store(QUESTION, [1.0, 0.0], "TSLA trades at 250.", fingerprints("price=250"), ttl=60)
+    cache.invalidate_changed(fingerprints("price=250", {**CALL, "id": "call_2"}))
+    assert cache.lookup(QUESTION, [1.0, 0.0]) == "TSLA trades at 250."
+
+
+def test_changed_tool_data_retires_answers_built_on_it():
+    cache = SemanticResponseCache()
+    cache.store(QUESTION, [1.0, 0.0], "TSLA trades at 250.", fingerprints("price=250"), ttl=60)
+    other_call = {"name": "retrieve_stocks_data", "args": {"stock_symbols": ["AAPL"], "period": "1mo"}, "id": "c"}
+    cache.store("What is the current price of AAPL?", [0.0, 1.0], "AAPL trades at 190.",
+                fingerprints("price=190", other_call), ttl=60)
+
+    # another session made the same call and got newer data
+    cache.invalidate_changed(fingerprints("price=262"))
+    assert cache.lookup(QUESTION, [1.0, 0.0]) is None
+    assert cache.lookup("What is the current price of AAPL?", [0.0, 1.0]) == "AAPL trades at 190."
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_storing_a_fresh_answer_retires_stale_answers_of_other_questions():
+    cache = SemanticResponseCache()
+    cache.store(QUESTION, [1.0, 0.0], "TSLA trades at 250.", fingerprints("price=250"), ttl=60)
+    cache.store("Show me the market cap of TSLA", [0.0, 1.0], "TSLA is worth 800B.", fingerprints("price=262"),
+                ttl=60)
+    assert cache.lookup(QUESTION, [1.0, 0.0]) is None
+    assert cache.lookup("Show me the market cap of TSLA", [0.0, 1.0]) == "TSLA is worth 800B."
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,106 @@
+import math
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from graph.indicators import compute_indicators
+from graph.streaming_indicators import RESYNC_EVERY, IncrementalIndicators
+
+SEEDS = range(25)
+
+
+def make_bars(rng: random.Random, count: int, start: pd.Timestamp) -> pd.DataFrame:
+    """Random walk OHLCV bars on consecutive days, with a few zero volume days."""
+    closes, price = [], rng.uniform(5, 500)
+    for _ in range(count):
+        price = max(0.5, price * (1 + rng.gauss(0, 0.02)))
+        closes.append(price)
+    closes = np.array(closes)
+    return pd.DataFrame({
+        "Close": closes,
+        "High": closes * (1 + np.array([rng.uniform(0, 0.03) for _ in range(count)])),
+        "Low": closes * (1 - np.array([rng.uniform(0, 0.03) for _ in range(count)])),
+        "Volume": [0.0 if rng.random() < 0.05 else float(rng.randint(1_000, 1_000_000)) for _ in range(count)],
+    }, index=pd.date_range(start, periods=count, freq="D"))
+
+
+def assert_matches_batch(snapshot: dict, hist: pd.DataFrame):
+    expected = compute_indicators({"X": hist})["X"]
+    assert snapshot.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, str):
+            assert snapshot[key] == value, key
+        elif math.isnan(value):
+            assert math.isnan(snapshot[key]), key
+        else:
+            assert snapshot[key] == pytest.approx(value, rel=1e-9, abs=1e-9), key
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_appends_match_batch(seed):
+    rng = random.Random(seed)
+    bars = make_bars(rng, 120, pd.Timestamp("2024-01-01"))
+    state = IncrementalIndicators()
+    # from a single bar, below every indicator's minimum length, up to the full history
+    for end in range(1, len(bars) + 1):
+        assert_matches_batch(state.sync(bars.iloc[:end]), bars.iloc[:end])
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_sliding_window_matches_batch(seed):
+    rng = random.Random(seed)
+    bars = make_bars(rng, 400, pd.Timestamp("2023-01-01"))
+    window = rng.randint(2, 80)
+    state = IncrementalIndicators()
+    start = 0
+    while start + window <= len(bars):
+        hist = bars.iloc[start:start + window]
+        assert_matches_batch(state.sync(hist), hist)
+        # windows slide by a few bars and change size, as a yfinance period does over days
+        start += rng.randint(0, 3)
+        window = max(2, window + rng.randint(-2, 2))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_live_bar_updates_match_batch(seed):
+    rng = random.Random(seed)
+    bars = make_bars(rng, 60, pd.Timestamp("2024-01-01"))
+    state = IncrementalIndicators()
+    state.sync(bars)
+    for _ in range(10):
+        # the latest bar changes intraday without being folded into the state
+        live = bars.copy()
+        live.iloc[-1] = live.iloc[-1] * rng.uniform(0.95, 1.05)
+        assert_matches_batch(state.sync(live), live)
+    assert len(state) == len(bars) - 1
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_revised_history_resets(seed):
+    rng = random.Random(seed)
+    bars = make_bars(rng, 80, pd.Timestamp("2024-01-01"))
+    state = IncrementalIndicators()
+    state.sync(bars)
+    revised = bars.copy()
+    position = rng.randrange(len(bars) - 1)
+    revised.iloc[position, revised.columns.get_loc("Close")] *= 1.1
+    assert_matches_batch(state.sync(revised), revised)
+    # a history that no longer starts at the window's first bar
+    replaced = make_bars(rng, 50, pd.Timestamp("2022-01-01"))
+    assert_matches_batch(state.sync(replaced), replaced)
+
+
+def test_long_stream_stays_within_rounding():
+    rng = random.Random(1)
+    bars = make_bars(rng, RESYNC_EVERY * 3, pd.Timestamp("2020-01-01"))
+    state = IncrementalIndicators()
+    for start in range(0, len(bars) - 60, 7):
+        hist = bars.iloc[start:start + 60]
+        assert_matches_batch(state.sync(hist), hist)
+
+
+def test_snapshot_of_empty_state_raises():
+    with pytest.raises(ValueError):
+        IncrementalIndicators().snapshot()
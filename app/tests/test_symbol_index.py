@@ -0,0 +1,36 @@
+import pytest
+
+from config.symbols import COMPANY_ALIASES, NEWS_CASE_SENSITIVE_ALIASES, NEWS_IGNORED_ALIASES
+from utils.symbol_index import extract_symbols, resolve_symbol
+
+
+def test_special_aliases_are_dictionary_aliases():
+    aliases = {alias for names in COMPANY_ALIASES.values() for alias in names}
+    assert {alias.lower() for alias in NEWS_CASE_SENSITIVE_ALIASES + NEWS_IGNORED_ALIASES} <= aliases
+
+
+@pytest.mark.parametrize("text", [
+    "Visa Sponsorships for software engineers",
+    "an 8,300-square-foot space downtown",
+    "a debate in the public square",
+    "the meta narrative of the season",
+    "a price oracle exploit drained the pool",
+    "micron-scale features",
+])
+def test_common_words_are_not_postings(text):
+    assert extract_symbols(text) == []
+
+
+@pytest.mark.parametrize("text, symbols", [
+    ("Visa ($V) beat estimates", ["V"]),
+    ("SQ jumped after earnings", ["SQ"]),
+    ("Meta shares rose while Oracle fell", ["META", "ORCL"]),
+    ("Tesla and nvidia rallied", ["TSLA", "NVDA"]),
+])
+def test_companies_are_postings(text, symbols):
+    assert extract_symbols(text) == symbols
+
+
+@pytest.mark.parametrize("value, symbol", [("visa", "V"), ("square", "SQ"), ("meta", "META"), ("$tsla", "TSLA")])
+def test_user_input_resolves_every_alias(value, symbol):
+    assert resolve_symbol(value) == symbol
@@ -0,0 +1,70 @@
+import pytest
+from langchain_core.embeddings import FakeEmbeddings
+from langchain_mongodb import MongoDBAtlasVectorSearch
+from pymongo.errors import OperationFailure
+
+import utils.mmr as mmr
+
+
+class IndexWithoutFilterFields:
+    """Collection whose vector search index declares no filter fields, like Atlas rejects a pre-filter then."""
+
+    name = "news"
+
+    def __init__(self):
+        self.searches = []
+        self.filter_fields = False
+
+    def aggregate(self, pipeline):
+        stage = pipeline[0]["$vectorSearch"]
+        self.searches.append(stage)
+        if stage.get("filter") and not self.filter_fields:
+            raise OperationFailure("Path 'date' needs to be indexed as filter")
+        return iter([
+            {"_id": str(i), "embedding": [float(i), 1.0], "date": f"2024-01-0{i % 3 + 1}", "category": "Technology"}
+            for i in range(stage["limit"])
+        ])
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(mmr, "_prefilter_rejected_at", None)
+    collection = IndexWithoutFilterFields()
+    return collection, MongoDBAtlasVectorSearch(collection=collection, embedding=FakeEmbeddings(size=2),
+                                                index_name="news_index")
+
+
+def test_rejected_prefilter_falls_back_to_post_filtering(store):
+    collection, vector_store = store
+    prefilter = {"date": {"$in": ["2024-01-02"]}, "category": "Technology"}
+    for _ in range(3):
+        ids, vectors = mmr.vector_candidates(vector_store, [1.0, 0.0], 4, prefilter)
+        assert ids == ["1", "4", "7", "10"]
+        assert vectors.shape == (4, 2)
+    # the pre-filter is tried once, later searches go straight to the post-filtered search
+    assert [bool(search.get("filter")) for search in collection.searches] == [True, False, False, False]
+    assert collection.searches[-1]["limit"] == 4 * mmr.NEWS_POSTFILTER_OVERFETCH
+
+
+def test_unfiltered_search_is_unaffected(store):
+    collection, vector_store = store
+    ids, _ = mmr.vector_candidates(vector_store, [1.0, 0.0], 4)
+    assert ids == ["0", "1", "2", "3"]
+    assert mmr._prefilter_rejected_at is None
+
+
+def test_prefilter_is_retried_after_the_index_is_rebuilt(store, monkeypatch):
+    collection, vector_store = store
+    clock = [1000.0]
+    monkeypatch.setattr(mmr.time, "monotonic", lambda: clock[0])
+    prefilter = {"category": "Technology"}
+    mmr.vector_candidates(vector_store, [1.0, 0.0], 4, prefilter)
+    # the indexer declares the filter fields, the running app notices at the next retry
+    collection.filter_fields = True
+    clock[0] += mmr.NEWS_PREFILTER_RETRY_SECONDS - 1
+    mmr.vector_candidates(vector_store, [1.0, 0.0], 4, prefilter)
+    clock[0] += 1
+    for _ in range(2):
+        mmr.vector_candidates(vector_store, [1.0, 0.0], 4, prefilter)
+    assert [bool(search.get("filter")) for search in collection.searches] == [True, False, False, True, True]
+    assert mmr._prefilter_rejected_at is None
@@ -1,20 +1,5 @@
-from langchain_community.document_loaders import JSONLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
-# load documents from json files
-def load_docs_from_json_files(file_path):
-
-  loader = JSONLoader(
-      file_path=file_path,
-      jq_schema='.[]',
-      text_content=False,
-      content_key='content',
-      metadata_func=metadata_func
-  )
-  docs = loader.load()
-  return docs
-
 # add metadata to the documents
 def metadata_func(record, metadata):
 
@@ -26,15 +11,6 @@ def metadata_func(record, metadata):
     return metadata
 
 
-# split the documents into chunks
-def split_docs(docs):
-  text_splitter = RecursiveCharacterTextSplitter(
-      chunk_size=1000, chunk_overlap=200)
-  splits = text_splitter.split_documents(docs)
-
-  return splits
-
-
 # create docs from web search results
 def create_docs_from_search_results(search_results: dict):
   docs = []
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from config.constants import EMBEDDING_CACHE_DIR, QUERY_EMBEDDING_CACHE_SIZE
+
+_KEY_BYTES = 16
+
+
+def embedding_key(model: str, kind: str, text: str) -> bytes:
+    """Cache key of a text. Documents and queries are embedded differently, so the kind is part of it."""
+    return hashlib.sha256(f"{model}\x00{kind}\x00{text}".encode("utf-8")).digest()[:_KEY_BYTES]
+
+
+class EmbeddingStore:
+    """Embeddings on disk: a memory-mapped float32 matrix and a text hash -> row index.
+
+    `vectors.f32` holds one row per embedding, `keys.bin` the 16 byte key of
+    every row in row order, and `meta.json` the model and dimension. A vector
+    is flushed before its key is appended, so after a crash the index never
+    points at a row that was not written. Only one process may write a store.
+    """
+
+    def __init__(self, directory: str, model: str):
+        self.directory = directory
+        self.model = model
+        self.dim: Optional[int] = None
+        self.rows: Dict[bytes, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._capacity = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._keys_path = os.path.join(directory, "keys.bin")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        if meta.get("model") != self.model:
+            logging.info(f"Embedding cache in {self.directory} is for {meta.get('model')}, starting a new one")
+            for path in (self._vectors_path, self._keys_path, self._meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        self.dim = meta["dim"]
+        keys = b""
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, "rb") as file:
+                keys = file.read()
+        count = len(keys) // _KEY_BYTES
+        self.rows = {keys[i * _KEY_BYTES:(i + 1) * _KEY_BYTES]: i for i in range(count)}
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        self._map(max(count, size // (4 * self.dim), 1024))
+
+    def _map(self, capacity: int):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "ab") as file:
+            file.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def get(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            return [
+                np.array(self._vectors[self.rows[key]]) if key in self.rows else None
+                for key in keys
+            ]
+
+    def put(self, keys: List[bytes], vectors: List[List[float]]):
+        if not keys:
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = len(vectors[0])
+                with open(self._meta_path, "w", encoding="utf-8") as file:
+                    json.dump({"model": self.model, "dim": self.dim}, file)
+                self._map(1024)
+            new = [(key, vector) for key, vector in zip(keys, vectors) if key not in self.rows]
+            if not new:
+                return
+            start = len(self.rows)
+            if start + len(new) > self._capacity:
+                # grow geometrically so appends stay amortised O(1)
+                self._map(max(start + len(new), 2 * self._capacity))
+            self._vectors[start:start + len(new)] = np.asarray([vector for _, vector in new], dtype=np.float32)
+            self._vectors.flush()
+            with open(self._keys_path, "ab") as file:
+                file.write(b"".join(key for key, _ in new))
+            for offset, (key, _) in enumerate(new):
+                self.rows[key] = start + offset
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class CachedEmbeddings(Embeddings):
+    """Wrap an embedding model so repeated texts are not sent to it again.
+
+    Document embeddings are kept in an `EmbeddingStore` on disk, opened on
+    the first `embed_documents` call so processes that only embed queries
+    never touch it. Query embeddings are kept in an in-memory LRU. Only the
+    texts that miss both are embedded, in one batch.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, directory: str = EMBEDDING_CACHE_DIR,
+                 query_cache_size: int = QUERY_EMBEDDING_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.model = model
+        self.directory = directory
+        self.query_cache_size = query_cache_size
+        self._store: Optional[EmbeddingStore] = None
+        self._queries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"document_hits": 0, "document_misses": 0, "query_hits": 0, "query_misses": 0}
+
+    @property
+    def store(self) -> EmbeddingStore:
+        with self._lock:
+            if self._store is None:
+                self._store = EmbeddingStore(self.directory, self.model)
+            return self._store
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [embedding_key(self.model, "document", text) for text in texts]
+        cached = self.store.get(keys)
+        # identical texts in one batch are embedded once
+        misses = {}
+        for key, text, vector in zip(keys, texts, cached):
+            if vector is None:
+                misses.setdefault(key, text)
+        with self._lock:
+            self.stats["document_hits"] += len(texts) - len(misses)
+            self.stats["document_misses"] += len(misses)
+        if misses:
+            vectors = self.embeddings.embed_documents(list(misses.values()))
+            self.store.put(list(misses), vectors)
+            cached = self.store.get(keys)
+        return [vector.tolist() for vector in cached]
+
+    def _cached_query(self, key: bytes) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._queries.get(key)
+            if vector is not None:
+                self._queries.move_to_end(key)
+                self.stats["query_hits"] += 1
+            else:
+                self.stats["query_misses"] += 1
+            return vector
+
+    def _cache_query(self, key: bytes, vector: List[float]):
+        with self._lock:
+            self._queries[key] = vector
+            self._queries.move_to_end(key)
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = embedding_key(self.model, "query", text)
+        vector = self._cached_query(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._cache_query(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = embedding_key(self.model, "query", text)
+        vector = self._cached_query(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self._cache_query(key, vector)
+        return vector
@@ -0,0 +1,451 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+from pymongo.errors import BulkWriteError
+from pymongo.results import DeleteResult
+from config.constants import (
+    INGESTION_SPLIT_WORKERS, INGESTION_RECORDS_PER_TASK, INGESTION_EMBED_BATCH_SIZE,
+    INGESTION_EMBED_CONCURRENCY, INGESTION_MAX_RETRIES,
+)
+from .doc_func import metadata_func
+from .manifest import IndexManifest, article_digest, article_key, chunk_id, file_digest
+
+# A chunk ready to embed: (id, text, metadata)
+Chunk = Tuple[str, str, dict]
+
+_decoder = json.JSONDecoder()
+
+
+def iter_json_records(file_path: str, read_size: int = 64 * 1024) -> Iterator[dict]:
+    """Yield the elements of a top level JSON array one at a time.
+
+    The file is read in `read_size` blocks and only the record being decoded
+    is kept in memory, so memory use does not grow with the file size.
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        buffer = ""
+        pos = 0
+        started = False
+        eof = False
+        while True:
+            # skip whitespace and separators between records
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if not started and pos < len(buffer):
+                if buffer[pos] != "[":
+                    raise ValueError(f"{file_path} does not contain a JSON array")
+                started = True
+                pos += 1
+                continue
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            if pos < len(buffer):
+                try:
+                    record, end = _decoder.raw_decode(buffer, pos)
+                    # a number decoded up to the end of the block, or up to a "." or "e" at
+                    # its end, may continue in the next one, a value is complete at a separator
+                    after = end
+                    while after < len(buffer) and buffer[after] in " \t\r\n":
+                        after += 1
+                    complete = eof or (after < len(buffer) and buffer[after] in ",]")
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    complete = False
+                if complete:
+                    pos = end
+                    yield record
+                    continue
+            if eof:
+                if started:
+                    raise ValueError(f"{file_path} ends before the JSON array is closed")
+                return
+            block = file.read(read_size)
+            eof = not block
+            buffer = buffer[pos:] + block
+            pos = 0
+
+
+_splitter = None
+
+
+def _split_records(records: List[Tuple[int, str, str, dict]], source: str) -> List[Tuple[str, str, List[Chunk]]]:
+    """Split (seq_num, key, digest, record) articles into (key, digest, chunks), runs in a worker process."""
+    global _splitter
+    if _splitter is None:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        _splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+
+    articles = []
+    for seq_num, key, digest, record in records:
+        # same metadata as the JSONLoader used to produce
+        metadata = metadata_func(record, {"source": source, "seq_num": seq_num})
+        chunks = []
+        occurrences: Dict[str, int] = {}
+        for text in _splitter.split_text(record.get("content") or ""):
+            occurrence = occurrences[text] = occurrences.get(text, -1) + 1
+            chunks.append((chunk_id(key, metadata, text, occurrence), text, dict(metadata)))
+        articles.append((key, digest, chunks))
+    return articles
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class IngestionStats:
+    """Throughput of one ingestion run."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self.docs = 0
+        self.chunks = 0
+        # articles whose content hash was already indexed, and chunks of changed
+        # articles that were indexed before, neither is embedded again
+        self.unchanged_docs = 0
+        self.reused_chunks = 0
+        self.deleted_chunks = 0
+        self.retries = 0
+        self.batch_latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def add_batch(self, chunks: int, latency: float, retries: int):
+        with self._lock:
+            self.chunks += chunks
+            self.retries += retries
+            self.batch_latencies.append(latency)
+
+    def merge(self, other: "IngestionStats"):
+        """Add the counts of another run, the elapsed time is kept."""
+        with self._lock:
+            self.docs += other.docs
+            self.chunks += other.chunks
+            self.unchanged_docs += other.unchanged_docs
+            self.reused_chunks += other.reused_chunks
+            self.deleted_chunks += other.deleted_chunks
+            self.retries += other.retries
+            self.batch_latencies.extend(other.batch_latencies)
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    def as_dict(self) -> dict:
+        latencies = sorted(self.batch_latencies)
+        elapsed = self.elapsed or 1e-9
+        return {
+            "docs": self.docs,
+            "chunks": self.chunks,
+            "seconds": round(self.elapsed, 3),
+            "docs_per_sec": round(self.docs / elapsed, 1),
+            "chunks_per_sec": round(self.chunks / elapsed, 1),
+            "unchanged_docs": self.unchanged_docs,
+            "reused_chunks": self.reused_chunks,
+            "deleted_chunks": self.deleted_chunks,
+            "batches": len(latencies),
+            "batch_latency_p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+            "batch_latency_max": round(latencies[-1], 3) if latencies else None,
+            "retries": self.retries,
+        }
+
+
+class CollectionSink:
+    """Bulk writes embedded chunks into a MongoDB collection.
+
+    Documents have the layout `MongoDBAtlasVectorSearch` reads: the text and
+    the embedding under their keys, with the metadata fields at the top level.
+    The chunk id is the document `_id`. Ids are derived from the content, so
+    a document with the same id already holds the same chunk and writing it
+    again is a no-op. Any object with pymongo's `insert_many` and
+    `delete_many` works, see `InMemoryCollection`.
+    """
+
+    def __init__(self, collection, text_key: str = "text", embedding_key: str = "embedding"):
+        self.collection = collection
+        self.text_key = text_key
+        self.embedding_key = embedding_key
+
+    def write(self, chunks: List[Chunk], embeddings: List[List[float]]):
+        documents = [
+            {"_id": id, self.text_key: text, self.embedding_key: embedding, **metadata}
+            for (id, text, metadata), embedding in zip(chunks, embeddings)
+        ]
+        if not documents:
+            return
+        try:
+            self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # duplicate keys are chunks that are already stored
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+
+    def delete(self, ids: List[str], batch_size: int = 1000) -> int:
+        deleted = 0
+        for start in range(0, len(ids), batch_size):
+            deleted += self.collection.delete_many({"_id": {"$in": ids[start:start + batch_size]}}).deleted_count
+        return deleted
+
+    def delete_untracked(self, keep_ids: List[str]) -> int:
+        """Delete every document whose id is not in `keep_ids`, such as chunks stored with random ids."""
+        return self.collection.delete_many({"_id": {"$nin": keep_ids}}).deleted_count
+
+    def flush(self):
+        """Writes are durable once `insert_many` returns."""
+
+
+class VectorStoreSink:
+    """Writes embedded chunks into a `LocalVectorStore`, persisting it on `flush`."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def write(self, chunks: List[Chunk], embeddings: List[List[float]]):
+        self.store.add_embeddings(
+            [id for id, _, _ in chunks], [text for _, text, _ in chunks],
+            embeddings, [metadata for _, _, metadata in chunks])
+
+    def delete(self, ids: List[str]) -> int:
+        before = len(self.store)
+        self.store.delete(ids)
+        return before - len(self.store)
+
+    def delete_untracked(self, keep_ids: List[str]) -> int:
+        return self.store.delete_untracked(keep_ids)
+
+    def flush(self):
+        self.store.save()
+
+
+class LocalIndexSink:
+    """Keeps a local index of the chunks, a `BM25Index` or `SymbolIndex`, in step with the vector store."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def write(self, chunks: List[Chunk], embeddings: List[List[float]]):
+        self.index.add(chunks)
+
+    def delete(self, ids: List[str]) -> int:
+        return self.index.delete(ids)
+
+    def delete_untracked(self, keep_ids: List[str]) -> int:
+        return self.index.delete_untracked(keep_ids)
+
+    def flush(self):
+        self.index.save()
+
+
+class FanOutSink:
+    """Sends every write to several sinks. Counts are those of the first, the primary store."""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def write(self, chunks: List[Chunk], embeddings: List[List[float]]):
+        for sink in self.sinks:
+            sink.write(chunks, embeddings)
+
+    def delete(self, ids: List[str]) -> int:
+        return [sink.delete(ids) for sink in self.sinks][0]
+
+    def delete_untracked(self, keep_ids: List[str]) -> int:
+        return [sink.delete_untracked(keep_ids) for sink in self.sinks][0]
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+
+class InMemoryCollection:
+    """Local stand-in for a pymongo collection, for tests and dry runs."""
+
+    def __init__(self):
+        self.documents: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def insert_many(self, documents: List[dict], ordered: bool = True):
+        errors = []
+        with self._lock:
+            for index, document in enumerate(documents):
+                if document["_id"] in self.documents:
+                    errors.append({"index": index, "code": 11000, "errmsg": f"duplicate key: {document['_id']}"})
+                    if ordered:
+                        break
+                else:
+                    self.documents[document["_id"]] = document
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    def delete_many(self, filter: dict) -> DeleteResult:
+        condition = filter["_id"]
+        with self._lock:
+            if "$in" in condition:
+                ids = [id for id in condition["$in"] if id in self.documents]
+            else:
+                keep = set(condition["$nin"])
+                ids = [id for id in self.documents if id not in keep]
+            for id in ids:
+                del self.documents[id]
+        return DeleteResult({"n": len(ids)}, True)
+
+    def count_documents(self, filter: dict) -> int:
+        with self._lock:
+            return sum(
+                all(document.get(key) == value for key, value in filter.items())
+                for document in self.documents.values()
+            )
+
+
+class IngestionPipeline:
+    """Stream JSON news files into the vector collection.
+
+    Records are read lazily, split into chunks in a process pool, embedded in
+    fixed size batches by a bounded number of threads (retrying failed batches
+    with exponential backoff) and bulk inserted through the sink. At most a
+    few batches are in flight at every stage, so peak memory does not depend
+    on the file size.
+
+    `embeddings` is any LangChain `Embeddings`, only `embed_documents` is used.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        sink,
+        split_workers: int = INGESTION_SPLIT_WORKERS,
+        records_per_task: int = INGESTION_RECORDS_PER_TASK,
+        embed_batch_size: int = INGESTION_EMBED_BATCH_SIZE,
+        embed_concurrency: int = INGESTION_EMBED_CONCURRENCY,
+        max_retries: int = INGESTION_MAX_RETRIES,
+        retry_base_delay: float = 1.0,
+    ):
+        self.embeddings = embeddings
+        self.sink = sink
+        self.records_per_task = records_per_task
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.split_workers = split_workers
+        # with a single worker splitting runs inline, saving the process start up
+        self._split_pool = ProcessPoolExecutor(max_workers=split_workers) if split_workers > 1 else None
+        self._embed_pool = ThreadPoolExecutor(max_workers=embed_concurrency, thread_name_prefix="embed")
+
+    def close(self):
+        if self._split_pool is not None:
+            self._split_pool.shutdown()
+        self._embed_pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _embed_with_retry(self, texts: List[str]) -> Tuple[List[List[float]], int]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embeddings.embed_documents(texts), attempt
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_base_delay * 2 ** attempt * (1 + random.random())
+                logging.warning(f"Embedding batch failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _embed_and_write(self, chunks: List[Chunk], stats: IngestionStats):
+        start = time.perf_counter()
+        embeddings, retries = self._embed_with_retry([text for _, text, _ in chunks])
+        self.sink.write(chunks, embeddings)
+        stats.add_batch(len(chunks), time.perf_counter() - start, retries)
+
+    def _split(self, records, source) -> Future:
+        if self._split_pool is None:
+            future = Future()
+            future.set_result(_split_records(records, source))
+            return future
+        return self._split_pool.submit(_split_records, records, source)
+
+    def ingest_file(self, file_path: str, manifest: Optional[IndexManifest] = None,
+                    file_hash: Optional[str] = None) -> IngestionStats:
+        """Index the articles of a JSON file.
+
+        With a manifest, articles with an unchanged content hash are skipped,
+        only chunks that are not indexed yet are embedded, and chunks an edited
+        article no longer has are deleted. The manifest is updated, saving it
+        is left to the caller.
+        """
+        stats = IngestionStats()
+        # absolute path, like the JSONLoader records
+        source = os.path.abspath(file_path)
+        pending_splits: Deque[Future] = deque()
+        pending_embeds: Deque[Future] = deque()
+        buffer: List[Chunk] = []
+        keys: List[str] = []
+        # article key -> (content hash, chunk ids) of the articles split in this run
+        updated: Dict[str, Tuple[str, List[str]]] = {}
+        stale_ids: List[str] = []
+
+        def submit_embeds(flush=False):
+            while len(buffer) >= self.embed_batch_size or (flush and buffer):
+                batch = buffer[:self.embed_batch_size]
+                del buffer[:self.embed_batch_size]
+                pending_embeds.append(self._embed_pool.submit(self._embed_and_write, batch, stats))
+                # wait for the oldest batch before running too far ahead
+                while len(pending_embeds) > 2 * self.embed_concurrency:
+                    pending_embeds.popleft().result()
+
+        def collect_split(future: Future):
+            for key, digest, chunks in future.result():
+                indexed = set(manifest.chunk_ids(key)) if manifest else set()
+                ids = [chunk[0] for chunk in chunks]
+                new_chunks = [chunk for chunk in chunks if chunk[0] not in indexed]
+                stats.reused_chunks += len(chunks) - len(new_chunks)
+                buffer.extend(new_chunks)
+                stale_ids.extend(indexed.difference(ids))
+                updated[key] = (digest, ids)
+            submit_embeds()
+
+        def changed_records():
+            for seq_num, record in enumerate(iter_json_records(file_path), 1):
+                key = article_key(record)
+                keys.append(key)
+                stats.docs += 1
+                digest = article_digest(record)
+                if manifest and manifest.article_hash(key) == digest:
+                    stats.unchanged_docs += 1
+                    continue
+                yield seq_num, key, digest, record
+
+        for records in _batched(changed_records(), self.records_per_task):
+            pending_splits.append(self._split(records, source))
+            while len(pending_splits) > 2 * max(self.split_workers, 1):
+                collect_split(pending_splits.popleft())
+
+        while pending_splits:
+            collect_split(pending_splits.popleft())
+        submit_embeds(flush=True)
+        while pending_embeds:
+            pending_embeds.popleft().result()
+
+        if stale_ids:
+            stats.deleted_chunks += self.sink.delete(stale_ids)
+        self.sink.flush()
+        if manifest is not None:
+            for key, (digest, ids) in updated.items():
+                manifest.set_article(key, digest, ids)
+            manifest.add_file(file_hash or file_digest(file_path), file_path, keys)
+
+        stats.finished_at = time.perf_counter()
+        return stats
@@ -0,0 +1,169 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from config.constants import KEYWORD_INDEX_PATH
+from .metadata_filter import filter_values, matches
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.&'-][a-z0-9]+)*")
+_STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the their this to was were "
+    "will with about after all also been can into more new news not one over said than they what when which "
+    "who would you".split())
+
+# Fields kept per chunk so searches can be pre-filtered like the vector search
+FILTER_FIELDS = ("date", "category")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOP_WORDS]
+
+
+class BM25Index:
+    """Inverted index of the news chunks, scored with Okapi BM25.
+
+    Embeddings blur rare exact terms such as tickers and company names,
+    which a keyword index matches directly. The index holds, per chunk, its
+    length and the `FILTER_FIELDS`, and per term the chunks containing it
+    with their term frequency. It is updated by the indexer together with
+    the vector store and saved as JSON. Readers reload it when the file
+    changes.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, list] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._loaded_mtime = None
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with self._lock:
+            self._loaded_mtime = os.stat(self.path).st_mtime_ns
+            try:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+            except Exception as e:
+                logging.error(f"Error reading keyword index {self.path}: {e}")
+                return
+            self.docs = data.get("docs", {})
+            self.postings = data.get("postings", {})
+            self._total_length = sum(length for length, *_ in self.docs.values())
+
+    def _maybe_reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._loaded_mtime:
+            self._load()
+
+    def save(self):
+        with self._lock:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump({"docs": self.docs, "postings": self.postings}, file)
+            os.replace(temp_path, self.path)
+            self._loaded_mtime = os.stat(self.path).st_mtime_ns
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, chunks: Iterable[Tuple[str, str, dict]]):
+        """Index (id, text, metadata) chunks, the title is searched along with the text."""
+        with self._lock:
+            for id, text, metadata in chunks:
+                if id in self.docs:
+                    continue
+                counts = Counter(tokenize(f"{metadata.get('title') or ''}\n{text}"))
+                length = sum(counts.values())
+                self.docs[id] = [length, *(metadata.get(field) for field in FILTER_FIELDS)]
+                self._total_length += length
+                for term, count in counts.items():
+                    self.postings.setdefault(term, {})[id] = count
+
+    def delete(self, ids: Iterable[str]) -> int:
+        with self._lock:
+            removed = {id for id in ids if id in self.docs}
+            if not removed:
+                return 0
+            for id in removed:
+                self._total_length -= self.docs.pop(id)[0]
+            # one pass over the vocabulary for the whole batch
+            for term in list(self.postings):
+                postings = self.postings[term]
+                for id in removed.intersection(postings):
+                    del postings[id]
+                if not postings:
+                    del self.postings[term]
+            return len(removed)
+
+    def delete_untracked(self, keep_ids: Iterable[str]) -> int:
+        keep = set(keep_ids)
+        with self._lock:
+            return self.delete([id for id in self.docs if id not in keep])
+
+    def field_values(self, field: str) -> List:
+        """Distinct values of a filter field, for resolving user input to stored values."""
+        index = FILTER_FIELDS.index(field) + 1
+        with self._lock:
+            return sorted({doc[index] for doc in self.docs.values() if doc[index] is not None})
+
+    def filter_ids(self, ids: Iterable[str], filter: Optional[dict] = None) -> List[str]:
+        """The ids of indexed chunks that pass the filter, in the given order."""
+        self._maybe_reload()
+        values = filter_values(filter)
+        with self._lock:
+            return [
+                id for id in ids
+                if id in self.docs and matches(dict(zip(FILTER_FIELDS, self.docs[id][1:])), values)
+            ]
+
+    def search(self, query: str, limit: int = 20, filter: Optional[dict] = None,
+               ids: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Ids and BM25 scores of the best matching chunks that pass the filter, best first.
+
+        `ids` restricts the search to those chunks.
+        """
+        self._maybe_reload()
+        values = filter_values(filter)
+        with self._lock:
+            if not self.docs:
+                return []
+            average_length = self._total_length / len(self.docs)
+            scores: Dict[str, float] = {}
+            allowed: Dict[str, bool] = {}
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (len(self.docs) - len(postings) + 0.5) / (len(postings) + 0.5))
+                for id, count in postings.items():
+                    if ids is not None and id not in ids:
+                        continue
+                    if values:
+                        if id not in allowed:
+                            allowed[id] = matches(dict(zip(FILTER_FIELDS, self.docs[id][1:])), values)
+                        if not allowed[id]:
+                            continue
+                    norm = self.k1 * (1 - self.b + self.b * self.docs[id][0] / average_length)
+                    scores[id] = scores.get(id, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+@lru_cache(maxsize=1)
+def get_keyword_index() -> BM25Index:
+    return BM25Index(KEYWORD_INDEX_PATH)
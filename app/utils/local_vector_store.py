@@ -0,0 +1,370 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from config.constants import LOCAL_VECTOR_IVF_THRESHOLD, LOCAL_VECTOR_IVF_NPROBE
+from .metadata_filter import filter_values
+from .mmr import mmr_select
+
+# Internal columns of the records sidecar, the metadata fields get one column each
+_ID, _TEXT, _DELETED = "__id", "__text", "__deleted"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class IVFIndex:
+    """Inverted file index: vectors are grouped around k-means centroids and a
+    query only scores the groups of its `nprobe` nearest centroids."""
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray, nprobe: int):
+        self.centroids = centroids
+        self.assignments = assignments
+        self.nprobe = nprobe
+        self._order = None
+        self._offsets = None
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, nprobe: int, iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        """Spherical k-means with about sqrt(n) lists, trained on a sample of the vectors."""
+        rng = np.random.default_rng(seed)
+        nlist = max(1, int(np.sqrt(len(vectors))))
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), 32 * nlist), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(labels, kind="stable")
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            sums = np.zeros_like(centroids)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            sums[~empty] = np.add.reduceat(sample[order], starts[~empty], axis=0)
+            # re-seed empty lists so every centroid keeps a share of the data
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = _normalize(sums)
+        index = cls(centroids.astype(np.float32), np.empty(0, dtype=np.int32), nprobe)
+        index.add(vectors)
+        return index
+
+    def assign(self, vectors: np.ndarray, block: int = 65536) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[start:start + block] @ self.centroids.T, axis=1).astype(np.int32)
+            for start in range(0, len(vectors), block)
+        ]) if len(vectors) else np.empty(0, dtype=np.int32)
+
+    def add(self, vectors: np.ndarray):
+        self.assignments = np.concatenate([self.assignments, self.assign(vectors)])
+        self._order = None
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        """Rows in the lists nearest to the query."""
+        if self._order is None:
+            self._order = np.argsort(self.assignments, kind="stable")
+            self._offsets = np.searchsorted(self.assignments[self._order], np.arange(len(self.centroids) + 1))
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self._order[self._offsets[c]:self._offsets[c + 1]] for c in probes])
+
+
+class LocalVectorStore(VectorStore):
+    """In-process vector store persisted in a directory, an offline alternative to Atlas.
+
+    - `vectors.f32`: memory-mapped float32 matrix of unit length embeddings
+    - `records.parquet`: columnar sidecar with the id, text, deleted flag and
+      one column per metadata field
+    - `ivf_centroids.npy` / `ivf_assignments.npy`: the IVF index, once trained
+    - `meta.json`: dimension, row count and index type, written last
+
+    Small corpora are searched exactly with one matrix-vector product. From
+    `ivf_threshold` vectors on, `save` trains an IVF index and searches only
+    score the lists nearest to the query. A store notices when another
+    process (the indexer) saved the directory and reloads before searching.
+    """
+
+    def __init__(self, directory: str, embedding: Embeddings,
+                 ivf_threshold: int = LOCAL_VECTOR_IVF_THRESHOLD, nprobe: int = LOCAL_VECTOR_IVF_NPROBE):
+        self.directory = directory
+        self.embedding = embedding
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._records_path = os.path.join(directory, "records.parquet")
+        self._centroids_path = os.path.join(directory, "ivf_centroids.npy")
+        self._assignments_path = os.path.join(directory, "ivf_assignments.npy")
+        self._loaded_mtime = None
+        self._reset()
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def _reset(self):
+        self.dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._capacity = 0
+        self._count = 0
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._rows: Dict[str, int] = {}
+        self._ivf: Optional[IVFIndex] = None
+        # metadata field -> value -> rows, built on the first filtered search
+        self._field_rows: Dict[str, Dict[Any, List[int]]] = {}
+
+    # Persistence
+
+    def _load(self):
+        if not os.path.exists(self._meta_path):
+            return
+        with self._lock:
+            self._reset()
+            self._loaded_mtime = os.stat(self._meta_path).st_mtime_ns
+            with open(self._meta_path, "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            self.dim = meta["dim"]
+            table = pq.read_table(self._records_path)
+            columns = table.to_pydict()
+            self._ids = columns.pop(_ID)
+            self._texts = columns.pop(_TEXT)
+            self._alive = ~np.asarray(columns.pop(_DELETED), dtype=bool)
+            names = list(columns)
+            self._metadatas = [
+                {name: columns[name][row] for name in names if columns[name][row] is not None}
+                for row in range(len(self._ids))
+            ]
+            self._count = len(self._ids)
+            self._rows = {id: row for row, id in enumerate(self._ids) if self._alive[row]}
+            self._map(max(self._count, 1024))
+            if meta.get("index") == "ivf" and os.path.exists(self._centroids_path):
+                assignments = np.load(self._assignments_path)
+                self._ivf = IVFIndex(np.load(self._centroids_path), assignments[:self._count], self.nprobe)
+                # rows saved after the index was written are assigned now
+                self._ivf.add(self._vectors[len(self._ivf.assignments):self._count])
+
+    def _map(self, capacity: int):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "ab") as file:
+            if os.path.getsize(self._vectors_path) < capacity * self.dim * 4:
+                file.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def _maybe_reload(self):
+        try:
+            mtime = os.stat(self._meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._loaded_mtime:
+            logging.info(f"Reloading local vector store from {self.directory}")
+            self._load()
+
+    def save(self):
+        """Persist the store, training or refreshing the IVF index once the corpus is large enough."""
+        with self._lock:
+            if self.dim is None:
+                return
+            alive = int(self._alive[:self._count].sum())
+            # lists are sized for the corpus they were trained on, retrain once it has doubled
+            trained_on = len(self._ivf.centroids) ** 2 if self._ivf is not None else 0
+            if alive >= self.ivf_threshold and alive > 2 * trained_on:
+                logging.info(f"Training IVF index over {alive} vectors")
+                self._ivf = IVFIndex.train(np.asarray(self._vectors[:self._count]), self.nprobe)
+            self._vectors.flush()
+            rows = [
+                {_ID: id, _TEXT: text, _DELETED: not alive_row, **metadata}
+                for id, text, metadata, alive_row in zip(self._ids, self._texts, self._metadatas, self._alive)
+            ]
+            temp_path = self._records_path + ".tmp"
+            pq.write_table(pa.Table.from_pylist(rows), temp_path)
+            os.replace(temp_path, self._records_path)
+            if self._ivf is not None:
+                np.save(self._centroids_path, self._ivf.centroids)
+                np.save(self._assignments_path, self._ivf.assignments)
+            temp_path = self._meta_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump({"dim": self.dim, "count": self._count,
+                           "index": "ivf" if self._ivf is not None else "flat"}, file)
+            os.replace(temp_path, self._meta_path)
+            self._loaded_mtime = os.stat(self._meta_path).st_mtime_ns
+
+    # Writes
+
+    def add_embeddings(self, ids: List[str], texts: List[str], embeddings: List[List[float]],
+                       metadatas: Optional[List[dict]] = None) -> List[str]:
+        """Add pre-computed embeddings. Ids that are already stored are skipped."""
+        metadatas = metadatas or [{} for _ in texts]
+        with self._lock:
+            new = [
+                (id, text, vector, metadata)
+                for id, text, vector, metadata in zip(ids, texts, embeddings, metadatas)
+                if id not in self._rows
+            ]
+            if not new:
+                return []
+            if self.dim is None:
+                self.dim = len(new[0][2])
+                self._map(1024)
+            start = self._count
+            if start + len(new) > self._capacity:
+                self._map(max(start + len(new), 2 * self._capacity))
+            vectors = _normalize(np.asarray([vector for _, _, vector, _ in new], dtype=np.float32))
+            self._vectors[start:start + len(new)] = vectors
+            for offset, (id, text, _, metadata) in enumerate(new):
+                self._ids.append(id)
+                self._texts.append(text)
+                self._metadatas.append(dict(metadata))
+                self._rows[id] = start + offset
+            self._alive = np.concatenate([self._alive, np.ones(len(new), dtype=bool)])
+            self._count += len(new)
+            self._field_rows = {}
+            if self._ivf is not None:
+                self._ivf.add(vectors)
+            return [id for id, _, _, _ in new]
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self.add_embeddings(ids, texts, self.embedding.embed_documents(texts), metadatas)
+        self.save()
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            for id in ids or []:
+                row = self._rows.pop(id, None)
+                if row is not None:
+                    self._alive[row] = False
+        return True
+
+    def delete_untracked(self, keep_ids: List[str]) -> int:
+        keep = set(keep_ids)
+        with self._lock:
+            untracked = [id for id in self._rows if id not in keep]
+        self.delete(untracked)
+        return len(untracked)
+
+    def __len__(self):
+        return len(self._rows)
+
+    # Search
+
+    def _filter_mask(self, pre_filter: dict) -> np.ndarray:
+        mask = self._alive[:self._count].copy()
+        for field, allowed in filter_values(pre_filter).items():
+            if field not in self._field_rows:
+                value_rows: Dict[Any, List[int]] = {}
+                for row, metadata in enumerate(self._metadatas):
+                    value_rows.setdefault(metadata.get(field), []).append(row)
+                self._field_rows[field] = value_rows
+            field_mask = np.zeros(self._count, dtype=bool)
+            for value in allowed:
+                field_mask[self._field_rows[field].get(value, [])] = True
+            mask &= field_mask
+        return mask
+
+    def _search(self, query: np.ndarray, fetch_k: int,
+                pre_filter: Optional[dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and cosine similarities of the `fetch_k` nearest live vectors that pass the filter, best first."""
+        self._maybe_reload()
+        with self._lock:
+            if not self._rows:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            query = _normalize(np.asarray(query, dtype=np.float32))
+            if pre_filter:
+                # the filter narrows the candidates before scoring, which are then scored exactly
+                rows = np.flatnonzero(self._filter_mask(pre_filter))
+                scores = self._vectors[rows] @ query
+            elif self._ivf is not None:
+                rows = self._ivf.candidates(query)
+                rows = rows[self._alive[rows]]
+                scores = self._vectors[rows] @ query
+            else:
+                # score the whole matrix in place, gathering the live rows first would copy it
+                scores = self._vectors[:self._count] @ query
+                rows = np.flatnonzero(self._alive[:self._count])
+                scores = scores[rows]
+            if len(rows) > fetch_k:
+                top = np.argpartition(-scores, fetch_k - 1)[:fetch_k]
+                rows, scores = rows[top], scores[top]
+            order = np.argsort(-scores, kind="stable")
+            return rows[order], scores[order]
+
+    def _document(self, row: int) -> Document:
+        return Document(id=self._ids[row], page_content=self._texts[row], metadata=dict(self._metadatas[row]))
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        rows, scores = self._search(np.asarray(embedding), k, kwargs.get("pre_filter"))
+        return [(self._document(row), float(score)) for row, score in zip(rows, scores)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _similarity_search_with_relevance_scores(self, query: str, k: int = 4,
+                                                 **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score(query, k, **kwargs)
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5, **kwargs: Any) -> List[Document]:
+        ids, candidates = self.vector_candidates(embedding, fetch_k, kwargs.get("pre_filter"))
+        selected = mmr_select(np.asarray(embedding, dtype=np.float32), candidates, k, lambda_mult)
+        return self.get_by_ids([ids[i] for i in selected])
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20,
+                                      lambda_mult: float = 0.5, **kwargs: Any) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self.embedding.embed_query(query), k, fetch_k, lambda_mult, **kwargs)
+
+    def vector_candidates(self, embedding: List[float], fetch_k: int,
+                          pre_filter: Optional[dict] = None) -> Tuple[List[str], np.ndarray]:
+        """Ids and vectors of the nearest chunks, best first."""
+        rows, _ = self._search(np.asarray(embedding), fetch_k, pre_filter)
+        with self._lock:
+            return [self._ids[row] for row in rows], np.asarray(self._vectors[rows])
+
+    def get_vectors(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        with self._lock:
+            return {id: np.array(self._vectors[self._rows[id]]) for id in ids if id in self._rows}
+
+    def iter_chunks(self) -> Iterable[Tuple[str, str, dict]]:
+        """(id, text, metadata) of every stored chunk."""
+        self._maybe_reload()
+        with self._lock:
+            rows = list(self._rows.values())
+        for row in rows:
+            yield self._ids[row], self._texts[row], dict(self._metadatas[row])
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        with self._lock:
+            return [self._document(self._rows[id]) for id in ids if id in self._rows]
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   *, directory: str, ids: Optional[List[str]] = None, **kwargs: Any) -> "LocalVectorStore":
+        store = cls(directory, embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        return store
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional
+
+
+def file_digest(file_path: str, read_size: int = 1024 * 1024) -> str:
+    """Content hash of a file, so a renamed file is recognised."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while block := file.read(read_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def article_key(record: dict) -> str:
+    """Stable identity of a scraped article, its URL when it has one."""
+    if record.get("url"):
+        return record["url"]
+    return "sha256:" + hashlib.sha256(
+        f"{record.get('title')}\x00{record.get('date')}".encode("utf-8")).hexdigest()
+
+
+def article_digest(record: dict) -> str:
+    """Content hash of an article, changes whenever any of its fields does."""
+    return hashlib.sha256(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def chunk_id(key: str, metadata: dict, text: str, occurrence: int) -> str:
+    """Deterministic id of a chunk, so writing it again replaces the same document.
+
+    Built from the article, the searchable metadata and the text, plus the
+    number of earlier identical chunks in the article. Editing one paragraph
+    of an article therefore only changes the ids of the chunks around it.
+    """
+    fields = [key, metadata.get("title"), metadata.get("date"), metadata.get("category"), text, occurrence]
+    return hashlib.sha256(json.dumps(fields).encode("utf-8")).hexdigest()[:32]
+
+
+class IndexManifest:
+    """What is in the vector index, by content hash.
+
+    - files: file hash -> path and the keys of the articles it contains
+    - articles: article key -> article hash and the ids of its chunks
+
+    A file whose hash is known is skipped even if it was renamed, an article
+    whose hash is unchanged is not split or embedded again, and the chunks of
+    articles no longer contained in any indexed file can be found and deleted.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, dict] = {}
+        self.articles: Dict[str, dict] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+                self.files = data.get("files", {})
+                self.articles = data.get("articles", {})
+            except Exception as e:
+                logging.error(f"Error reading {path}, indexing from scratch: {e}")
+
+    def save(self):
+        # write to a temporary file first, so a crash never leaves a truncated manifest
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"files": self.files, "articles": self.articles}, file)
+        os.replace(temp_path, self.path)
+
+    def has_file(self, file_hash: str) -> bool:
+        return file_hash in self.files
+
+    def file_paths(self) -> Dict[str, str]:
+        return {file_hash: entry["path"] for file_hash, entry in self.files.items()}
+
+    def add_file(self, file_hash: str, path: str, keys: Iterable[str]):
+        self.files[file_hash] = {"path": path, "articles": sorted(set(keys))}
+
+    def move_file(self, file_hash: str, path: str):
+        self.files[file_hash]["path"] = path
+
+    def remove_file(self, file_hash: str):
+        self.files.pop(file_hash, None)
+
+    def article_hash(self, key: str) -> Optional[str]:
+        entry = self.articles.get(key)
+        return entry["hash"] if entry else None
+
+    def chunk_ids(self, key: str) -> List[str]:
+        entry = self.articles.get(key)
+        return entry["chunks"] if entry else []
+
+    def set_article(self, key: str, digest: str, chunk_ids: List[str]):
+        self.articles[key] = {"hash": digest, "chunks": chunk_ids}
+
+    def all_chunk_ids(self) -> List[str]:
+        return [chunk for entry in self.articles.values() for chunk in entry["chunks"]]
+
+    def remove_orphaned_articles(self) -> List[str]:
+        """Forget articles no indexed file contains, returns the ids of their chunks."""
+        referenced = {key for entry in self.files.values() for key in entry["articles"]}
+        chunk_ids = []
+        for key in [key for key in self.articles if key not in referenced]:
+            chunk_ids.extend(self.articles.pop(key)["chunks"])
+        return chunk_ids
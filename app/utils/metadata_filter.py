@@ -0,0 +1,23 @@
+from typing import Dict, Optional, Set
+
+
+def filter_values(filter: Optional[dict]) -> Dict[str, Set]:
+    """Allowed values per field of a MongoDB style equality filter.
+
+    Only the subset that `$vectorSearch` pre-filters and the local indexes
+    share is supported: `{"field": value}` and `{"field": {"$in": [...]}}`,
+    combined with AND.
+    """
+    values = {}
+    for field, condition in (filter or {}).items():
+        if isinstance(condition, dict):
+            if set(condition) != {"$in"}:
+                raise ValueError(f"Unsupported filter on {field}: {condition}")
+            values[field] = set(condition["$in"])
+        else:
+            values[field] = {condition}
+    return values
+
+
+def matches(metadata: dict, values: Dict[str, Set]) -> bool:
+    return all(metadata.get(field) in allowed for field, allowed in values.items())
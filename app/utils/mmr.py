@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from config.constants import NEWS_POSTFILTER_OVERFETCH, NEWS_PREFILTER_RETRY_SECONDS
+from .metadata_filter import filter_values, matches
+
+# When Atlas last rejected a pre-filter, retried after an interval as the indexer may add the filter fields meanwhile
+_prefilter_rejected_at: Optional[float] = None
+
+
+def mmr_select(query: np.ndarray, candidates: np.ndarray, k: int = 4, lambda_mult: float = 0.5,
+               relevance: Optional[np.ndarray] = None) -> List[int]:
+    """Greedy maximal marginal relevance over a matrix of candidate vectors.
+
+    The candidate similarity matrix is computed once, after which each step
+    only updates every candidate's highest similarity to the selection, so
+    picking k of n candidates costs one n x n product plus O(k * n).
+    `relevance` replaces the cosine similarity to the query, e.g. with fused
+    ranking scores. Returns the indices of the selected rows, in selection order.
+    """
+    if len(candidates) == 0 or k <= 0:
+        return []
+    candidates = np.asarray(candidates, dtype=np.float32)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    if relevance is None:
+        query = np.asarray(query, dtype=np.float32)
+        relevance = candidates @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    similarity = candidates @ candidates.T
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    selected = [int(np.argmax(relevance))]
+    for _ in range(min(k, len(candidates)) - 1):
+        np.maximum(redundancy, similarity[selected[-1]], out=redundancy)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        selected.append(int(np.argmax(scores)))
+    return selected
+
+
+# Backend access used by MMR and hybrid search. Atlas returns only the ids
+# and embeddings of the candidates, and the selected documents are fetched
+# without their embeddings; the local store serves both from memory.
+
+def vector_candidates(vector_store: VectorStore, query_vector: List[float], fetch_k: int,
+                      pre_filter: Optional[dict] = None) -> Tuple[List[str], np.ndarray]:
+    """Ids and embeddings of the `fetch_k` nearest chunks that pass the filter, best first."""
+    # langchain_mongodb is already loaded by the vector store, imported here to keep it off the startup path
+    from langchain_mongodb import MongoDBAtlasVectorSearch
+    from langchain_mongodb.pipelines import vector_search_stage
+
+    if not isinstance(vector_store, MongoDBAtlasVectorSearch):
+        return vector_store.vector_candidates(query_vector, fetch_k, pre_filter)
+    from pymongo.errors import OperationFailure
+
+    global _prefilter_rejected_at
+    embedding_key = vector_store._embedding_key
+    candidates = None
+    if (pre_filter is None or _prefilter_rejected_at is None
+            or time.monotonic() - _prefilter_rejected_at >= NEWS_PREFILTER_RETRY_SECONDS):
+        try:
+            candidates = list(vector_store._collection.aggregate([
+                vector_search_stage(query_vector, embedding_key, vector_store._index_name, fetch_k, pre_filter),
+                {"$project": {"_id": 1, embedding_key: 1}},
+            ]))
+            if pre_filter is not None:
+                _prefilter_rejected_at = None
+        except OperationFailure as e:
+            if pre_filter is None:
+                raise
+            _prefilter_rejected_at = time.monotonic()
+            logging.warning(f"Vector search index rejected the pre-filter ({e}), post-filtering for the next "
+                            f"{NEWS_PREFILTER_RETRY_SECONDS}s. Run `python indexer.py --rebuild-indexes` "
+                            f"to declare the filter fields")
+    if candidates is None:
+        # without filter fields in the index, filter a larger unfiltered candidate set
+        values = filter_values(pre_filter)
+        candidates = [
+            candidate for candidate in vector_store._collection.aggregate([
+                vector_search_stage(query_vector, embedding_key, vector_store._index_name,
+                                    fetch_k * NEWS_POSTFILTER_OVERFETCH),
+                {"$project": {"_id": 1, embedding_key: 1, **{field: 1 for field in values}}},
+            ])
+            if matches(candidate, values)
+        ][:fetch_k]
+    return ([candidate["_id"] for candidate in candidates],
+            np.asarray([candidate[embedding_key] for candidate in candidates], dtype=np.float32))
+
+
+def fetch_vectors(vector_store: VectorStore, ids: List[str]) -> Dict[str, np.ndarray]:
+    from langchain_mongodb import MongoDBAtlasVectorSearch
+
+    if not ids:
+        return {}
+    if not isinstance(vector_store, MongoDBAtlasVectorSearch):
+        return vector_store.get_vectors(ids)
+    embedding_key = vector_store._embedding_key
+    return {
+        document["_id"]: np.asarray(document[embedding_key], dtype=np.float32)
+        for document in vector_store._collection.find({"_id": {"$in": ids}}, {embedding_key: 1})
+    }
+
+
+def fetch_documents(vector_store: VectorStore, ids: List[str]) -> List[Document]:
+    """Documents of the ids in the given order, without embeddings."""
+    from langchain_mongodb import MongoDBAtlasVectorSearch
+    from langchain_mongodb.utils import make_serializable
+
+    if not isinstance(vector_store, MongoDBAtlasVectorSearch):
+        return vector_store.get_by_ids(ids)
+    found = {
+        document["_id"]: document
+        for document in vector_store._collection.find({"_id": {"$in": ids}}, {vector_store._embedding_key: 0})
+    }
+    documents = []
+    for id in ids:
+        if id not in found:
+            continue
+        document = found[id]
+        text = document.pop(vector_store._text_key)
+        make_serializable(document)
+        documents.append(Document(page_content=text, metadata=document))
+    return documents
+
+
+def mmr_search_by_vector(vector_store: VectorStore, query_vector: List[float], k: int = 4, fetch_k: int = 20,
+                         lambda_mult: float = 0.5, pre_filter: Optional[dict] = None) -> List[Document]:
+    """MMR search that never returns embeddings in the document metadata."""
+    ids, candidates = vector_candidates(vector_store, query_vector, fetch_k, pre_filter)
+    selected = mmr_select(np.asarray(query_vector), candidates, k, lambda_mult)
+    return fetch_documents(vector_store, [ids[i] for i in selected])
+
+
+def mmr_search(vector_store: VectorStore, query: str, k: int = 4, fetch_k: int = 20,
+               lambda_mult: float = 0.5, pre_filter: Optional[dict] = None) -> List[Document]:
+    return mmr_search_by_vector(
+        vector_store, vector_store.embeddings.embed_query(query), k, fetch_k, lambda_mult, pre_filter)
+
+
+class MMRRetriever(BaseRetriever):
+    """Retriever running `mmr_search` on a vector store, a drop-in for `as_retriever(search_type="mmr")`."""
+
+    vector_store: VectorStore
+    k: int = 4
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return mmr_search(self.vector_store, query, self.k, self.fetch_k, self.lambda_mult)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        query_vector = await self.vector_store.embeddings.aembed_query(query)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, mmr_search_by_vector, self.vector_store, query_vector, self.k, self.fetch_k, self.lambda_mult)
@@ -0,0 +1,129 @@
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from config.constants import RRF_K, SYMBOL_MAX_CANDIDATES
+from .keyword_index import BM25Index
+from .mmr import fetch_documents, fetch_vectors, mmr_select, vector_candidates
+from .symbol_index import SymbolIndex, resolve_symbol
+
+# Days covered by each time window, counted back from today
+TIME_WINDOWS = {"day": 1, "week": 7, "month": 31, "quarter": 92, "year": 366}
+
+
+def time_window_dates(time_window: str, today: Optional[date] = None) -> Optional[List[str]]:
+    """The ISO dates in a time window, None for "any".
+
+    Articles store their date as a "YYYY-MM-DD" string, and a window is at
+    most a year long, so it is filtered as a list of dates: `$in` on strings
+    is a filter `$vectorSearch` supports without a range index.
+    """
+    if time_window in (None, "any"):
+        return None
+    if time_window not in TIME_WINDOWS:
+        raise ValueError(f"Unknown time window: {time_window}")
+    today = today or date.today()
+    return [(today - timedelta(days=days)).isoformat() for days in range(TIME_WINDOWS[time_window])]
+
+
+def resolve_category(category: Optional[str], known: List[str]) -> Optional[List[str]]:
+    """Stored categories matching a user supplied one, ignoring case."""
+    if not category:
+        return None
+    wanted = category.strip().lower()
+    exact = [value for value in known if value.lower() == wanted]
+    return exact or [value for value in known if wanted in value.lower()] or [category]
+
+
+def build_prefilter(time_window: str = "any", categories: Optional[List[str]] = None) -> Optional[dict]:
+    prefilter = {}
+    dates = time_window_dates(time_window)
+    if dates is not None:
+        prefilter["date"] = {"$in": dates}
+    if categories:
+        prefilter["category"] = {"$in": categories}
+    return prefilter or None
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> Dict[str, float]:
+    """Fused scores of ranked id lists, highest first. Only the ranks matter, not the scores."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, id in enumerate(ranking):
+            scores[id] = scores.get(id, 0.0) + 1 / (k + rank + 1)
+    return dict(sorted(scores.items(), key=lambda item: item[1], reverse=True))
+
+
+def _symbol_rankings(vector_store: VectorStore, keyword_index: BM25Index, symbol_index: SymbolIndex,
+                     symbol: str, query: str, query_vector: List[float], fetch_k: int, time_window: str,
+                     categories: Optional[List[str]]) -> Tuple[List[List[str]], Dict[str, np.ndarray]]:
+    """Vector, keyword and recency rankings of the chunks that mention a symbol, and their vectors.
+
+    The symbol index yields the candidates directly, newest first, so instead
+    of a vector search only their vectors are scored.
+    """
+    dates = time_window_dates(time_window)
+    ids = [
+        posting["chunk_id"]
+        for posting in symbol_index.lookup(symbol, set(dates) if dates else None, SYMBOL_MAX_CANDIDATES)
+    ]
+    if categories:
+        ids = keyword_index.filter_ids(ids, {"category": {"$in": categories}})
+    vectors = fetch_vectors(vector_store, ids)
+    ids = [id for id in ids if id in vectors]
+    if not ids:
+        return [], {}
+    matrix = np.stack([vectors[id] for id in ids])
+    query_vector = np.asarray(query_vector, dtype=np.float32)
+    similarity = matrix @ query_vector / np.maximum(
+        np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector), 1e-12)
+    vector_ids = [ids[i] for i in np.argsort(-similarity, kind="stable")[:fetch_k]]
+    keyword_ids = [id for id, _ in keyword_index.search(query, fetch_k, ids=set(ids))]
+    return [vector_ids, keyword_ids, ids[:fetch_k]], vectors
+
+
+def hybrid_news_search(vector_store: VectorStore, keyword_index: BM25Index, query: str, k: int = 4,
+                       fetch_k: int = 20, time_window: str = "any", category: Optional[str] = None,
+                       lambda_mult: float = 0.5, symbol_index: Optional[SymbolIndex] = None,
+                       stock_symbol: Optional[str] = None) -> List[Document]:
+    """News chunks for a query from vector and BM25 search, fused and diversified.
+
+    Both searches are pre-filtered by the time window and category, so only
+    matching chunks are ever scored. With a stock symbol, the candidates are
+    the chunks the symbol index lists for it, also ranked by recency. The
+    rankings are combined with reciprocal rank fusion, and MMR picks `k` of
+    the best `fetch_k` fused candidates, using the fused score as their
+    relevance.
+    """
+    categories = resolve_category(category, keyword_index.field_values("category"))
+    query_vector = vector_store.embeddings.embed_query(query)
+    symbol = resolve_symbol(stock_symbol) if stock_symbol and symbol_index is not None else None
+    if stock_symbol and symbol is None:
+        logging.info(f"{stock_symbol} is not in the symbol dictionary, searching without it")
+    if symbol is not None:
+        rankings, known = _symbol_rankings(
+            vector_store, keyword_index, symbol_index, symbol, query, query_vector, fetch_k, time_window, categories)
+        logging.info(f"Symbol search for {symbol}: {len(known)} chunks")
+    else:
+        prefilter = build_prefilter(time_window, categories)
+        vector_ids, vectors = vector_candidates(vector_store, query_vector, fetch_k, prefilter)
+        keyword_ids = [id for id, _ in keyword_index.search(query, fetch_k, prefilter)]
+        rankings, known = [vector_ids, keyword_ids], dict(zip(vector_ids, vectors))
+        logging.info(f"Hybrid search: {len(vector_ids)} vector and {len(keyword_ids)} keyword candidates, "
+                     f"prefilter {sorted(prefilter) if prefilter else None}")
+    fused = list(reciprocal_rank_fusion(rankings).items())[:fetch_k]
+    if not fused:
+        return []
+
+    # keyword hits the vector search did not return still need a vector for MMR
+    known.update(fetch_vectors(vector_store, [id for id, _ in fused if id not in known]))
+    fused = [(id, score) for id, score in fused if id in known]
+    if not fused:
+        return []
+    relevance = np.asarray([score for _, score in fused], dtype=np.float32)
+    selected = mmr_select(
+        np.asarray(query_vector), np.stack([known[id] for id, _ in fused]), k, lambda_mult,
+        relevance=relevance / relevance.max())
+    return fetch_documents(vector_store, [fused[i][0] for i in selected])
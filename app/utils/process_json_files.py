@@ -1,7 +1,11 @@
 import os
 import logging
-from .doc_func import load_docs_from_json_files, split_docs
-from .vector_store import add_to_vector_store, get_vector_store
+from functools import lru_cache
+from config.constants import VECTOR_STORE_BACKEND
+from .ingestion import IngestionPipeline, CollectionSink, VectorStoreSink, LocalIndexSink, FanOutSink
+from .keyword_index import get_keyword_index
+from .symbol_index import get_symbol_index
+from .vector_store import get_vector_store, get_mongodb_collection
 
 
 
@@ -14,42 +18,29 @@ def get_json_files_list(directory):
         return []
     
     
-def load_processed_files(processed_files_path):
-    """Load the list of processed files from a text file."""
-    if os.path.exists(processed_files_path):
-        try:
-            with open(processed_files_path, 'r') as file:
-                # return the names of the processed files
-                return file.read().splitlines()
-        except Exception as e:
-            logging.error(f"Error reading {processed_files_path}: {e}")
-    return []
-
-
-def save_processed_file(processed_files_path, file_name):
-    """Save the processed file name to the text file."""
-    try:
-        with open(processed_files_path, 'a') as file:
-            file.write(file_name + '\n')
-        logging.info(f"Processed file {file_name} saved to {processed_files_path}")    
-    except Exception as e:
-        logging.error(f"Error writing to {processed_files_path}: {e}")
-
-
-def load_file_content_to_vector_store(json_file):
-  """Process a single JSON file if it has not been processed yet."""
+@lru_cache(maxsize=1)
+def get_ingestion_pipeline():
+  """Pipeline that embeds chunks with the vector store's model and writes them to its collection and the local indexes."""
+  vector_store = get_vector_store()
+  if VECTOR_STORE_BACKEND == "local":
+    sink = VectorStoreSink(vector_store)
+  else:
+    sink = CollectionSink(get_mongodb_collection())
+  return IngestionPipeline(vector_store.embeddings, FanOutSink(
+    sink, LocalIndexSink(get_keyword_index()), LocalIndexSink(get_symbol_index())
+  ))
+
+
+def load_file_content_to_vector_store(json_file, manifest=None, file_hash=None):
+  """Process a single JSON file, returns the ingestion stats or None if it failed."""
    
   try:
-    # load the Documents from the JSON file
-    docs = load_docs_from_json_files(json_file)
-    # split the Documents into smaller chunks
-    splits = split_docs(docs)
-    # add the chunks to the vector store
-    vector_store = get_vector_store()
-    add_to_vector_store(splits, vector_store)
-    logging.info(f"Add {len(splits)} documents from {json_file} to the vector store.")
-    print(f"Add {len(splits)} documents from {json_file} to the vector store.")
+    # stream the articles of the file through splitting, embedding and insertion
+    stats = get_ingestion_pipeline().ingest_file(json_file, manifest, file_hash)
+    logging.info(f"Add {stats.chunks} documents from {json_file} to the vector store. {stats.as_dict()}")
+    print(f"Add {stats.chunks} documents from {json_file} to the vector store.")
+    return stats
             
   except Exception as e:
     logging.error(f"Failed to process {json_file}: {e}")
-
+    return None
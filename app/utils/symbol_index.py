@@ -0,0 +1,138 @@
+import bisect
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from config.constants import SYMBOL_INDEX_PATH
+from config.symbols import COMPANY_ALIASES, NEWS_CASE_SENSITIVE_ALIASES, NEWS_IGNORED_ALIASES
+from graph.query_classifier import alias_pattern, find_symbols
+
+_SPECIAL_ALIASES = {alias.lower() for alias in NEWS_CASE_SENSITIVE_ALIASES + NEWS_IGNORED_ALIASES}
+_NEWS_ALIASES = [
+    alias_pattern(alias for aliases in COMPANY_ALIASES.values() for alias in aliases if alias not in _SPECIAL_ALIASES),
+    alias_pattern(NEWS_CASE_SENSITIVE_ALIASES, ignore_case=False),
+]
+
+
+def extract_symbols(text: str) -> List[str]:
+    """Symbols of the companies in the symbol dictionary that news text mentions, by ticker or name.
+
+    Uppercase words that are not in the dictionary are ignored, news text is
+    full of acronyms that look like tickers. Names that are also common words
+    only count capitalised, or not at all, see `config.symbols`.
+    """
+    return [symbol for symbol in find_symbols(text, aliases=_NEWS_ALIASES) if symbol in COMPANY_ALIASES]
+
+
+def resolve_symbol(value: str) -> Optional[str]:
+    """Dictionary symbol for a ticker or company name, e.g. "$tsla" or "Tesla" -> "TSLA"."""
+    symbol = value.strip().lstrip("$").upper()
+    if symbol in COMPANY_ALIASES:
+        return symbol
+    # a name the user typed, matched without the news text's restrictions
+    found = [symbol for symbol in find_symbols(value) if symbol in COMPANY_ALIASES]
+    return found[0] if found else None
+
+
+class SymbolIndex:
+    """Inverted index from stock symbol to the news chunks mentioning it.
+
+    Each symbol maps to postings `[date, article, chunk id]` kept sorted by
+    date, so a lookup walks only that symbol's postings, from the newest.
+    The indexer updates it incrementally as chunks are written and deleted,
+    and saves it as JSON. Readers reload it when the file changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.postings: Dict[str, List[list]] = {}
+        self._loaded_mtime = None
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with self._lock:
+            self._loaded_mtime = os.stat(self.path).st_mtime_ns
+            try:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    self.postings = json.load(file)
+            except Exception as e:
+                logging.error(f"Error reading symbol index {self.path}: {e}")
+
+    def _maybe_reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._loaded_mtime:
+            self._load()
+
+    def save(self):
+        with self._lock:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(self.postings, file)
+            os.replace(temp_path, self.path)
+            self._loaded_mtime = os.stat(self.path).st_mtime_ns
+
+    def add(self, chunks: Iterable[Tuple[str, str, dict]]):
+        """Index (id, text, metadata) chunks under the symbols mentioned in their title or text."""
+        with self._lock:
+            for id, text, metadata in chunks:
+                # undated articles sort as the oldest
+                posting = [metadata.get("date") or "", metadata.get("url") or metadata.get("title") or "", id]
+                for symbol in extract_symbols(f"{metadata.get('title') or ''}\n{text}"):
+                    postings = self.postings.setdefault(symbol, [])
+                    index = bisect.bisect_left(postings, posting)
+                    if index == len(postings) or postings[index] != posting:
+                        postings.insert(index, posting)
+
+    def delete(self, ids: Iterable[str]) -> int:
+        removed = set(ids)
+        deleted = set()
+        with self._lock:
+            for symbol in list(self.postings):
+                kept = [entry for entry in self.postings[symbol] if entry[2] not in removed]
+                deleted.update(entry[2] for entry in self.postings[symbol] if entry[2] in removed)
+                if kept:
+                    self.postings[symbol] = kept
+                else:
+                    del self.postings[symbol]
+        return len(deleted)
+
+    def delete_untracked(self, keep_ids: Iterable[str]) -> int:
+        keep = set(keep_ids)
+        with self._lock:
+            untracked = {entry[2] for postings in self.postings.values() for entry in postings} - keep
+        return self.delete(untracked)
+
+    def lookup(self, symbol: str, dates: Optional[Set[str]] = None, limit: Optional[int] = None) -> List[dict]:
+        """Chunks mentioning the symbol, newest first, optionally only those published on the given dates."""
+        self._maybe_reload()
+        with self._lock:
+            postings = list(self.postings.get(symbol, []))
+        results = []
+        for date, article, id in reversed(postings):
+            if dates is not None and date not in dates:
+                continue
+            results.append({"date": date or None, "article": article, "chunk_id": id})
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def symbols(self) -> Dict[str, int]:
+        """Number of indexed chunks per symbol."""
+        self._maybe_reload()
+        with self._lock:
+            return {symbol: len(postings) for symbol, postings in self.postings.items()}
+
+
+@lru_cache(maxsize=1)
+def get_symbol_index() -> SymbolIndex:
+    return SymbolIndex(SYMBOL_INDEX_PATH)
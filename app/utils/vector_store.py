@@ -1,36 +1,67 @@
-from langchain_mongodb import MongoDBAtlasVectorSearch
-from pymongo import MongoClient
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 import os
-from uuid import uuid4
 from functools import lru_cache
+from config.constants import VECTOR_STORE_BACKEND, LOCAL_VECTOR_STORE_DIR
 
+# pymongo, langchain_mongodb and the Google SDK are imported on first use, they dominate the app's start up time
 
-client = MongoClient(os.getenv("CONNECTION_STRING"))
 DB_NAME = "market_minds_ai"
 COLLECTION_NAME = "tech_news_vectorstore"
 ATLAS_VECTOR_SEARCH_INDEX_NAME = "tech_news_vectorstore_index"
-MONGODB_COLLECTION = client[DB_NAME][COLLECTION_NAME]
+# text-embedding-004 vectors, and the metadata fields news search pre-filters on
+EMBEDDING_DIMENSIONS = 768
+VECTOR_SEARCH_FILTER_FIELDS = ["date", "category"]
+
+
+@lru_cache(maxsize=1)
+def get_mongo_client():
+    """The process' MongoClient, created on first use so CONNECTION_STRING can come from .env."""
+    from pymongo import MongoClient
+    return MongoClient(os.getenv("CONNECTION_STRING"))
+
+
+def get_mongodb_collection():
+    return get_mongo_client()[DB_NAME][COLLECTION_NAME]
+
 
 @lru_cache(maxsize=1)
 def get_vector_store():
-    
-    vector_store = MongoDBAtlasVectorSearch(
-        collection=MONGODB_COLLECTION,
-        embedding=GoogleGenerativeAIEmbeddings(
-            model= "models/text-embedding-004",
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from .embedding_cache import CachedEmbeddings
+
+    # repeated chunk texts and queries are served from the local embedding cache
+    embedding_model = "models/text-embedding-004"
+    embeddings = CachedEmbeddings(
+        GoogleGenerativeAIEmbeddings(
+            model=embedding_model,
             google_api_key=os.getenv("GOOGLE_API_KEY")
         ),
+        embedding_model,
+    )
+    if VECTOR_STORE_BACKEND == "local":
+        from .local_vector_store import LocalVectorStore
+        return LocalVectorStore(LOCAL_VECTOR_STORE_DIR, embeddings)
+    from langchain_mongodb import MongoDBAtlasVectorSearch
+    vector_store = MongoDBAtlasVectorSearch(
+        collection=get_mongodb_collection(),
+        embedding=embeddings,
         index_name=ATLAS_VECTOR_SEARCH_INDEX_NAME,
         relevance_score_fn="cosine",
     )
-    # vector_store.create_vector_search_index(dimensions=768)
     return vector_store
 
 
+def ensure_vector_search_index() -> bool:
+    """Create the Atlas vector search index, or update it to declare the filter fields news search uses.
 
-def add_to_vector_store(docs, vector_store):
-    print("Adding docs to vector store ...")
-    uuids = [str(uuid4()) for _ in range(len(docs))]
-    vector_store.add_documents(documents=docs, ids=uuids)
-    print(f"Documents successfully added to collection")
+    Returns whether the index definition was created or changed.
+    """
+    collection = get_mongodb_collection()
+    existing = next(iter(collection.list_search_indexes(ATLAS_VECTOR_SEARCH_INDEX_NAME)), None)
+    if existing is not None:
+        fields = (existing.get("latestDefinition") or {}).get("fields", [])
+        declared = {field.get("path") for field in fields if field.get("type") == "filter"}
+        if declared.issuperset(VECTOR_SEARCH_FILTER_FIELDS):
+            return False
+    get_vector_store().create_vector_search_index(
+        dimensions=EMBEDDING_DIMENSIONS, filters=VECTOR_SEARCH_FILTER_FIELDS, update=existing is not None)
+    return True